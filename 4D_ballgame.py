@@ -14,200 +14,136 @@ two dimensional plane projections.
 
 """
 
-import pygame, math
-
-
-class Ball():
-    def __init__(self, init_speed=4):
-        self.start_speed = init_speed
-        self.reset()
-
-    def reset(self):
-        """Reset ball position and speed. """
-        self.x = 300
-        self.y = 150
-        self.z = 150
-        self.w = 150
-        
-        self.sx = 0
-        self.sy = self.start_speed
-        self.sz = 0
-        self.sw = 0
-    
-    def move(self):
-        self.x += self.sx
-        self.y += self.sy
-        self.z += self.sz
-        self.w += self.sw
-        self.wall_check()
-        
-        #Bounce from walls, field is 600x300x300x300
-        if self.x >= 600 or self.x <= 0:
-            self.sx = -self.sx
-        if self.y >= 300 or self.y <= 0:
-            self.sy = -self.sy
-        if self.z >= 300 or self.z <= 0:
-            self.sz = -self.sz
-        if self.w >= 300 or self.w <= 0:
-            self.sw = -self.sw
- 
-    def wall_check(self):   
-        """If ball in wall, move to edge. Otherwise the paddles can drive the 
-        ball of the field. Sudden warps in ball position can be attributed to
-        quantum fluctuations. """
-        if self.x >= 600:   self.x = 600
-        if self.x <= 0:     self.x = 0
-        if self.y >= 300:   self.y = 300
-        if self.y <= 0:     self.y = 0
-        if self.z >= 300:   self.z = 300
-        if self.z <= 0:     self.z = 0
-        if self.w >= 300:   self.w = 300
-        if self.w <= 0:     self.w = 0
- 
-    def bounce(self, padx, pady, padz, padw, dist, paddle_radius):
-        """Calculate new speed for the ball based on paddle coordinates (padx, pady..)
-        and distance the ball is inside the paddle. Speed is calculated by finding the
-        surface normal vector at the point of contact, calculating the reflection
-        using dot product of surface normal vector and speed vector. If ball is inside the
-        paddle, move it to the edge."""
-        
-        dx = self.x - padx
-        dy = self.y - pady
-        dz = self.z - padz
-        dw = self.w - padw
-        
-        """
-        #Reflection vector w of incoming vector v.
-        #w=v-2(v*n)n  , * means dot product, n is normal vector.
-        #circle center to collision point is in direction of surface normal 'n'
-        
-        Calculate normal vector (nx,ny,nz). (dx,dy,dz) points in same
-        direction as n, from paddle center to point of contact, which is
-        ball location. Scale d with circle radius adjusted by distance the 
-        ball traveled inside, so that the lenght is 1, so it is unit vector.
-        """
-
-        nx = dx / (paddle_radius - dist)
-        ny = dy / (paddle_radius - dist)
-        nz = dz / (paddle_radius - dist)
-        nw = dw / (paddle_radius - dist)
-        
-        v_dot_n = self.sx*nx + self.sy*ny + self.sz*nz + self.sw*nw
-        self.sx = self.sx - 2*v_dot_n*nx
-        self.sy = self.sy - 2*v_dot_n*ny
-        self.sz = self.sz - 2*v_dot_n*nz
-        self.sw = self.sw - 2*v_dot_n*nw
-        
-        #OPTION A
-        #move ball to edge ; a simple hack to keep ball out of paddle        
-        self.x += dist*nx
-        self.y += dist*ny
-        self.z += dist*nz
-        self.w += dist*nw
-        self.wall_check()
-        
-        #OPTION B: if ball inside paddle, accerelate towards surface normal
-        #m = 0.1        #acceleratin multiplier
-        #self.sx = self.sx - m*dist*nx
-        #self.sy = self.sy - m*dist*ny
-
-
-class Paddle():
-    def __init__(self, x_start, y_start, z_start, w_start, size, pColor): 
-        self.x = x_start 
-        self.y = y_start
-        self.z = z_start
-        self.w = w_start
-        self.radius = size
-        self.color = pColor
-
-    def move(self, direction):
-        if direction == 'xp':            
-            self.x += 1
-        if direction == 'xn':            
-            self.x -= 1
-        if direction == 'yp':            
-            self.y += 1
-        if direction == 'yn':            
-            self.y -= 1
-        if direction == 'zp':            
-            self.z += 1
-        if direction == 'zn':            
-            self.z -= 1     
-        if direction == 'wp':
-            self.w += 1
-        if direction == 'wn':
-            self.w -= 1
-        
-        #BORDERS for paddle movement
-        if self.x <= -50:
-            self.x = -50
-        if self.x >= 650:
-            self.x = 650
-            
-        if self.y <= -50:         
-            self.y = -50
-        if self.y >= 350:
-            self.y = 350
-
-        if self.z <= -50:         
-            self.z = -50
-        if self.z >= 350:
-            self.z = 350
-
-        if self.w <= -50:         
-            self.w = -50
-        if self.w >= 350:
-            self.w = 350
-    
-    def collision(self, ballx, bally, ballz, ballw):
-        """Test if paddle collides with ball. Calculate Pythagorean distance 
-        from paddle center to ball location. Return distance from paddle edge
-        to ball, if positive, ball is inside the paddle. """
-        dx = self.x - ballx
-        dy = self.y - bally
-        dz = self.z - ballz
-        dw = self.w - ballw
-        d = math.sqrt(math.pow(dx,2) + math.pow(dy, 2) + math.pow(dz,2) + math.pow(dw,2))
-        return self.radius - d
+import argparse, os, random, sys, time
+START_TIME = time.perf_counter() #for time to first frame
+
+#pygame.pkgdata imports the slow, deprecated pkg_resources only to find its own
+#data files, and falls back to plain files without it. Saves ~100 ms of startup.
+#Blocked only while pygame is imported, later imports of it work as usual.
+if 'pkg_resources' in sys.modules:
+    import pygame
+else:
+    sys.modules['pkg_resources'] = None
+    try:
+        import pygame
+    finally:
+        del sys.modules['pkg_resources']
+
+from ballgame.engine import DIR_BITS, mode_flags
+from ballgame import backends
+from ballgame.timestep import FixedTimestep, lerp
+from ballgame.render import static_layer, panel_dims, DirtyRenderer, text_cache
+from ballgame.fonts import fonts
+from ballgame.profiler import FrameProfiler
+from ballgame.replay import ReplayRecorder, ReplayPlayer, new_replay_path
+from ballgame import net
+from ballgame.rollback import RollbackSession
+from ballgame.policies import Predict
+from ballgame.party import PartyMatch
+try:
+    from ballgame.team import TeamMatch, TeamPredict
+except ImportError: #team mode needs numpy
+    TeamMatch = None
+
+
+PHYSICS_RATE = 240 #physics steps per second, gameplay speed does not depend on it
+FIXED_POINT = False #integer physics, same results on every machine
+PHYSICS_BACKEND = 'python' #'python', 'numpy', 'numba', 'nd', 'swept' or 'fastest' here, see ballgame.backends
+RENDER_FPS = 60    #frame rate cap, 0 for no cap
+DIRTY_RECTS = True #update only changed screen areas instead of full flip
+MENU_WAIT_MS = 1000 #longest sleep in menu without input
+PROFILE_LOG = None  #file for per-frame phase timings, .csv or binary, F3 shows overlay
+REPLAY_DIR = 'replays' #every match is recorded here, None to not record
+REPLAY_SPEEDS = (1, 2, 5, 10, 25, 50, 100) #playback speeds of the replay viewer
+REPLAY_SEEK = 10 #seconds to jump with LEFT/RIGHT in the replay viewer
+NET_ROLLBACK = False #network game predicts the other player instead of waiting
+ROLLBACK_DELAY = 1 #input delay in network ticks with rollback, lockstep uses net.INPUT_DELAY
+CPU_PLAYER2 = False #computer plays player 2, C toggles it in the menu
+PARTY_BALLS = 1000 #balls in party mode, P toggles it in the menu
+PARTY_RATE = 120 #physics steps per second in party mode, lower to keep 60 FPS
+TEAM_SIZES = (1, 2, 4, 8) #paddles per side, T cycles them in the menu
+
+
+#Key to paddle direction, player 1 and player 2
+P1_KEYS = ((pygame.K_w, 'yp'), (pygame.K_a, 'xn'), (pygame.K_s, 'yn'), (pygame.K_d, 'xp'),
+           (pygame.K_q, 'zp'), (pygame.K_e, 'zn'), (pygame.K_r, 'wp'), (pygame.K_f, 'wn'))
+P2_KEYS = ((pygame.K_UP, 'yp'), (pygame.K_LEFT, 'xn'), (pygame.K_DOWN, 'yn'), (pygame.K_RIGHT, 'xp'),
+           (pygame.K_KP1, 'zn'), (pygame.K_KP4, 'zp'), (pygame.K_KP2, 'wn'), (pygame.K_KP5, 'wp'))
+#Key maps of the paddles of each side by number in the team, the computer
+#plays paddles without one. Add maps to play more paddles from the keyboard.
+TEAM_KEYS = ({0: P1_KEYS}, {0: P2_KEYS})
+
+
+def read_input(keys, key_map):
+    """Direction bitmask from pressed keys. """
+    mask = 0
+    for key, direction in key_map:
+        if keys[key]:
+            mask |= DIR_BITS[direction]
+    return mask
 
 
 #**********************************************
 
-def start_screen(speedx10):
-    """Defines the start and setup sceen. """
-    
-    title_font = pygame.font.SysFont('arial', 60)
-    title_surf = title_font.render('4 DIMENSIONAL BALL GAME', False, 'magenta4')
-    
-    menu_font = pygame.font.SysFont('arial', 30)
-    menu_4d_surf = menu_font.render('4D GAME', False, 'black') # mode 0
-    menu_3d_surf = menu_font.render('3D GAME', False, 'black') # mode 1
-    menu_2d_surf = menu_font.render('2D GAME', False, 'black') # mode 2
-    menu_quit_surf = menu_font.render('QUIT', False, 'black')  # mode 3
-    
-    heading_font = pygame.font.SysFont('arial', 25)
-    heading_font.set_underline(True)  
-    info_font = pygame.font.SysFont('arial', 25)
-    
-    heading_surf = heading_font.render('Controls', False, 'black')
-    info1_surf = info_font.render('Menu: UP/DOWN, select with ENTER/SPACE', False, 'black')
-    info2_surf = info_font.render('           LEFT/RIGHT to change ball speed', False, 'black')
-    info3_surf = info_font.render('Player1: w,a,s,d,q,e,r,f', False, 'black')
-    info4_surf = info_font.render('Player2: Arrow keys and numpad 4,1,5,2', False, 'black')
-    info5_surf = info_font.render('Back to menu: ESC', False, 'black')
-    info6_surf = info_font.render('Playing field is 600x300x300x300, (x,y,z,w).', False, 'black')
-    info7_surf = info_font.render('Created by: Arttu Huttunen, 2025', False, 'black')
+def report_first_frame():
+    """Print time from start to first frame on screen, once. """
+    global START_TIME
+    if START_TIME is not None:
+        print(f'Time to first frame: {(time.perf_counter() - START_TIME)*1000:.0f} ms', flush=True)
+        START_TIME = None
+
+
+def start_screen(speedx10, cpu=CPU_PLAYER2, party=False, team=1):
+    """Defines the start and setup sceen. Returns game mode, speed,
+    whether the computer plays player 2, whether it is party mode and the
+    team size. """
+    
+    title_font = fonts.get(60)
+    title_surf = text_cache.render(title_font, '4 DIMENSIONAL BALL GAME', 'magenta4')
+    
+    menu_font = fonts.get(30)
+    menu_4d_surf = text_cache.render(menu_font, '4D GAME', 'black') # mode 0
+    menu_3d_surf = text_cache.render(menu_font, '3D GAME', 'black') # mode 1
+    menu_2d_surf = text_cache.render(menu_font, '2D GAME', 'black') # mode 2
+    menu_quit_surf = text_cache.render(menu_font, 'QUIT', 'black')  # mode 3
+    
+    heading_font = fonts.get(25, underline=True)
+    info_font = fonts.get(25)
+    
+    heading_surf = text_cache.render(heading_font, 'Controls', 'black')
+    info1_surf = text_cache.render(info_font, 'Menu: UP/DOWN, select with ENTER/SPACE', 'black')
+    info2_surf = text_cache.render(info_font, '           LEFT/RIGHT to change ball speed', 'black')
+    info3_surf = text_cache.render(info_font, 'Player1: w,a,s,d,q,e,r,f', 'black')
+    info4_surf = text_cache.render(info_font, 'Player2: Arrow keys and numpad 4,1,5,2', 'black')
+    info5_surf = text_cache.render(info_font, 'Back to menu: ESC', 'black')
+    info6_surf = text_cache.render(info_font, 'Playing field is 600x300x300x300, (x,y,z,w).', 'black')
+    info7_surf = text_cache.render(info_font, 'Created by: Arttu Huttunen, 2025', 'black')
+    info8_surf = text_cache.render(info_font, 'Computer player 2 on/off: c', 'black')
+    info9_surf = text_cache.render(info_font, f'Party mode, {PARTY_BALLS} balls, on/off: p', 'black')
+    info10_surf = text_cache.render(info_font, 'Team mode, paddles per side: t' if TeamMatch else
+                                    'Team mode needs numpy', 'black')
     
     game_mode = 0
+    redraw = True #whole screen
     
     running = True
     while running:
-        # pygame.QUIT event means the user clicked X to close your window
-        for event in pygame.event.get():
+        # Sleep until there is input, the menu does not change by itself.
+        # The timeout only keeps the loop responsive to the OS. The first
+        # pass does not wait, so the menu is drawn at once.
+        if redraw:
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait(MENU_WAIT_MS)] + pygame.event.get()
+        old_mode, old_speed, old_cpu, old_party, old_team = game_mode, speedx10, cpu, party, team
+        
+        for event in events:
+            # pygame.QUIT event means the user clicked X to close your window
             if event.type == pygame.QUIT:
                 running = False
                 game_mode = 3
+            if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                redraw = True
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN or event.key == pygame.K_SPACE:
                     running = False
@@ -228,341 +164,642 @@ def start_screen(speedx10):
                 if speedx10 < 0:
                     speedx10 = 0
                 
-        speed_surf = menu_font.render(f'SPEED: {speedx10/10}', False, 'black')
+                if event.key == pygame.K_c:
+                    cpu = not cpu
+                if event.key == pygame.K_p:
+                    party = not party
+                    team = 1
+                if event.key == pygame.K_t and TeamMatch:
+                    team = TEAM_SIZES[(TEAM_SIZES.index(team) + 1) % len(TEAM_SIZES)]
+                    party = False
         
-        screen.fill('darkgoldenrod1')
-        screen.blit(title_surf,(400,150))
+        if not running:
+            break
         
-        sel_pos = 355 + game_mode*50
-        pygame.draw.rect(screen, 'blue', (550, sel_pos, 20,20))
+        speed_surf = text_cache.render(menu_font, f'SPEED: {speedx10/10}', 'black')
+        cpu_surf = text_cache.render(menu_font, 'PLAYER 2: ' + ('COMPUTER' if cpu else 'HUMAN'), 'black')
+        party_surf = text_cache.render(menu_font, f'BALLS: {PARTY_BALLS if party else 1}', 'black')
+        team_surf = text_cache.render(menu_font, f'TEAMS: {team} VS {team}', 'black')
+        sel_rect = pygame.Rect(550, 355 + game_mode*50, 20, 20)
         
-        screen.blit(menu_4d_surf, (600,350))
-        screen.blit(menu_3d_surf, (600,400))
-        screen.blit(menu_2d_surf, (600,450))
-        screen.blit(menu_quit_surf, (600,500))
-        screen.blit(speed_surf, (600,600))
-        
-        screen.blit(heading_surf, (1200,340))
-        screen.blit(info1_surf, (1100,375))
-        screen.blit(info2_surf, (1100,400))
-        screen.blit(info3_surf, (1100,425))
-        screen.blit(info4_surf, (1100,450))
-        screen.blit(info5_surf, (1100,475))
-        screen.blit(info6_surf, (1100,500))
-        screen.blit(info7_surf, (1100,550))
-        
-        pygame.display.flip()
-    else:
-        return game_mode, speedx10
+        if redraw:
+            screen.fill('darkgoldenrod1')
+            screen.blit(title_surf,(400,150))
+            
+            pygame.draw.rect(screen, 'blue', sel_rect)
+            
+            screen.blit(menu_4d_surf, (600,350))
+            screen.blit(menu_3d_surf, (600,400))
+            screen.blit(menu_2d_surf, (600,450))
+            screen.blit(menu_quit_surf, (600,500))
+            speed_rect = screen.blit(speed_surf, (600,600))
+            cpu_rect = screen.blit(cpu_surf, (600,650))
+            party_rect = screen.blit(party_surf, (600,700))
+            team_rect = screen.blit(team_surf, (600,750))
+            
+            screen.blit(heading_surf, (1200,340))
+            screen.blit(info1_surf, (1100,375))
+            screen.blit(info2_surf, (1100,400))
+            screen.blit(info3_surf, (1100,425))
+            screen.blit(info4_surf, (1100,450))
+            screen.blit(info5_surf, (1100,475))
+            screen.blit(info6_surf, (1100,500))
+            screen.blit(info8_surf, (1100,525))
+            screen.blit(info9_surf, (1100,550))
+            screen.blit(info10_surf, (1100,575))
+            screen.blit(info7_surf, (1100,600))
+            
+            pygame.display.flip()
+            report_first_frame()
+            redraw = False
+        else:
+            #only selection marker and speed text change
+            dirty = []
+            if game_mode != old_mode:
+                old_rect = pygame.Rect(550, 355 + old_mode*50, 20, 20)
+                screen.fill('darkgoldenrod1', old_rect)
+                pygame.draw.rect(screen, 'blue', sel_rect)
+                dirty += [old_rect, sel_rect]
+            if speedx10 != old_speed:
+                screen.fill('darkgoldenrod1', speed_rect)
+                dirty.append(speed_rect)
+                speed_rect = screen.blit(speed_surf, (600,600))
+                dirty.append(speed_rect)
+            if cpu != old_cpu:
+                screen.fill('darkgoldenrod1', cpu_rect)
+                dirty.append(cpu_rect)
+                cpu_rect = screen.blit(cpu_surf, (600,650))
+                dirty.append(cpu_rect)
+            if party != old_party:
+                screen.fill('darkgoldenrod1', party_rect)
+                dirty.append(party_rect)
+                party_rect = screen.blit(party_surf, (600,700))
+                dirty.append(party_rect)
+            if team != old_team:
+                screen.fill('darkgoldenrod1', team_rect)
+                dirty.append(team_rect)
+                team_rect = screen.blit(team_surf, (600,750))
+                dirty.append(team_rect)
+            if dirty:
+                pygame.display.update(dirty)
+    
+    return game_mode, speedx10, cpu, party, team
 
 
 #***********************************************  
 
-def run_game(game_mode, speed, mode_3d, mode_4d):
-    """Actual game. In 2D mode, w and z values are locked. In 3D w is locked. """
-
-    back_to_start = False #ESC returns to start menu, closing window shuts down
-    
-    
-    
-    ball1 = Ball(speed)
-    
-    paddle_radius = 40
-    #paddle start x,y,z,w; paddle radius, colour
-    paddle1 = Paddle(100, 150, 150, 150, paddle_radius, 'red')
-    paddle2 = Paddle(500, 150, 150, 150, paddle_radius, 'yellow')
-    
-    score_font = pygame.font.SysFont('arial', 30)
-    P1_points = 0
-    P2_points = 0
-    
-    coord_font = pygame.font.SysFont('arial', 14) #for display of coordinates
-    
-    #initialize helper variables for displaying
-    ball_coord_x = 300
-    ball_coord_y = 150
-    ball_coord_z = 150
-    ball_coord_w = 150
-
-    ball_speed_x = 0
-    ball_speed_y = speed
-    ball_speed_z = 0
-    ball_speed_w = 0
-
-    disp_counter = 0 #for display update rate
-    
-    #pre-render static dimension labels
-    xy_X_surf = coord_font.render('x', False, 'black')
-    xy_Y_surf = coord_font.render('y', False, 'black')
-    xz_X_surf = coord_font.render('x', False, 'black')
-    xz_Z_surf = coord_font.render('z', False, 'black')
-    yz_Y_surf = coord_font.render('y', False, 'black')
-    yz_Z_surf = coord_font.render('z', False, 'black')
-    
-    xw_X_surf = coord_font.render('x', False, 'black')
-    xw_W_surf = coord_font.render('w', False, 'black')
-    yw_Y_surf = coord_font.render('y', False, 'black')
-    yw_W_surf = coord_font.render('w', False, 'black')
-    zw_Z_surf = coord_font.render('z', False, 'black')
-    zw_W_surf = coord_font.render('w', False, 'black')
+class GameView():
+    """Draws a match: the projections, scores and coordinate read-outs. """
     
-    running = True
-    while running:
-        # pygame.QUIT event means the user clicked X to close your window
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-    
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_ESCAPE]:
-            running = False
-            back_to_start = True
+    def __init__(self, match, dirty_rects=DIRTY_RECTS, profiler=None):
+        self.match = match
+        self.profiler = profiler or FrameProfiler() #not enabled, marks cost nothing
         
-        if keys[pygame.K_w]:
-            paddle1.move('yp')
-        if keys[pygame.K_a]:
-            paddle1.move('xn')
-        if keys[pygame.K_s]:
-            paddle1.move('yn')
-        if keys[pygame.K_d]:
-            paddle1.move('xp')
-        if keys[pygame.K_q]:
-            paddle1.move('zp')
-        if keys[pygame.K_e]:
-            paddle1.move('zn')
-        if keys[pygame.K_r]:
-            paddle1.move('wp')
-        if keys[pygame.K_f]:
-            paddle1.move('wn')
+        self.score_font = fonts.get(30)
+        self.coord_font = fonts.get(14) #for display of coordinates
         
-        if keys[pygame.K_UP]:
-            paddle2.move('yp')
-        if keys[pygame.K_LEFT]:
-            paddle2.move('xn')
-        if keys[pygame.K_DOWN]:
-            paddle2.move('yn')
-        if keys[pygame.K_RIGHT]:
-            paddle2.move('xp')
-        if keys[pygame.K_KP1]:
-            paddle2.move('zn')
-        if keys[pygame.K_KP4]:
-            paddle2.move('zp')
-        if keys[pygame.K_KP2]:
-            paddle2.move('wn')
-        if keys[pygame.K_KP5]:
-            paddle2.move('wp')
-    
-        ball1.move()
-
-        # In 3D or 2D mode, lock extra coordinates to center.
-        if not mode_4d:
-            ball1.w, paddle1.w, paddle2.w = 150,150,150        
-        if not mode_3d:
-            ball1.z, paddle1.z, paddle2.z = 150,150,150
-            
-        col_dist1 = paddle1.collision(ball1.x, ball1.y, ball1.z, ball1.w) 
-        #how deep in paddle is ball, negative means outside
-        if col_dist1 >= 0:
-            ball1.bounce(paddle1.x, paddle1.y, paddle1.z, paddle1.w, col_dist1, paddle1.radius)
-     
-        col_dist2 = paddle2.collision(ball1.x, ball1.y, ball1.z, ball1.w)
-        if col_dist2 >= 0:
-            ball1.bounce(paddle2.x, paddle2.y, paddle2.z, paddle2.w, col_dist2, paddle2.radius)
-    
+        #initialize helper variables for displaying
+        self.ball_coord_x = 300
+        self.ball_coord_y = 150
+        self.ball_coord_z = 150
+        self.ball_coord_w = 150
+
+        self.ball_speed_x = 0
+        self.ball_speed_y = match.speed
+        self.ball_speed_z = 0
+        self.ball_speed_w = 0
+
+        self.disp_counter = 0 #for display update rate
+        
+        #borders, goals and dimension labels, drawn once per game mode
+        layer = static_layer(match.mode_3d, match.mode_4d, self.coord_font)
+        self.renderer = DirtyRenderer(screen, layer, dirty_rects)
+    
+    def invalidate(self):
+        self.renderer.invalidate()
+    
+    def draw(self, positions, goal=0, status=()):
+        """Draw one frame. positions as from Match.positions(), goal makes
+        the background blink, status lines are shown under the scores. """
+        match, profiler = self.match, self.profiler
+        ball1, paddle1, paddle2 = match.ball, match.paddle1, match.paddle2
+        mode_3d, mode_4d = match.mode_3d, match.mode_4d
+        unit = match.unit #coordinates to field units
+        renderer = self.renderer
+        score_font, coord_font = self.score_font, self.coord_font
+        
+        (bx, by, bz, bw, p1x, p1y, p1z, p1w,
+         p2x, p2y, p2z, p2w) = positions
     
         #Transform "normal" game coordinates to pygame coordinates, in pygame top corner is origin
 
         #plane xy, b=ball, p1=paddle1, p2=paddle2
         #px = nx+50 , "p=pygame, n=normal"; py = max(py) - ny
-        xy_bx = 50 + ball1.x
-        xy_by = 350 - ball1.y
-        xy_p1x = 50 + paddle1.x
-        xy_p1y = 350 - paddle1.y
-        xy_p2x = 50 + paddle2.x
-        xy_p2y = 350 - paddle2.y
-    
-        xz_bx = 750 + ball1.x
-        xz_bz = 350 - ball1.z
-        xz_p1x = 750 + paddle1.x
-        xz_p1z = 350 - paddle1.z
-        xz_p2x = 750 + paddle2.x
-        xz_p2z = 350 - paddle2.z
-    
-        yz_by = 1450 + ball1.y
-        yz_bz = 350 - ball1.z
-        yz_p1y = 1450 + paddle1.y
-        yz_p1z = 350 - paddle1.z
-        yz_p2y = 1450 + paddle2.y
-        yz_p2z = 350 - paddle2.z
+        xy_bx = 50 + bx
+        xy_by = 350 - by
+        xy_p1x = 50 + p1x
+        xy_p1y = 350 - p1y
+        xy_p2x = 50 + p2x
+        xy_p2y = 350 - p2y
+    
+        xz_bx = 750 + bx
+        xz_bz = 350 - bz
+        xz_p1x = 750 + p1x
+        xz_p1z = 350 - p1z
+        xz_p2x = 750 + p2x
+        xz_p2z = 350 - p2z
+    
+        yz_by = 1450 + by
+        yz_bz = 350 - bz
+        yz_p1y = 1450 + p1y
+        yz_p1z = 350 - p1z
+        yz_p2y = 1450 + p2y
+        yz_p2z = 350 - p2z
     
         #second row in display
-        xw_bx = 50 + ball1.x
-        xw_bw = 750 - ball1.w
-        xw_p1x = 50 + paddle1.x 
-        xw_p1w = 750 - paddle1.w
-        xw_p2x = 50 + paddle2.x
-        xw_p2w = 750 - paddle2.w
+        xw_bx = 50 + bx
+        xw_bw = 750 - bw
+        xw_p1x = 50 + p1x 
+        xw_p1w = 750 - p1w
+        xw_p2x = 50 + p2x
+        xw_p2w = 750 - p2w
         
-        yw_by = 750 + ball1.y
-        yw_bw = 750 - ball1.w
-        yw_p1y = 750 + paddle1.y
-        yw_p1w = 750 - paddle1.w
-        yw_p2y = 750 + paddle2.y
-        yw_p2w = 750 - paddle2.w
-    
-        zw_bz = 1450 + ball1.z
-        zw_bw = 750 - ball1.w
-        zw_p1z = 1450 + paddle1.z
-        zw_p1w = 750 - paddle1.w
-        zw_p2z = 1450 + paddle2.z
-        zw_p2w =  750 - paddle2.w
-    
-        #check if goal, blink when goal
-        if  ball1.x <= 0 and 100 < ball1.y < 200 and 100 < ball1.z < 200 and 100 < ball1.w < 200:
-            P2_points += 1
-            ball1.reset()
-            screen.fill("white")
-        elif  ball1.x >= 600 and 100 < ball1.y < 200 and 100 < ball1.z < 200 and 100 < ball1.w < 200:
-            P1_points += 1
-            ball1.reset()
-            screen.fill("white")
+        yw_by = 750 + by
+        yw_bw = 750 - bw
+        yw_p1y = 750 + p1y
+        yw_p1w = 750 - p1w
+        yw_p2y = 750 + p2y
+        yw_p2w = 750 - p2w
+    
+        zw_bz = 1450 + bz
+        zw_bw = 750 - bw
+        zw_p1z = 1450 + p1z
+        zw_p1w = 750 - p1w
+        zw_p2z = 1450 + p2z
+        zw_p2w =  750 - p2w
+    
+        profiler.mark('transform')
+    
+        #blink when goal
+        if goal:
+            renderer.begin("white")
         else:
-            # fill the screen with a color to wipe away anything from last frame
-            screen.fill("grey") 
+            # fill with a color to wipe away anything from last frame
+            renderer.begin("grey")
+        rects = self.draw_extra() #bounding boxes of paddles and balls drawn
         
         #update ball coordinate display only part of time to make it readable
-        if disp_counter == 10:
-            ball_coord_x, ball_coord_y, ball_coord_z, ball_coord_w = int (ball1.x), int (ball1.y), int(ball1.z), int(ball1.w)
-            ball_speed_x, ball_speed_y, ball_speed_z, ball_speed_w = ball1.sx, ball1.sy, ball1.sz, ball1.sw
-            disp_counter = 0
+        if self.disp_counter == 10:
+            self.ball_coord_x, self.ball_coord_y, self.ball_coord_z, self.ball_coord_w = int (ball1.x/unit), int (ball1.y/unit), int(ball1.z/unit), int(ball1.w/unit)
+            #speeds shown per 60 FPS frame, as in the menu
+            scale = match.speed_scale * unit
+            self.ball_speed_x, self.ball_speed_y, self.ball_speed_z, self.ball_speed_w = ball1.sx/scale, ball1.sy/scale, ball1.sz/scale, ball1.sw/scale
+            self.disp_counter = 0
         else:
-            disp_counter +=1
+            self.disp_counter +=1
         
         
         #Draw projections
         # XY
-        pygame.draw.circle(screen, paddle1.color, (xy_p1x, xy_p1y), paddle1.radius)
-        pygame.draw.circle(screen, paddle2.color, (xy_p2x, xy_p2y), paddle2.radius)
-        pygame.draw.circle(screen, 'blue' , (xy_bx, xy_by), 3) #ball, size 3 to make it visible
-        
-        pygame.draw.rect(screen, 'black', (50,50,600,300), width=1) #borders (topcorner x,y, length, width)
-        pygame.draw.rect(screen, 'pink', (25,150,25,100))     #goal1
-        pygame.draw.rect(screen, 'orange', (650,150,25,100))     #goal2
+        rects.append(pygame.draw.circle(screen, paddle1.color, (xy_p1x, xy_p1y), paddle1.radius))
+        rects.append(pygame.draw.circle(screen, paddle2.color, (xy_p2x, xy_p2y), paddle2.radius))
+        rects.append(pygame.draw.circle(screen, 'blue' , (xy_bx, xy_by), 3)) #ball, size 3 to make it visible
 
         if mode_3d:    
             # XZ
-            pygame.draw.circle(screen, paddle1.color, (xz_p1x, xz_p1z), paddle1.radius)
-            pygame.draw.circle(screen, paddle2.color, (xz_p2x, xz_p2z), paddle2.radius)
-            pygame.draw.circle(screen, 'blue', (xz_bx,xz_bz), 3)
-        
-            pygame.draw.rect(screen, 'black', (750,50,600,300), width=1) #borders
-            pygame.draw.rect(screen, 'pink', (725,150,25,100))     #goal1
-            pygame.draw.rect(screen, 'orange', (1350,150,25,100))     #goal2
+            rects.append(pygame.draw.circle(screen, paddle1.color, (xz_p1x, xz_p1z), paddle1.radius))
+            rects.append(pygame.draw.circle(screen, paddle2.color, (xz_p2x, xz_p2z), paddle2.radius))
+            rects.append(pygame.draw.circle(screen, 'blue', (xz_bx,xz_bz), 3))
             
             # YZ
-            pygame.draw.circle(screen, paddle1.color, (yz_p1y, yz_p1z), paddle1.radius)
-            pygame.draw.circle(screen, paddle2.color, (yz_p2y, yz_p2z), paddle2.radius)
-            pygame.draw.circle(screen, 'blue', (yz_by, yz_bz), 3)
-            
-            pygame.draw.rect(screen, 'black', (1450,50,300,300), width=1) #borders
-            pygame.draw.rect(screen, 'brown', (1550,150,100,100), width=1)
+            rects.append(pygame.draw.circle(screen, paddle1.color, (yz_p1y, yz_p1z), paddle1.radius))
+            rects.append(pygame.draw.circle(screen, paddle2.color, (yz_p2y, yz_p2z), paddle2.radius))
+            rects.append(pygame.draw.circle(screen, 'blue', (yz_by, yz_bz), 3))
         
             if mode_4d:
                 # XW
-                pygame.draw.circle(screen, paddle1.color, (xw_p1x, xw_p1w), paddle1.radius)
-                pygame.draw.circle(screen, paddle2.color, (xw_p2x, xw_p2w), paddle2.radius)
-                pygame.draw.circle(screen, 'blue' , (xw_bx, xw_bw), 3)
-                
-                pygame.draw.rect(screen, 'black', (50,450,600,300), width=1) #borders
-                pygame.draw.rect(screen, 'pink', (25,550,25,100))     #goal1
-                pygame.draw.rect(screen, 'orange', (650,550,25,100))     #goal2
+                rects.append(pygame.draw.circle(screen, paddle1.color, (xw_p1x, xw_p1w), paddle1.radius))
+                rects.append(pygame.draw.circle(screen, paddle2.color, (xw_p2x, xw_p2w), paddle2.radius))
+                rects.append(pygame.draw.circle(screen, 'blue' , (xw_bx, xw_bw), 3))
             
                 # YW
-                pygame.draw.circle(screen, paddle1.color, (yw_p1y, yw_p1w), paddle1.radius)
-                pygame.draw.circle(screen, paddle2.color, (yw_p2y, yw_p2w), paddle2.radius)
-                pygame.draw.circle(screen, 'blue', (yw_by, yw_bw), 3)
-            
-                pygame.draw.rect(screen, 'black', (750,450,300,300), width=1)
-                pygame.draw.rect(screen, 'brown', (850,550,100,100), width=1)
+                rects.append(pygame.draw.circle(screen, paddle1.color, (yw_p1y, yw_p1w), paddle1.radius))
+                rects.append(pygame.draw.circle(screen, paddle2.color, (yw_p2y, yw_p2w), paddle2.radius))
+                rects.append(pygame.draw.circle(screen, 'blue', (yw_by, yw_bw), 3))
             
                 # ZW
-                pygame.draw.circle(screen, paddle1.color, (zw_p1z, zw_p1w), paddle1.radius)
-                pygame.draw.circle(screen, paddle2.color, (zw_p2z, zw_p2w), paddle2.radius)
-                pygame.draw.circle(screen, 'blue', (zw_bz, zw_bw), 3)
-            
-                pygame.draw.rect(screen, 'black', (1450,450,300,300), width=1)
-                pygame.draw.rect(screen, 'brown', (1550,550,100,100), width=1)   
+                rects.append(pygame.draw.circle(screen, paddle1.color, (zw_p1z, zw_p1w), paddle1.radius))
+                rects.append(pygame.draw.circle(screen, paddle2.color, (zw_p2z, zw_p2w), paddle2.radius))
+                rects.append(pygame.draw.circle(screen, 'blue', (zw_bz, zw_bw), 3))
     
+        profiler.mark('draw')
     
         # SCORES
-        score_P1_surf = score_font.render(f'P1: {P1_points}', False, 'red')
-        score_P2_surf = score_font.render(f'P2: {P2_points}', False, 'yellow')    
-        screen.blit(score_P1_surf, (1200,500))
-        screen.blit(score_P2_surf, (1200,550))
+        score_P1_surf = text_cache.render(score_font, f'P1: {match.P1_points}', 'red')
+        score_P2_surf = text_cache.render(score_font, f'P2: {match.P2_points}', 'yellow')    
+        text_rects = [screen.blit(score_P1_surf, (1200,500)),
+                      screen.blit(score_P2_surf, (1200,550))]
     
         # COORDINATE DISPLAY
-        coord_P1_surf = coord_font.render(f'{paddle1.x}, {paddle1.y}, {paddle1.z}, {paddle1.w}', False, 'red')
-        coord_P2_surf = coord_font.render(f'{paddle2.x}, {paddle2.y}, {paddle2.z}, {paddle2.w}', False, 'yellow')  
-        coord_ball_surf = coord_font.render(f'{ball_coord_x}, {ball_coord_y}, {ball_coord_z}, {ball_coord_w}', False, 'blue') 
-        speed_ball_surf = coord_font.render(f'{ball_speed_x:.2f}, {ball_speed_y:.2f}, {ball_speed_z:.2f}, {ball_speed_w:.2f}', False, 'green') 
-        screen.blit(coord_P1_surf, (1200,660))
-        screen.blit(coord_P2_surf, (1200,680))
-        screen.blit(coord_ball_surf, (1200,700))
-        screen.blit(speed_ball_surf, (1200,720))
-    
-        #dimension labels
-        screen.blit(xy_X_surf, (60,350))
-        screen.blit(xy_Y_surf, (40,330))
-        screen.blit(xz_X_surf, (760,350))
-        screen.blit(xz_Z_surf, (740,330))
-        screen.blit(yz_Y_surf, (1460,350))
-        screen.blit(yz_Z_surf, (1440,330))
-    
-        screen.blit(xw_X_surf, (60,750))
-        screen.blit(xw_W_surf, (40,730))
-        screen.blit(yw_Y_surf, (760,750))
-        screen.blit(yw_W_surf, (740,730))
-        screen.blit(zw_Z_surf, (1460,750))
-        screen.blit(zw_W_surf, (1440,730))
-    
-    
-        # flip() the display to put your work on screen
-        pygame.display.flip()
-        clock.tick(60)  # limits FPS to 60
+        coord_P1_surf = text_cache.render(coord_font, f'{paddle1.x/unit:.0f}, {paddle1.y/unit:.0f}, {paddle1.z/unit:.0f}, {paddle1.w/unit:.0f}', 'red')
+        coord_P2_surf = text_cache.render(coord_font, f'{paddle2.x/unit:.0f}, {paddle2.y/unit:.0f}, {paddle2.z/unit:.0f}, {paddle2.w/unit:.0f}', 'yellow')  
+        coord_ball_surf = text_cache.render(coord_font, f'{self.ball_coord_x}, {self.ball_coord_y}, {self.ball_coord_z}, {self.ball_coord_w}', 'blue') 
+        speed_ball_surf = text_cache.render(coord_font, f'{self.ball_speed_x:.2f}, {self.ball_speed_y:.2f}, {self.ball_speed_z:.2f}, {self.ball_speed_w:.2f}', 'green') 
+        text_rects.append(screen.blit(coord_P1_surf, (1200,660)))
+        text_rects.append(screen.blit(coord_P2_surf, (1200,680)))
+        text_rects.append(screen.blit(coord_ball_surf, (1200,700)))
+        text_rects.append(screen.blit(speed_ball_surf, (1200,720)))
+        
+        for i, text in enumerate(status):
+            text_rects.append(screen.blit(text_cache.render(coord_font, text, 'black'), (1200, 605 + i*20)))
+        if profiler.overlay:
+            text_rects += profiler.draw_overlay(screen, coord_font)
+        profiler.mark('text')
+    
+        # static layout on top, put your work on screen
+        renderer.end(rects, text_rects)
+        profiler.mark('present')
+    
+    def draw_extra(self):
+        """Draw what a subclass adds under the paddles and the ball, returns
+        the rects. """
+        return []
+
+
+class PartyView(GameView):
+    """GameView that also draws the other balls of a PartyMatch, at their
+    last physics positions. They are all over the field, so the whole screen
+    is redrawn every frame. Each ball keeps one Rect per panel that is
+    updated in place. Building thousands of new position tuples every frame
+    used to trigger the garbage collector. """
+    
+    def __init__(self, match, profiler=None):
+        super().__init__(match, False, profiler)
+        surf = pygame.Surface((7, 7))
+        surf.fill('grey')
+        pygame.draw.circle(surf, 'blue', (3, 3), 3)
+        surf.set_colorkey('grey')
+        self.panels = {2: 1, 3: 3, 4: 6}[panel_dims(match.mode_3d, match.mode_4d)]
+        self.ball_rects = [[pygame.Rect(0, 0, 7, 7) for _ in range(self.panels)]
+                           for _ in match.balls[1:]]
+        self.blits = [(surf, rect) for rects in self.ball_rects for rect in rects]
+    
+    def draw_extra(self):
+        #top left corners, circle centers as in GameView.draw
+        balls, ball_rects = self.match.balls[1:], self.ball_rects
+        if self.panels == 6:
+            for b, (xy, xz, yz, xw, yw, zw) in zip(balls, ball_rects):
+                x, y, z, w = b.x, b.y, b.z, b.w
+                xy.x = 47 + x;   xy.y = 347 - y
+                xz.x = 747 + x;  xz.y = 347 - z
+                yz.x = 1447 + y; yz.y = 347 - z
+                xw.x = 47 + x;   xw.y = 747 - w
+                yw.x = 747 + y;  yw.y = 747 - w
+                zw.x = 1447 + z; zw.y = 747 - w
+        elif self.panels == 3:
+            for b, (xy, xz, yz) in zip(balls, ball_rects):
+                x, y, z = b.x, b.y, b.z
+                xy.x = 47 + x;   xy.y = 347 - y
+                xz.x = 747 + x;  xz.y = 347 - z
+                yz.x = 1447 + y; yz.y = 347 - z
+        else:
+            for b, (xy,) in zip(balls, ball_rects):
+                xy.x = 47 + b.x; xy.y = 347 - b.y
+        screen.blits(self.blits, False)
+        return []
+
+
+class TeamView(GameView):
+    """GameView that also draws the other paddles of a TeamMatch, at their
+    last physics positions. """
+    
+    def draw_extra(self):
+        match = self.match
+        mode_3d, mode_4d = match.mode_3d, match.mode_4d
+        r, first = match.radius, (0, match.team_size)
+        rects = []
+        for i, (x, y, z, w) in enumerate(match.centers()):
+            if i in first:
+                continue #drawn by GameView
+            color = match.paddles[i].color
+            rects.append(pygame.draw.circle(screen, color, (50 + x, 350 - y), r))
+            if mode_3d:
+                rects.append(pygame.draw.circle(screen, color, (750 + x, 350 - z), r))
+                rects.append(pygame.draw.circle(screen, color, (1450 + y, 350 - z), r))
+                if mode_4d:
+                    rects.append(pygame.draw.circle(screen, color, (50 + x, 750 - w), r))
+                    rects.append(pygame.draw.circle(screen, color, (750 + y, 750 - w), r))
+                    rects.append(pygame.draw.circle(screen, color, (1450 + z, 750 - w), r))
+        return rects
+
+
+def run_game(game_mode, speed, mode_3d, mode_4d, physics_rate=PHYSICS_RATE, fps=RENDER_FPS,
+             dirty_rects=DIRTY_RECTS, cpu=False, party=False, team=1, backend=PHYSICS_BACKEND):
+    """Actual game. In 2D mode, w and z values are locked. In 3D w is locked.
+    Physics runs at fixed physics_rate, independent of the frame rate, and
+    drawn positions are interpolated between the last two physics states.
+    With cpu the computer plays player 2, see policies.Predict. party plays
+    with PARTY_BALLS balls at PARTY_RATE and is not recorded. team > 1 plays
+    team paddles a side, TEAM_KEYS says which are played from the keyboard,
+    also not recorded. backend is the physics of a normal game, party and
+    team mode have their own. """
+
+    back_to_start = False #ESC returns to start menu, closing window shuts down
+    
+    
     
+    if party:
+        physics_rate = PARTY_RATE
+        match = PartyMatch(PARTY_BALLS, speed, mode_3d, mode_4d, tick_rate=physics_rate)
+    elif team > 1:
+        match = TeamMatch(team, speed, mode_3d, mode_4d, tick_rate=physics_rate)
     else:
+        match = backends.make_match('fixed' if FIXED_POINT else backend, speed, mode_3d, mode_4d,
+                                    tick_rate=physics_rate)
+    timestep = FixedTimestep(physics_rate)
+    prev_positions = match.positions()
+    
+    #key map of every paddle, team 1 first, None when the computer plays it
+    paddles = match.paddles if team > 1 else (match.paddle1, match.paddle2)
+    half = len(paddles) // 2
+    key_maps = [None if cpu and side else TEAM_KEYS[side].get(k)
+                for side in (0, 1) for k in range(half)]
+    computer = TeamPredict if team > 1 else Predict
+    computers = [(i, computer(match, i // half, random.Random(), paddles[i]))
+                 for i, key_map in enumerate(key_maps) if key_map is None]
+    
+    profiler = FrameProfiler(log_path=PROFILE_LOG) #times each phase of the frame
+    if party:
+        view = PartyView(match, profiler)
+    elif team > 1:
+        view = TeamView(match, dirty_rects, profiler)
+    else:
+        view = GameView(match, dirty_rects, profiler)
+    
+    recorder = None
+    if REPLAY_DIR and not party and team == 1:
+        recorder = ReplayRecorder(new_replay_path(REPLAY_DIR), match)
+    
+    running = True
+    while running:
+        profiler.start_frame()
+        # pygame.QUIT event means the user clicked X to close your window
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle_overlay()
+                view.invalidate()
+    
+        keys = pygame.key.get_pressed()
+        if keys[pygame.K_ESCAPE]:
+            running = False
+            back_to_start = True
+        
+        inputs = [read_input(keys, key_map) if key_map else 0 for key_map in key_maps]
+        profiler.mark('input')
+        goal = 0
+        pairs = steps = 0
+        for _ in range(timestep.advance()):
+            prev_positions = match.positions()
+            for i, computer in computers:
+                inputs[i] = computer.act()
+            if recorder:
+                recorder.record(inputs)
+            goal = match.step(inputs) or goal
+            if party:
+                pairs += match.pairs
+                steps += 1
+        if goal:
+            prev_positions = match.positions() #no sliding from goal to center
+        
+        profiler.mark('physics')
+        
+        status = ()
+        if party:
+            #goals all the time, no blinking
+            goal = 0
+            status = (f'{len(match.balls)} BALLS',
+                      f'BROADPHASE PAIRS {pairs} PER FRAME, OF {2 * len(match.balls) * steps}')
+        #ball and paddle positions to draw, between last two physics steps
+        view.draw(lerp(prev_positions, match.positions(), timestep.alpha), goal, status)
+        profiler.end_frame()
+        clock.tick(fps)  # limits FPS, physics is not tied to it
+    
+    else:
+        profiler.close()
+        if recorder:
+            recorder.close()
         return back_to_start
 
 
+def play_replay(path, fps=RENDER_FPS, dirty_rects=DIRTY_RECTS):
+    """Replay viewer. SPACE pauses, UP/DOWN change playback speed, LEFT/RIGHT
+    jump REPLAY_SEEK seconds, HOME goes to start, ESC quits. When playing
+    fast only the state after the last step of a frame is drawn. """
+    player = ReplayPlayer(path)
+    match = player.match
+    rate = match.tick_rate
+    pygame.display.set_caption(f"4D ballgame replay: {os.path.basename(path)}")
+    
+    timestep = FixedTimestep(rate)
+    view = GameView(match, dirty_rects)
+    prev_positions = match.positions()
+    speed_index = 0
+    paused = False
+    
+    running = True
+    while running:
+        seek_to = player.position
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                if event.key == pygame.K_UP:
+                    speed_index = min(speed_index + 1, len(REPLAY_SPEEDS) - 1)
+                if event.key == pygame.K_DOWN:
+                    speed_index = max(speed_index - 1, 0)
+                if event.key == pygame.K_RIGHT:
+                    seek_to += REPLAY_SEEK*rate
+                if event.key == pygame.K_LEFT:
+                    seek_to -= REPLAY_SEEK*rate
+                if event.key == pygame.K_HOME:
+                    seek_to = 0
+        
+        steps = timestep.advance() * REPLAY_SPEEDS[speed_index]
+        goal = 0
+        if seek_to != player.position:
+            player.seek(seek_to)
+            prev_positions = match.positions()
+        elif paused or player.done:
+            prev_positions = match.positions()
+        elif steps:
+            goal = player.advance(steps - 1)
+            prev_positions = match.positions()
+            goal = player.advance(1) or goal
+            if goal:
+                prev_positions = match.positions() #no sliding from goal to center
+        
+        seconds, total = player.position // rate, player.steps // rate
+        status = (f'REPLAY {REPLAY_SPEEDS[speed_index]}x' + (' PAUSED' if paused else ''),
+                  f'{seconds//60}:{seconds%60:02d} / {total//60}:{total%60:02d}')
+        view.draw(lerp(prev_positions, match.positions(), timestep.alpha), goal, status)
+        clock.tick(fps)
+    
+    player.close()
+
+
+def run_net_game(settings=None, join=None, port=net.PORT, fps=RENDER_FPS, dirty_rects=DIRTY_RECTS,
+                 rollback=NET_ROLLBACK):
+    """Lockstep or rollback network game. The host gives settings
+    (net.game_settings) and waits for the other player, the other one gives
+    the host address to join. Both play with either key set. Returns True to
+    go back to menu. """
+    session_class = RollbackSession if rollback else net.LockstepSession
+    sock = net.open_socket(port if join is None else 0)
+    if join is None:
+        waiting_text = f'Waiting for player 2 on port {port}...'
+    else:
+        waiting_text = f'Connecting to {join}:{port}...'
+    pygame.display.set_caption("4D ballgame - network")
+    screen.fill('darkgoldenrod1')
+    screen.blit(text_cache.render(fonts.get(30), waiting_text, 'black'), (600, 350))
+    screen.blit(text_cache.render(fonts.get(25), 'Cancel: ESC', 'black'), (600, 400))
+    pygame.display.flip()
+    
+    session = None
+    while session is None:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sock.close()
+                return False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                sock.close()
+                return True
+        if join is None:
+            session = net.accept(sock, settings, 0.05, session_class)
+        else:
+            session = net.connect(sock, (join, port), 0.25, session_class)
+    
+    match = session.match
+    timestep = FixedTimestep(session.settings['net_rate'])
+    view = GameView(match, dirty_rects)
+    prev_positions = match.positions()
+    last_tick = time.perf_counter()
+    pygame.display.set_caption(f"4D ballgame - network, player {session.player + 1}")
+    
+    recorder = None
+    if REPLAY_DIR:
+        recorder = ReplayRecorder(new_replay_path(REPLAY_DIR), match)
+        session.recorder = recorder
+    
+    back_to_start = False
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                running = False
+                back_to_start = True
+        
+        session.receive()
+        if session.closed and not session.ready():
+            running = False #other player left
+            back_to_start = True
+        
+        keys = pygame.key.get_pressed()
+        local_input = read_input(keys, P1_KEYS) | read_input(keys, P2_KEYS)
+        goal = 0
+        for _ in range(timestep.advance()):
+            if not session.ready():
+                timestep.reset() #wait for the other player, no catch-up after
+                break
+            prev_positions = match.positions()
+            goal = session.advance(local_input) or goal
+            last_tick = time.perf_counter()
+        if goal:
+            prev_positions = match.positions() #no sliding from goal to center
+        session.send()
+        
+        status = [f'NETWORK PLAYER {session.player + 1}']
+        if time.perf_counter() - last_tick > 0.25:
+            status.append('WAITING FOR OTHER PLAYER')
+        if session.desync is not None:
+            status.append(f'OUT OF SYNC AT TICK {session.desync}')
+        view.draw(lerp(prev_positions, match.positions(), timestep.alpha), goal, status)
+        clock.tick(fps)
+    
+    if session.closed:
+        session.close()
+    else:
+        session.finish()
+    if recorder:
+        recorder.close()
+    return back_to_start
+
+
 #*********************************************
 
 #Setup and start the game.
-pygame.init()
-screen = pygame.display.set_mode((1800, 800))
-clock = pygame.time.Clock()
-pygame.display.set_caption("4D ballgame")
-
-#4d Set 1900x100 screen and 600x300x300x300 field, goal 100x100x100
-
-speedx10 = 40 #ball speed x10 to avoid floats
-
-running = True
-while running:
-    game_mode, speedx10 = start_screen(speedx10)
-    
-    if game_mode == 0:
-        mode_3d = True
-        mode_4d = True
-    if game_mode == 1:
-        mode_3d = True
-        mode_4d = False
-    elif game_mode == 2:
-        mode_3d = False
-        mode_4d = False
-    
-    if game_mode != 3 : # 3 is quit
-        running = run_game(game_mode, speedx10/10, mode_3d, mode_4d)
-    else:
+if __name__ == '__main__':
+    pygame.init()
+    screen = pygame.display.set_mode((1800, 800))
+    clock = pygame.time.Clock()
+    pygame.display.set_caption("4D ballgame")
+    
+    #4d Set 1900x100 screen and 600x300x300x300 field, goal 100x100x100
+    
+    speedx10 = 40 #ball speed x10 to avoid floats
+    
+    parser = argparse.ArgumentParser(description='4D ballgame')
+    parser.add_argument('replay', nargs='?', help='replay file to watch')
+    parser.add_argument('--host', action='store_true', help='host a game over the network')
+    parser.add_argument('--join', metavar='ADDRESS', help='join a network game')
+    parser.add_argument('--port', type=int, default=net.PORT)
+    parser.add_argument('--rollback', action='store_true', default=NET_ROLLBACK,
+                        help='network game predicts the other player instead of waiting')
+    parser.add_argument('--physics', default=PHYSICS_BACKEND,
+                        choices=list(backends.FLOAT_BACKENDS) + ['swept', 'fastest'],
+                        help='physics backend, fastest times the fast ones available here')
+    args = parser.parse_args()
+    
+    backend = args.physics
+    if backend == 'fastest':
+        backend, rates = backends.fastest()
+        print('Physics backend: ' + backend + ', '
+              + ', '.join(f'{name} {rate:,.0f}' for name, rate in rates.items()) + ' steps/s')
+    elif backend not in backends.available([backend]):
+        parser.error(f'physics backend {backend} is not available here')
+    
+    cpu = CPU_PLAYER2
+    party = False
+    team = 1
+    running = True
+    if args.replay:
+        play_replay(args.replay)
         running = False
-
-pygame.quit()
+    if args.join:
+        run_net_game(join=args.join, port=args.port, rollback=args.rollback)
+        running = False
+    while running:
+        game_mode, speedx10, cpu, party, team = start_screen(speedx10, cpu, party, team)
+        
+        if game_mode != 3 : # 3 is quit
+            mode_3d, mode_4d = mode_flags(game_mode)
+            if args.host:
+                delay = ROLLBACK_DELAY if args.rollback else net.INPUT_DELAY
+                settings = net.game_settings(speedx10/10, mode_3d, mode_4d, PHYSICS_RATE,
+                                             delay=delay)
+                running = run_net_game(settings, port=args.port, rollback=args.rollback)
+            else:
+                running = run_game(game_mode, speedx10/10, mode_3d, mode_4d, cpu=cpu, party=party,
+                                   team=team, backend=backend)
+        else:
+            running = False
+    
+    pygame.quit()
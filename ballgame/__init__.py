@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+4D ballgame simulation package. The pygame front-end is 4D_ballgame.py.
+
+"""
+
+from .engine import (Ball, Paddle, Match, DIRECTIONS, DIR_BITS,
+                     NO_GOAL, P1_GOAL, P2_GOAL)
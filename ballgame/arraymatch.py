@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Match with its state in one float array, base of the array physics
+backends, see backends.py.
+
+s holds, in get_state order:
+    s[0:4]    ball x,y,z,w
+    s[4:8]    ball speed
+    s[8:12]   paddle1 x,y,z,w
+    s[12:16]  paddle2 x,y,z,w
+ball, paddle1 and paddle2 are views of their part of s with the attributes
+of Ball and Paddle, for the views, replays and policies. Frame and points
+stay Python ints on the match.
+
+NumpyMatch steps a one-match batch.BatchMatch whose arrays are views into
+s, like env.VectorEnv does with its observations. Same physics as Match,
+float for float.
+
+Needs numpy, like batch.py.
+
+"""
+
+import numpy as np
+
+from .engine import Match, CENTER, PADDLE_RADIUS, BASE_RATE, P1_GOAL, P2_GOAL
+from .batch import BatchMatch
+
+
+def array_property(offset):
+    """Attribute that is element self.i + offset of the array self.s. """
+    def get(self):
+        return self.s[self.i + offset]
+    def set(self, value):
+        self.s[self.i + offset] = value
+    return property(get, set)
+
+
+class ArrayBall():
+    """Ball view of s[0:8]. """
+
+    x, y, z, w, sx, sy, sz, sw = (array_property(k) for k in range(8))
+
+    def __init__(self, s, start_speed):
+        self.s = s
+        self.i = 0
+        self.start_speed = start_speed
+
+    def reset(self):
+        self.s[0:8] = CENTER + (0, self.start_speed, 0, 0)
+
+
+class ArrayPaddle():
+    """Paddle view of s[i:i+4]. """
+
+    x, y, z, w = (array_property(k) for k in range(4))
+
+    def __init__(self, s, i, paddle):
+        self.s = s
+        self.i = i
+        self.radius = paddle.radius
+        self.color = paddle.color
+        self.speed = paddle.speed
+
+
+class ArrayMatch(Match):
+    """Match state in the array s. Subclasses implement step() with
+    advance(), which returns the goal. """
+
+    def __init__(self, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE):
+        super().__init__(speed, mode_3d, mode_4d, paddle_radius, tick_rate)
+        self.s = np.array(super().get_state()[1:17], dtype=np.float64)
+        self.ball = ArrayBall(self.s, self.ball.start_speed)
+        self.paddle1 = ArrayPaddle(self.s, 8, self.paddle1)
+        self.paddle2 = ArrayPaddle(self.s, 12, self.paddle2)
+        self.radius = float(paddle_radius)
+
+    def step(self, inputs=(0, 0)):
+        """Advance the game one frame, see Match.step. """
+        goal = self.advance(inputs)
+        self.frame += 1
+        if goal == P1_GOAL:
+            self.P1_points += 1
+        elif goal == P2_GOAL:
+            self.P2_points += 1
+        return goal
+
+    def positions(self):
+        s = self.s.tolist()
+        return tuple(s[0:4] + s[8:16])
+
+    def get_state(self):
+        return (self.frame,) + tuple(self.s.tolist()) + (self.P1_points, self.P2_points)
+
+    def set_state(self, state):
+        self.frame = state[0]
+        self.s[:] = state[1:17]
+        self.P1_points, self.P2_points = state[17:19]
+
+
+class NumpyMatch(ArrayMatch):
+    """Match stepped by batch.BatchMatch. """
+
+    def __init__(self, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE):
+        super().__init__(speed, mode_3d, mode_4d, paddle_radius, tick_rate)
+        self.batch = batch = BatchMatch(1, speed, mode_3d, mode_4d, paddle_radius, tick_rate)
+        s = self.s
+        batch.pos = s[None, 0:4]
+        batch.vel = s[None, 4:8]
+        batch.paddles = s[8:16].reshape(1, 2, 4) #a view, s is contiguous
+        self.inputs = np.zeros((1, 2), dtype=np.uint8)
+
+    def advance(self, inputs):
+        if inputs[0] or inputs[1]:
+            self.inputs[0] = inputs[0], inputs[1]
+            return int(self.batch.step(self.inputs)[0])
+        return int(self.batch.step()[0])
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Physics backends, chosen at run time:
+
+    python  engine.Match, Ball and Paddle objects
+    numpy   arraymatch.NumpyMatch, batch.BatchMatch on one match, reference
+    numba   jit.NumbaMatch, the step compiled by numba, if it is installed
+    nd      nd.NMatch, only the axes played, __slots__ objects
+    fixed   fixed.FixedMatch, integer physics
+    swept   sweep.SweptMatch, swept collisions for high ball speeds
+
+All are made the same way, make_match(name, speed, mode_3d, mode_4d,
+paddle_radius, tick_rate), and have the interface of Match that run_game,
+the views, replays and policies use: step(), positions(), get_state(),
+set_state(), ball, paddle1 and paddle2 with the attributes of Ball and
+Paddle, the points and frame, and the settings.
+
+python, numpy, numba and nd play the same float physics with the same
+float operations, so they give the same results, which golden.py checks.
+fixed and swept are different physics on purpose, for network games and
+for ball speeds where the ball would pass through a paddle in one step.
+
+numpy is a reference backend, not a fast one: it plays the batched engine
+of batch.BatchMatch on one match, so golden.py checks that engine against
+the others, and pays numpy's per-call overhead on arrays of 4 values,
+which makes it many times slower than python. fastest() leaves it out.
+bench.py times all backends.
+
+A backend is imported when first used, so numpy and numba are needed only
+by the backends that use them. available() lists the backends that import
+here and fastest() times the SPEED_BACKENDS among them.
+
+"""
+
+import importlib, time
+
+from .engine import mode_flags
+
+
+#name: module, class
+BACKENDS = {'python': ('.engine', 'Match'), 'numpy': ('.arraymatch', 'NumpyMatch'),
+            'numba': ('.jit', 'NumbaMatch'), 'nd': ('.nd', 'NMatch'),
+            'fixed': ('.fixed', 'FixedMatch'), 'swept': ('.sweep', 'SweptMatch')}
+FLOAT_BACKENDS = ('python', 'numpy', 'numba', 'nd')
+SPEED_BACKENDS = ('python', 'numba', 'nd') #float backends that can be faster than python
+
+
+def load(name):
+    """Match class of backend name. Raises ImportError if it can not be
+    used here. """
+    if name not in BACKENDS:
+        raise ValueError(f'unknown physics backend {name}')
+    module, cls = BACKENDS[name]
+    return getattr(importlib.import_module(module, __package__), cls)
+
+
+def available(names=BACKENDS):
+    """Names of the backends of names that can be used here. """
+    found = []
+    for name in names:
+        try:
+            load(name)
+        except ImportError:
+            continue
+        found.append(name)
+    return found
+
+
+def name_of(match):
+    """Backend name of match, None if it is no backend's match class. """
+    cls = type(match)
+    for name, (module, cls_name) in BACKENDS.items():
+        if cls.__name__ == cls_name and cls.__module__ == __package__ + module:
+            return name
+    return None
+
+
+def make_match(name, *args, **kwargs):
+    """New match of backend name, arguments as for Match. """
+    return load(name)(*args, **kwargs)
+
+
+def fastest(names=SPEED_BACKENDS, steps=2000, game_mode=0, tick_rate=240):
+    """(name, {name: steps per second}) of the fastest available backend of
+    names, timed on steps steps of a match with moving paddles. By default
+    only the SPEED_BACKENDS are timed. """
+    rates = {}
+    for name in available(names):
+        match = make_match(name, 4, *mode_flags(game_mode), tick_rate=tick_rate)
+        match.step((4, 8)) #compiles numba
+        t = time.perf_counter()
+        for i in range(steps):
+            match.step((4, 8) if i & 128 else (8, 4))
+        rates[name] = steps / (time.perf_counter() - t)
+    return max(rates, key=rates.get), rates
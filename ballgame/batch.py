@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy batched engine, steps N independent matches at once.
+
+Same rules and same order of operations as engine.Match, but the state of
+all matches is held in arrays:
+    pos      (N, 4)     ball x,y,z,w
+    vel      (N, 4)     ball speed
+    paddles  (N, 2, 4)  paddle 1 and paddle 2 centers
+    points   (N, 2)     P1 and P2 points
+Results match the scalar Ball/Paddle classes within float tolerance.
+
+Needs numpy, the scalar engine does not.
+
+"""
+
+import numpy as np
+
+from .engine import (FIELD, CENTER, GOAL_LOW, GOAL_HIGH, PADDLE_RADIUS, BASE_RATE,
+                     P1_GOAL, P2_GOAL)
+
+
+FIELD_MAX = np.array(FIELD, dtype=np.float64)
+PADDLE_MIN = -50.0
+PADDLE_MAX = FIELD_MAX + 50
+BIT_SHIFTS = np.arange(8, dtype=np.uint8)
+
+
+class BatchMatch():
+    """N matches advanced together. In 2D mode, w and z values are locked.
+    In 3D w is locked. """
+
+    def __init__(self, n, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE):
+        self.n = n
+        self.speed_scale = BASE_RATE / tick_rate
+        self.start_speed = speed * self.speed_scale
+        self.mode_3d = mode_3d
+        self.mode_4d = mode_4d
+        self.radius = float(paddle_radius)
+        self.pos = np.empty((n, 4))
+        self.vel = np.empty((n, 4))
+        self.paddles = np.empty((n, 2, 4))
+        self.points = np.zeros((n, 2), dtype=np.int64)
+        self.goals = np.zeros(n, dtype=np.int8)
+        self.frame = 0
+        self.reset()
+
+    def reset(self):
+        """Restart all matches. """
+        self.reset_balls(slice(None))
+        self.paddles[:, 0] = (100, 150, 150, 150)
+        self.paddles[:, 1] = (500, 150, 150, 150)
+        self.points[:] = 0
+        self.frame = 0
+
+    def reset_balls(self, idx):
+        """Reset ball position and speed of matches idx. """
+        self.pos[idx] = CENTER
+        self.vel[idx] = (0, self.start_speed, 0, 0)
+
+    def move_paddles(self, inputs):
+        """inputs is (N, 2) array of direction bitmasks. Positive move is
+        applied before negative move, as in Paddle.apply_input. """
+        bits = (np.asarray(inputs, dtype=np.uint8)[..., None] >> BIT_SHIFTS) & 1
+        if self.speed_scale != 1:
+            bits = bits * self.speed_scale
+        paddles = self.paddles
+        paddles += bits[..., 0::2]
+        np.clip(paddles, PADDLE_MIN, PADDLE_MAX, out=paddles)
+        paddles -= bits[..., 1::2]
+        np.clip(paddles, PADDLE_MIN, PADDLE_MAX, out=paddles)
+
+    def move_balls(self):
+        """Ball.move for all matches: move, clamp to field and reflect from
+        walls that were reached. """
+        pos, vel = self.pos, self.vel
+        pos += vel
+        np.clip(pos, 0, FIELD_MAX, out=pos)
+        hit = (pos >= FIELD_MAX) | (pos <= 0)
+        np.negative(vel, out=vel, where=hit)
+
+    def lock_axes(self):
+        """In 3D or 2D mode, lock extra coordinates to center. """
+        if not self.mode_4d:
+            self.pos[:, 3] = 150
+            self.paddles[:, :, 3] = 150
+        if not self.mode_3d:
+            self.pos[:, 2] = 150
+            self.paddles[:, :, 2] = 150
+
+    def collide(self):
+        """Paddle.collision and Ball.bounce, paddle 1 first. Only matches
+        where the ball is inside a paddle are touched. """
+        pos, vel = self.pos, self.vel
+        r = self.radius
+        for k in (0, 1):
+            d = self.paddles[:, k] - pos
+            d *= d
+            #summed in same order as Paddle.collision
+            dist = r - np.sqrt(d[:, 0] + d[:, 1] + d[:, 2] + d[:, 3])
+            idx = np.flatnonzero(dist >= 0)
+            if idx.size == 0:
+                continue
+            depth = dist[idx, None]
+            n = (pos[idx] - self.paddles[idx, k]) / (r - depth)
+            v = vel[idx]
+            v_dot_n = v[:, 0]*n[:, 0] + v[:, 1]*n[:, 1] + v[:, 2]*n[:, 2] + v[:, 3]*n[:, 3]
+            vel[idx] = v - 2*v_dot_n[:, None]*n
+            pos[idx] = np.clip(pos[idx] + depth*n, 0, FIELD_MAX)
+
+    def check_goals(self):
+        """Score and reset balls that are in a goal. Fills self.goals with
+        P1_GOAL, P2_GOAL or NO_GOAL per match. """
+        pos = self.pos
+        mouth = pos[:, 1:]
+        in_mouth = ((mouth > GOAL_LOW) & (mouth < GOAL_HIGH)).all(axis=1)
+        p2 = in_mouth & (pos[:, 0] <= 0)
+        p1 = in_mouth & (pos[:, 0] >= FIELD_MAX[0]) & ~p2
+        goals = self.goals
+        goals[:] = 0
+        goals[p1] = P1_GOAL
+        goals[p2] = P2_GOAL
+        if p1.any() or p2.any():
+            self.points[:, 0] += p1
+            self.points[:, 1] += p2
+            self.reset_balls(p1 | p2)
+        return goals
+
+    def step(self, inputs=None):
+        """Advance all matches one frame. inputs is an (N, 2) array of
+        direction bitmasks or None for no input. Returns the goals array,
+        which is reused between calls. """
+        if inputs is not None:
+            self.move_paddles(inputs)
+        self.move_balls()
+        self.lock_axes()
+        self.collide()
+        self.frame += 1
+        return self.check_goals()
+
+    def run(self, frames, inputs=None):
+        """Step frames times with constant inputs. Returns total goals
+        scored per match as (N, 2) array. """
+        start = self.points.copy()
+        for _ in range(frames):
+            self.step(inputs)
+        return self.points - start
+
+    def get_state(self, i):
+        """State of match i as (ball pos, ball speed, paddle1, paddle2) tuples,
+        comparable with the scalar engine. """
+        return (tuple(self.pos[i]), tuple(self.vel[i]),
+                tuple(self.paddles[i, 0]), tuple(self.paddles[i, 1]))
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the physics and rendering hot paths.
+
+    python -m ballgame.bench run [--quick] [--save FILE]
+    python -m ballgame.bench compare BASELINE [NEW] [--threshold 0.1]
+
+run measures, by result name:
+    ball.*, paddle.*  physics kernels: move, bounce, collision
+    match.step/*      a full Match.step at several ball speeds in 2D/3D/4D
+    fixed.*           the same for fixed-point physics
+    sweep.step/*      the same for swept collisions, sweep.SweptMatch
+    events.*          events.run_events against Match.run in free flight
+    predict.*         trajectory predictor and computer player
+    rollback.*        snapshots and worst-case re-simulation
+    env.*             training environment, needs numpy
+    party.*           1000 ball party mode with and without the broadphase
+    team.*            team mode 1v1 to 8v8, Paddle loop and numpy array pass;
+                      the size where the array gets faster is saved as
+                      team_crossover
+    backend.step/*    every physics backend here, fastest saved as fastest_backend
+    nd.step/*         dimension-generic engine from 2D to 6D
+    frame/*           full run_game frames under SDL's dummy video driver:
+                      time percentiles and memory allocated per frame
+--save writes the results as JSON for use as a baseline.
+
+compare checks results against a saved baseline, NEW file or a fresh run,
+and exits with status 1 if anything got slower than the threshold.
+
+"""
+
+import argparse, gc, importlib.util, itertools, json, os, pathlib, platform, random, socket, sys
+import time
+import tracemalloc
+
+from .engine import Ball, Paddle, Match, mode_flags
+from .fixed import FixedBall, FixedPaddle, FixedMatch, to_fixed
+from .net import game_settings
+from .rollback import RollbackSession, MAX_ROLLBACK
+from .predict import intercept
+from .policies import Predict
+from .party import PartyMatch
+from .backends import FLOAT_BACKENDS, available, make_match
+from .nd import NMatch
+from .sweep import SweptMatch
+from . import events
+
+
+SPEEDS = (4, 20, 100)
+MODES = (('4d', 0), ('3d', 1), ('2d', 2))
+GAME_SCRIPT = pathlib.Path(__file__).resolve().parent.parent / '4D_ballgame.py'
+
+
+def rate(fn, n, repeat=15):
+    """Best calls per second of fn() over repeat rounds of n calls. """
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, time.perf_counter() - t)
+    return n / best
+
+
+def result(value, unit, higher_is_better=True):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def physics_benchmarks(quick=False):
+    """Steps per second of physics kernels. """
+    n = 2000 if quick else 5000
+    res = {}
+
+    ball = Ball(4)
+    ball.sx, ball.sy, ball.sz, ball.sw = 3.1, 2.3, 1.7, 1.1
+    res['ball.move'] = result(rate(ball.move, n), 'steps/s')
+
+    paddle = Paddle(100, 150, 150, 150, 40, 'red')
+    res['paddle.collision'] = result(rate(lambda: paddle.collision(110, 160, 150, 150), n), 'steps/s')
+    res['paddle.move'] = result(rate(lambda: paddle.move('yp') or paddle.move('yn'), n // 2) * 2,
+                                'steps/s')
+
+    def bounce():
+        ball.x, ball.y, ball.z, ball.w = 130, 150, 150, 150
+        ball.sx, ball.sy, ball.sz, ball.sw = -4, 0, 0, 0
+        dist = paddle.collision(ball.x, ball.y, ball.z, ball.w)
+        ball.bounce(paddle.x, paddle.y, paddle.z, paddle.w, dist, paddle.radius)
+    paddle.x = 100
+    res['ball.bounce'] = result(rate(bounce, n), 'steps/s')
+
+    fball = FixedBall(to_fixed(4))
+    fball.sx, fball.sy, fball.sz, fball.sw = map(to_fixed, (3.1, 2.3, 1.7, 1.1))
+    res['fixed.ball.move'] = result(rate(fball.move, n), 'steps/s')
+
+    fpaddle = FixedPaddle(100, 150, 150, 150, 40, 'red')
+    bx, by, bz, bw = map(to_fixed, (110, 160, 150, 150))
+    res['fixed.paddle.collision'] = result(rate(lambda: fpaddle.collision(bx, by, bz, bw), n),
+                                           'steps/s')
+
+    def fixed_bounce():
+        fball.x, fball.y, fball.z, fball.w = map(to_fixed, (130, 150, 150, 150))
+        fball.sx, fball.sy, fball.sz, fball.sw = to_fixed(-4), 0, 0, 0
+        dist = fpaddle.collision(fball.x, fball.y, fball.z, fball.w)
+        fball.bounce(fpaddle.x, fpaddle.y, fpaddle.z, fpaddle.w, dist, fpaddle.r)
+    res['fixed.ball.bounce'] = result(rate(fixed_bounce, n), 'steps/s')
+
+    ball.x, ball.y, ball.z, ball.w = 300, 150, 150, 150
+    ball.sx, ball.sy, ball.sz, ball.sw = 3.1, 2.3, 1.7, 1.1
+    res['predict.intercept'] = result(rate(lambda: intercept(ball, 500), n), 'calls/s')
+    match = Match()
+    match.ball.sx = 3.1 #towards paddle2, predicts every look
+    cpu = Predict(match, 1, random.Random(1))
+    cpu.reaction = 1
+    res['predict.cpu.act'] = result(rate(cpu.act, n), 'calls/s')
+
+    for prefix, cls in (('match', Match), ('fixed', FixedMatch), ('sweep', SweptMatch)):
+        for name, game_mode in MODES:
+            for speed in SPEEDS:
+                match = cls(speed, *mode_flags(game_mode))
+                #paddles hunt up and down so bounces happen
+                inputs = ((4, 8), (8, 4))
+                frame = [0]
+                def step():
+                    frame[0] += 1
+                    match.step(inputs[frame[0] // 120 % 2])
+                res[f'{prefix}.step/{name}/speed{speed}'] = result(rate(step, n), 'steps/s')
+    return res
+
+
+def events_benchmarks(quick=False):
+    """Frames per second of events.run_events and Match.run on a served
+    ball bouncing between the y walls with idle paddles, and the speedup. """
+    res = {}
+    frames = 2400
+    repeat = 3 if quick else 10
+    for name, game_mode in MODES:
+        plain = Match(4, *mode_flags(game_mode), tick_rate=240)
+        skipping = Match(4, *mode_flags(game_mode), tick_rate=240)
+        loop = rate(lambda: plain.run(frames), 1, repeat) * frames
+        skip = rate(lambda: events.run_events(skipping, frames), 1, repeat) * frames
+        res[f'events.run/{name}'] = result(skip, 'frames/s')
+        res[f'events.match_run/{name}'] = result(loop, 'frames/s')
+        res[f'events.speedup/{name}'] = result(skip / loop, 'x')
+    return res
+
+
+def rollback_benchmarks(quick=False):
+    """Snapshot save and restore rates, and the time to roll back the
+    most ticks, which a frame may have to do on top of its own ticks. """
+    n = 2000 if quick else 5000
+    res = {}
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    session = RollbackSession(sock, ('127.0.0.1', 9), 0, game_settings(speed=20, delay=1))
+    ring, match = session.ring, session.match
+    res['rollback.snapshot'] = result(rate(lambda: ring.save(3, match), n), 'snapshots/s')
+    res['rollback.restore'] = result(rate(lambda: ring.restore(3, match), n), 'restores/s')
+
+    #no remote inputs arrive, so all ticks after the first stay predicted
+    for i in range(MAX_ROLLBACK + 1):
+        session.advance((4, 8)[i // 4 % 2])
+    times = []
+    for _ in range(100 if quick else 300):
+        t = time.perf_counter()
+        session.resimulate(session.tick - MAX_ROLLBACK)
+        times.append((time.perf_counter() - t) * 1000)
+    for p in (50, 99):
+        res[f'rollback.resimulate{MAX_ROLLBACK}/p{p}'] = result(percentile(times, p), 'ms', False)
+    res[f'rollback.resimulate{MAX_ROLLBACK}/max'] = result(max(times), 'ms', False)
+    sock.close()
+    return res
+
+
+def party_benchmarks(quick=False):
+    """Steps per second of a 1000 ball PartyMatch in 4D, broadphase against
+    testing all pairs, and pairs tested per step. """
+    res = {}
+    n = 50 if quick else 200
+    for name, broadphase in (('grid', True), ('brute', False)):
+        match = PartyMatch(1000, 4, tick_rate=120, seed=1, broadphase=broadphase)
+        pairs = [0]
+        def step():
+            match.step((4, 8))
+            pairs[0] += match.pairs
+        res[f'party.step/1000/{name}'] = result(rate(step, n, 3), 'steps/s')
+        res[f'party.pairs/1000/{name}'] = result(pairs[0] / (3 * n), 'pairs/step', False)
+    return res
+
+
+def team_benchmarks(quick=False):
+    """Steps per second of a 4D TeamMatch with 1 to 8 paddles a side, all
+    of them moving, stepped by the Paddle loop and by the array pass.
+    Empty without numpy. """
+    try:
+        from .team import TeamMatch, MAX_TEAM
+    except ImportError:
+        return {}
+    res = {}
+    n = 2000 if quick else 5000
+    rng = random.Random(1)
+    for size in range(1, MAX_TEAM + 1):
+        inputs = itertools.cycle([[rng.randrange(256) for _ in range(2 * size)] for _ in range(64)])
+        for name, vectorized in (('loop', False), ('array', True)):
+            match = TeamMatch(size, 4, vectorized=vectorized)
+            res[f'team.step/{size}v{size}/{name}'] = result(
+                rate(lambda: match.step(next(inputs)), n), 'steps/s')
+    return res
+
+
+def team_crossover(results):
+    """Smallest team size where the array pass beats the loop in
+    team_benchmarks results, None if it never does. """
+    sizes = sorted({int(k.split('/')[1].split('v')[0]) for k in results
+                    if k.startswith('team.step/')})
+    for size in sizes:
+        key = f'team.step/{size}v{size}/'
+        if results[key + 'array']['value'] > results[key + 'loop']['value']:
+            return size
+    return None
+
+
+def backend_benchmarks(quick=False):
+    """Steps per second of a 4D match at 240 Hz on each float physics
+    backend available here, see backends.py. """
+    res = {}
+    n = 2000 if quick else 5000
+    for name in available(FLOAT_BACKENDS):
+        match = make_match(name, 4, tick_rate=240)
+        match.step((4, 8)) #compiles numba
+        inputs = ((4, 8), (8, 4))
+        frame = [0]
+        def step():
+            frame[0] += 1
+            match.step(inputs[frame[0] // 480 % 2])
+        res[f'backend.step/{name}'] = result(rate(step, n), 'steps/s')
+    return res
+
+
+def nd_benchmarks(quick=False):
+    """Steps per second of nd.NMatch from 2 to 6 dimensions, paddles
+    moving on y as in the match.* benchmarks. """
+    res = {}
+    n = 2000 if quick else 5000
+    for dims in range(2, 7):
+        match = NMatch(4, dims=dims)
+        inputs = ((4, 8), (8, 4))
+        frame = [0]
+        def step():
+            frame[0] += 1
+            match.step(inputs[frame[0] // 120 % 2])
+        res[f'nd.step/{dims}d'] = result(rate(step, n), 'steps/s')
+    return res
+
+
+def fastest_backend(results):
+    """Name of the fastest backend in backend_benchmarks results. """
+    rates = {k.split('/')[1]: r['value'] for k, r in results.items()
+             if k.startswith('backend.step/')}
+    return max(rates, key=rates.get) if rates else None
+
+
+def env_benchmarks(quick=False):
+    """Environment steps per second of env.VectorEnv at a few batch
+    sizes. Empty without numpy. """
+    try:
+        import numpy as np
+        from .env import VectorEnv
+    except ImportError:
+        return {}
+    res = {}
+    for n in (16, 256):
+        env = VectorEnv(n)
+        actions = np.random.default_rng(1).integers(0, 256, n).astype(np.uint8)
+        res[f'env.step/{n}'] = result(rate(lambda: env.step(actions), 200 if quick else 500) * n,
+                                      'env steps/s')
+    return res
+
+
+def load_game():
+    """Import 4D_ballgame.py as a module, its main part does not run.
+    Replay recording is turned off, benchmarks write no files. """
+    spec = importlib.util.spec_from_file_location('ballgame_frontend', GAME_SCRIPT)
+    game = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(game)
+    game.REPLAY_DIR = None
+    return game
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run_frames(game, frames, game_mode, dirty, trace_alloc=False):
+    """Run run_game for frames frames, without frame rate cap. Returns frame
+    times in ms and bytes allocated per frame. """
+    import pygame
+
+    times, allocs = [], []
+    state = {'count': 0, 'last': None}
+
+    real_get, real_flip, real_update = pygame.event.get, pygame.display.flip, pygame.display.update
+
+    def get(*args, **kwargs):
+        events = real_get(*args, **kwargs)
+        if state['count'] >= frames:
+            events.append(pygame.event.Event(pygame.QUIT))
+        return events
+
+    def presented():
+        now = time.perf_counter()
+        if state['last'] is not None:
+            times.append((now - state['last']) * 1000)
+        state['last'] = now
+        state['count'] += 1
+        if trace_alloc:
+            current, peak = tracemalloc.get_traced_memory()
+            allocs.append(peak - state.get('start', current))
+            tracemalloc.reset_peak()
+            state['start'] = tracemalloc.get_traced_memory()[0]
+
+    pygame.event.get = get
+    pygame.display.flip = lambda: (real_flip(), presented())
+    pygame.display.update = lambda *args: (real_update(*args), presented())
+    try:
+        game.run_game(game_mode, 12.0, *mode_flags(game_mode), fps=0, dirty_rects=dirty)
+    finally:
+        pygame.event.get, pygame.display.flip, pygame.display.update = real_get, real_flip, real_update
+    return times, allocs
+
+
+def frame_benchmarks(quick=False):
+    """Frame time percentiles and allocations of full run_game frames. """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    game = load_game()
+    import pygame
+    pygame.init()
+    game.screen = pygame.display.set_mode((1800, 800))
+    game.clock = pygame.time.Clock()
+
+    frames = 60 if quick else 600
+    res = {}
+    for name, game_mode in MODES:
+        for dirty in (False, True):
+            key = f'frame/{name}/{"dirty" if dirty else "flip"}'
+            gc.collect()
+            times, _ = run_frames(game, frames, game_mode, dirty)
+            times = times[5:] #first frames build caches
+            for p in (50, 95, 99):
+                res[f'{key}/p{p}'] = result(percentile(times, p), 'ms', False)
+            tracemalloc.start()
+            _, allocs = run_frames(game, frames // 4, game_mode, dirty, trace_alloc=True)
+            tracemalloc.stop()
+            allocs = allocs[5:]
+            res[f'{key}/alloc'] = result(sum(allocs) / len(allocs) / 1024, 'KiB/frame', False)
+    pygame.quit()
+    return res
+
+
+def run_all(quick=False, physics=True, frames=True):
+    results = {}
+    if physics:
+        results.update(physics_benchmarks(quick))
+        results.update(events_benchmarks(quick))
+        results.update(rollback_benchmarks(quick))
+        results.update(env_benchmarks(quick))
+        results.update(party_benchmarks(quick))
+        results.update(team_benchmarks(quick))
+        results.update(backend_benchmarks(quick))
+        results.update(nd_benchmarks(quick))
+    if frames:
+        results.update(frame_benchmarks(quick))
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results,
+            'fastest_backend': fastest_backend(results), 'team_crossover': team_crossover(results)}
+
+
+def print_results(data):
+    for name, r in data['results'].items():
+        print(f'{name:40s} {r["value"]:14.3f} {r["unit"]}')
+    if data.get('fastest_backend'):
+        print(f'fastest physics backend: {data["fastest_backend"]}')
+    if data.get('team_crossover'):
+        print(f'team array pass faster from {data["team_crossover"]} paddles a side')
+
+
+def compare(base, new, threshold=0.1):
+    """Print change of each result. Returns names of results that got worse
+    by more than threshold. """
+    regressions = []
+    for name, b in base['results'].items():
+        n = new['results'].get(name)
+        if n is None:
+            continue
+        if b['value'] == 0:
+            continue
+        change = n['value'] / b['value'] - 1
+        worse = -change if b['higher_is_better'] else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:40s} {b["value"]:12.3f} -> {n["value"]:12.3f} {b["unit"]:10s} {change:+7.1%}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ballgame.bench', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_p = sub.add_parser('run', help='run benchmarks')
+    cmp_p = sub.add_parser('compare', help='compare against a saved baseline')
+    for p in (run_p, cmp_p):
+        p.add_argument('--quick', action='store_true', help='fewer iterations')
+        p.add_argument('--no-physics', action='store_true')
+        p.add_argument('--no-frames', action='store_true', help='skip pygame frame benchmarks')
+    run_p.add_argument('--save', metavar='FILE', help='save results as JSON baseline')
+    cmp_p.add_argument('baseline')
+    cmp_p.add_argument('new', nargs='?', help='saved results, default is a fresh run')
+    cmp_p.add_argument('--threshold', type=float, default=0.1,
+                       help='allowed slowdown, default 0.1 = 10%%')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        data = run_all(args.quick, not args.no_physics, not args.no_frames)
+        print_results(data)
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump(data, f, indent=1)
+        return 0
+
+    with open(args.baseline) as f:
+        base = json.load(f)
+    if args.new:
+        with open(args.new) as f:
+            new = json.load(f)
+    else:
+        new = run_all(args.quick, not args.no_physics, not args.no_frames)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f'{len(regressions)} regression(s)')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Headless simulation core of the 4D ballgame.
+
+Ball, paddles, goal detection and the 2D/3D axis locking, without pygame.
+A Match holds one game and is advanced one frame at a time with step(),
+so it can run as fast as the CPU allows, without a window or FPS cap.
+
+Player inputs are bitmasks of the eight paddle directions, see DIRECTIONS.
+
+"""
+
+import math
+
+
+#Playing field is 600x300x300x300 (x,y,z,w), goal mouth is 100<y,z,w<200
+FIELD = (600, 300, 300, 300)
+CENTER = (300, 150, 150, 150)
+GOAL_LOW = 100
+GOAL_HIGH = 200
+PADDLE_RADIUS = 40
+#Original game speed is one step per frame at 60 FPS
+BASE_RATE = 60
+
+#Paddle directions, bit i of a player's input mask means DIRECTIONS[i]
+DIRECTIONS = ('xp', 'xn', 'yp', 'yn', 'zp', 'zn', 'wp', 'wn')
+DIR_BITS = {d: 1 << i for i, d in enumerate(DIRECTIONS)}
+
+#step() return values
+NO_GOAL = 0
+P1_GOAL = 1
+P2_GOAL = 2
+
+
+class Ball():
+    def __init__(self, init_speed=4):
+        self.start_speed = init_speed
+        self.reset()
+
+    def reset(self):
+        """Reset ball position and speed. """
+        self.x = 300
+        self.y = 150
+        self.z = 150
+        self.w = 150
+
+        self.sx = 0
+        self.sy = self.start_speed
+        self.sz = 0
+        self.sw = 0
+
+    def move(self):
+        self.x += self.sx
+        self.y += self.sy
+        self.z += self.sz
+        self.w += self.sw
+        self.wall_check()
+
+        #Bounce from walls, field is 600x300x300x300
+        if self.x >= 600 or self.x <= 0:
+            self.sx = -self.sx
+        if self.y >= 300 or self.y <= 0:
+            self.sy = -self.sy
+        if self.z >= 300 or self.z <= 0:
+            self.sz = -self.sz
+        if self.w >= 300 or self.w <= 0:
+            self.sw = -self.sw
+
+    def wall_check(self):
+        """If ball in wall, move to edge. Otherwise the paddles can drive the
+        ball of the field. Sudden warps in ball position can be attributed to
+        quantum fluctuations. """
+        if self.x >= 600:   self.x = 600
+        if self.x <= 0:     self.x = 0
+        if self.y >= 300:   self.y = 300
+        if self.y <= 0:     self.y = 0
+        if self.z >= 300:   self.z = 300
+        if self.z <= 0:     self.z = 0
+        if self.w >= 300:   self.w = 300
+        if self.w <= 0:     self.w = 0
+
+    def bounce(self, padx, pady, padz, padw, dist, paddle_radius):
+        """Calculate new speed for the ball based on paddle coordinates (padx, pady..)
+        and distance the ball is inside the paddle. Speed is calculated by finding the
+        surface normal vector at the point of contact, calculating the reflection
+        using dot product of surface normal vector and speed vector. If ball is inside the
+        paddle, move it to the edge."""
+
+        dx = self.x - padx
+        dy = self.y - pady
+        dz = self.z - padz
+        dw = self.w - padw
+
+        """
+        #Reflection vector w of incoming vector v.
+        #w=v-2(v*n)n  , * means dot product, n is normal vector.
+        #circle center to collision point is in direction of surface normal 'n'
+
+        Calculate normal vector (nx,ny,nz). (dx,dy,dz) points in same
+        direction as n, from paddle center to point of contact, which is
+        ball location. Scale d with circle radius adjusted by distance the
+        ball traveled inside, so that the lenght is 1, so it is unit vector.
+        """
+
+        nx = dx / (paddle_radius - dist)
+        ny = dy / (paddle_radius - dist)
+        nz = dz / (paddle_radius - dist)
+        nw = dw / (paddle_radius - dist)
+
+        v_dot_n = self.sx*nx + self.sy*ny + self.sz*nz + self.sw*nw
+        self.sx = self.sx - 2*v_dot_n*nx
+        self.sy = self.sy - 2*v_dot_n*ny
+        self.sz = self.sz - 2*v_dot_n*nz
+        self.sw = self.sw - 2*v_dot_n*nw
+
+        #OPTION A
+        #move ball to edge ; a simple hack to keep ball out of paddle
+        self.x += dist*nx
+        self.y += dist*ny
+        self.z += dist*nz
+        self.w += dist*nw
+        self.wall_check()
+
+        #OPTION B: if ball inside paddle, accerelate towards surface normal
+        #m = 0.1        #acceleratin multiplier
+        #self.sx = self.sx - m*dist*nx
+        #self.sy = self.sy - m*dist*ny
+
+
+class Paddle():
+    def __init__(self, x_start, y_start, z_start, w_start, size, pColor):
+        self.x = x_start
+        self.y = y_start
+        self.z = z_start
+        self.w = w_start
+        self.radius = size
+        self.color = pColor
+        self.speed = 1 #movement per step
+
+    def move(self, direction):
+        if direction == 'xp':
+            self.x += self.speed
+        if direction == 'xn':
+            self.x -= self.speed
+        if direction == 'yp':
+            self.y += self.speed
+        if direction == 'yn':
+            self.y -= self.speed
+        if direction == 'zp':
+            self.z += self.speed
+        if direction == 'zn':
+            self.z -= self.speed
+        if direction == 'wp':
+            self.w += self.speed
+        if direction == 'wn':
+            self.w -= self.speed
+
+        #BORDERS for paddle movement
+        if self.x <= -50:
+            self.x = -50
+        if self.x >= 650:
+            self.x = 650
+
+        if self.y <= -50:
+            self.y = -50
+        if self.y >= 350:
+            self.y = 350
+
+        if self.z <= -50:
+            self.z = -50
+        if self.z >= 350:
+            self.z = 350
+
+        if self.w <= -50:
+            self.w = -50
+        if self.w >= 350:
+            self.w = 350
+
+    def apply_input(self, mask):
+        """Move paddle in every direction whose bit is set in mask. """
+        if not mask:
+            return
+        for i in range(8):
+            if mask >> i & 1:
+                self.move(DIRECTIONS[i])
+
+    def collision(self, ballx, bally, ballz, ballw):
+        """Test if paddle collides with ball. Calculate Pythagorean distance
+        from paddle center to ball location. Return distance from paddle edge
+        to ball, if positive, ball is inside the paddle. """
+        dx = self.x - ballx
+        dy = self.y - bally
+        dz = self.z - ballz
+        dw = self.w - ballw
+        d = math.sqrt(dx*dx + dy*dy + dz*dz + dw*dw) #exact squares, as the array backends
+        return self.radius - d
+
+
+def in_goal_mouth(y, z, w):
+    """True if (y,z,w) is inside the 100x100x100 goal opening. """
+    return (GOAL_LOW < y < GOAL_HIGH and GOAL_LOW < z < GOAL_HIGH
+            and GOAL_LOW < w < GOAL_HIGH)
+
+
+def mode_flags(game_mode):
+    """Menu game mode (0=4D, 1=3D, 2=2D) to (mode_3d, mode_4d). """
+    return game_mode <= 1, game_mode == 0
+
+
+#**********************************************
+
+class Match():
+    """One game: a ball, two paddles and the score. In 2D mode, w and z values
+    are locked. In 3D w is locked. Call step() tick_rate times per second,
+    ball and paddle speeds are scaled so that the game plays the same at any
+    tick rate. """
+
+    unit = 1 #coordinate units per field unit, see fixed.FixedMatch
+
+    def __init__(self, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE):
+        self.speed = speed
+        self.mode_3d = mode_3d
+        self.mode_4d = mode_4d
+        self.tick_rate = tick_rate
+        self.speed_scale = BASE_RATE / tick_rate #per tick speed of a 60 FPS speed
+        self.ball = Ball(speed * self.speed_scale)
+        #paddle start x,y,z,w; paddle radius, colour
+        self.paddle1 = Paddle(100, 150, 150, 150, paddle_radius, 'red')
+        self.paddle2 = Paddle(500, 150, 150, 150, paddle_radius, 'yellow')
+        if tick_rate != BASE_RATE:
+            self.paddle1.speed = self.paddle2.speed = self.speed_scale
+        self.P1_points = 0
+        self.P2_points = 0
+        self.frame = 0
+
+    def lock_axes(self):
+        """In 3D or 2D mode, lock extra coordinates to center. """
+        ball1, paddle1, paddle2 = self.ball, self.paddle1, self.paddle2
+        if not self.mode_4d:
+            ball1.w, paddle1.w, paddle2.w = 150,150,150
+        if not self.mode_3d:
+            ball1.z, paddle1.z, paddle2.z = 150,150,150
+
+    def check_goal(self):
+        """Score and reset the ball if it is in a goal. Returns P1_GOAL,
+        P2_GOAL or NO_GOAL. """
+        ball1 = self.ball
+        if not in_goal_mouth(ball1.y, ball1.z, ball1.w):
+            return NO_GOAL
+        if ball1.x <= 0:
+            self.P2_points += 1
+            ball1.reset()
+            return P2_GOAL
+        if ball1.x >= 600:
+            self.P1_points += 1
+            ball1.reset()
+            return P1_GOAL
+        return NO_GOAL
+
+    def collide(self):
+        """Bounce the ball from the paddles it is inside of. """
+        ball1 = self.ball
+        for paddle in (self.paddle1, self.paddle2):
+            #how deep in paddle is ball, negative means outside
+            col_dist = paddle.collision(ball1.x, ball1.y, ball1.z, ball1.w)
+            if col_dist >= 0:
+                ball1.bounce(paddle.x, paddle.y, paddle.z, paddle.w, col_dist, paddle.radius)
+
+    def step(self, inputs=(0, 0)):
+        """Advance the game one frame. inputs is a pair of direction bitmasks
+        for player 1 and player 2. Returns which player scored, if any. """
+        self.paddle1.apply_input(inputs[0])
+        self.paddle2.apply_input(inputs[1])
+        self.ball.move()
+        self.lock_axes()
+        self.collide()
+        self.frame += 1
+        return self.check_goal()
+
+    def positions(self):
+        """Ball, paddle1 and paddle2 coordinates as one flat tuple. """
+        b, p1, p2 = self.ball, self.paddle1, self.paddle2
+        return (b.x, b.y, b.z, b.w, p1.x, p1.y, p1.z, p1.w, p2.x, p2.y, p2.z, p2.w)
+
+    def get_state(self):
+        """Full game state as flat tuple: frame, ball position and speed,
+        paddle positions and points. """
+        b, p1, p2 = self.ball, self.paddle1, self.paddle2
+        return (self.frame, b.x, b.y, b.z, b.w, b.sx, b.sy, b.sz, b.sw,
+                p1.x, p1.y, p1.z, p1.w, p2.x, p2.y, p2.z, p2.w,
+                self.P1_points, self.P2_points)
+
+    def set_state(self, state):
+        """Restore state from get_state(). """
+        b, p1, p2 = self.ball, self.paddle1, self.paddle2
+        (self.frame, b.x, b.y, b.z, b.w, b.sx, b.sy, b.sz, b.sw,
+         p1.x, p1.y, p1.z, p1.w, p2.x, p2.y, p2.z, p2.w,
+         self.P1_points, self.P2_points) = state
+
+    def run(self, frames, inputs=(0, 0)):
+        """Step frames times with constant inputs. Returns list of goals. """
+        goals = []
+        for _ in range(frames):
+            goal = self.step(inputs)
+            if goal:
+                goals.append(goal)
+        return goals
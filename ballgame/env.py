@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Reinforcement-learning environment over a batch of M matches, Gym style.
+
+    env = VectorEnv(256, game_mode=0)
+    obs, info = env.reset()
+    while training:
+        obs, rewards, terminated, truncated, info = env.step(actions)
+
+Runs on batch.BatchMatch, without pygame or a display. The agent plays
+paddle 1 against a built-in opponent, or both paddles with players=2.
+
+Observation of match i is obs[i], 16 floats in field units:
+    ball x,y,z,w, ball speed x,y,z,w, paddle1 x,y,z,w, paddle2 x,y,z,w
+obs is the state of the matches itself, the BatchMatch arrays are views
+into it, so a step writes the observations without any copy. The same
+array is returned every time and overwritten by the next step, copy what
+you keep.
+
+Actions are input masks, one bit per Paddle.move direction (see
+engine.DIRECTIONS), shape (M,), or (M, 2) with players=2. Rewards are +1
+when the player scores and -1 when the other one does, from the same goal
+check as a game, shape (M,) or (M, 2). terminated is True in matches where
+a goal was scored, the ball is then already back in the center. After
+max_steps steps all matches are truncated and reset together, the
+returned obs is the new start.
+
+Needs numpy, like batch.py.
+
+"""
+
+import numpy as np
+
+from .batch import BatchMatch
+from .engine import PADDLE_RADIUS, BASE_RATE, DIR_BITS, mode_flags
+
+
+OBS_SIZE = 16
+OPPONENTS = ('idle', 'track')
+#rewards of P1 and P2 by step() goal value: NO_GOAL, P1_GOAL, P2_GOAL
+REWARDS = np.array([[0, 0], [1, -1], [-1, 1]], dtype=np.float32)
+#input bits of the track opponent for y, z and w
+TRACK_UP = np.array([DIR_BITS['yp'], DIR_BITS['zp'], DIR_BITS['wp']], dtype=np.uint8)
+TRACK_DOWN = np.array([DIR_BITS['yn'], DIR_BITS['zn'], DIR_BITS['wn']], dtype=np.uint8)
+
+
+class VectorEnv():
+    """M matches of game_mode (0=4D, 1=3D, 2=2D). With players=1 paddle 2
+    is played by opponent: 'track' follows the ball on y, z and w, 'idle'
+    stands still. max_steps at tick_rate is the episode length. """
+
+    def __init__(self, n, speed=4, game_mode=0, paddle_radius=PADDLE_RADIUS, tick_rate=BASE_RATE,
+                 players=1, opponent='track', max_steps=3600):
+        if players not in (1, 2):
+            raise ValueError('players must be 1 or 2')
+        if opponent not in OPPONENTS:
+            raise ValueError(f'unknown opponent {opponent}')
+        self.num_envs = n
+        self.players = players
+        self.opponent = opponent
+        self.max_steps = max_steps
+        self.match = match = BatchMatch(n, speed, *mode_flags(game_mode), paddle_radius, tick_rate)
+
+        #match state lives in the observation buffer
+        self.obs = np.zeros((n, OBS_SIZE))
+        match.pos = self.obs[:, 0:4]
+        match.vel = self.obs[:, 4:8]
+        match.paddles = self.obs[:, 8:16].reshape(n, 2, 4) #a view, rows are contiguous
+
+        self.inputs = np.zeros((n, 2), dtype=np.uint8)
+        self.all_rewards = np.zeros((n, 2), dtype=np.float32)
+        self.rewards = self.all_rewards if players == 2 else self.all_rewards[:, 0]
+        self.terminated = np.zeros(n, dtype=bool)
+        self.truncated = np.zeros(n, dtype=bool)
+        self.dead_zone = match.speed_scale #one paddle move
+        self.steps = 0
+        self.reset()
+
+    def reset(self):
+        """Restart all matches. Returns obs and an empty info dict. """
+        self.match.reset()
+        self.steps = 0
+        self.all_rewards[:] = 0
+        self.terminated[:] = False
+        self.truncated[:] = False
+        return self.obs, {}
+
+    def track(self):
+        """Input of the track opponent into self.inputs[:, 1]. """
+        match = self.match
+        d = match.pos[:, 1:] - match.paddles[:, 1, 1:]
+        self.inputs[:, 1] = (d > self.dead_zone) @ TRACK_UP + (d < -self.dead_zone) @ TRACK_DOWN
+
+    def step(self, actions):
+        """Advance all matches one step. Returns obs, rewards, terminated,
+        truncated and an empty info dict, the arrays are reused. """
+        inputs = self.inputs
+        if self.players == 2:
+            inputs[:] = actions
+        else:
+            inputs[:, 0] = actions
+            if self.opponent == 'track':
+                self.track()
+        goals = self.match.step(inputs)
+        np.take(REWARDS, goals, axis=0, out=self.all_rewards, mode='clip')
+        np.not_equal(goals, 0, out=self.terminated)
+
+        self.steps += 1
+        if self.truncated[0]:
+            self.truncated[:] = False
+        if self.steps >= self.max_steps:
+            self.match.reset()
+            self.steps = 0
+            self.truncated[:] = True
+        return self.obs, self.rewards, self.terminated, self.truncated, {}
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Event-driven stepping for headless matches.
+
+Most frames the ball only flies straight. With constant inputs the ball and
+the paddles move linearly between events, so the first frame that can touch a
+wall, a paddle or a paddle border can be solved in closed form:
+    wall:    p + k*v reaches 0 or the field size, per axis
+    paddle:  |D + k*(v - u)| <= radius, D = ball - paddle, u = paddle speed,
+             smallest k of a quadratic
+    border:  paddle reaches its movement border and stops
+Free flight frames before the event are skipped and the event frame itself
+is run with the normal Match.step(). The bounces amplify any rounding
+difference, so a coordinate jumps to p + k*v only where that is exactly the
+float the k additions of Ball.move and Paddle.move give: p and v on a grid
+of powers of 2 fine enough that no sum rounds, as the paddles and the served
+ball are. Otherwise the additions are repeated, k float additions instead of
+k Match.step() calls. So the results are bit-identical to the per-frame loop,
+including score outcomes.
+
+"""
+
+import math
+
+from .engine import FIELD, DIR_BITS
+
+
+#frames kept as safety margin before an event, covers float rounding
+MARGIN = 1
+
+PADDLE_MIN = -50
+PADDLE_MAX = tuple(f + 50 for f in FIELD)
+AXES = ('x', 'y', 'z', 'w')
+SPEEDS = ('sx', 'sy', 'sz', 'sw')
+EXACT = 2**53 #integers below it are exact floats
+
+
+def active_axes(match):
+    """Indexes of axes that are not locked in this game mode. """
+    if match.mode_4d:
+        return (0, 1, 2, 3)
+    if match.mode_3d:
+        return (0, 1, 2)
+    return (0, 1)
+
+
+def paddle_velocity(paddle, mask, axes):
+    """Speed per frame of paddle with constant input mask, and how many
+    frames that speed stays valid before the paddle border stops it. """
+    u = [0, 0, 0, 0]
+    limit = math.inf
+    s = paddle.speed
+    for a in axes:
+        p = getattr(paddle, AXES[a])
+        plus = mask & DIR_BITS[AXES[a] + 'p']
+        minus = mask & DIR_BITS[AXES[a] + 'n']
+        hi = PADDLE_MAX[a]
+        if plus and minus:
+            #at upper border the pair of moves goes down, otherwise no move
+            if p + s > hi:
+                limit = 0
+        elif plus and p < hi:
+            u[a] = s
+            limit = min(limit, math.floor((hi - p) / s))
+        elif minus and p > PADDLE_MIN:
+            u[a] = -s
+            limit = min(limit, math.floor((p - PADDLE_MIN) / s))
+    return u, limit
+
+
+def wall_frames(pos, vel, axes):
+    """First frame k where ball at pos with speed vel reaches a wall. """
+    k = math.inf
+    for a in axes:
+        v = vel[a]
+        if v > 0:
+            k = min(k, math.ceil((FIELD[a] - pos[a]) / v))
+        elif v < 0:
+            k = min(k, math.ceil(pos[a] / -v))
+    return k
+
+
+def paddle_frames(pos, vel, paddle, u, axes):
+    """First frame k where ball is inside the moving paddle. Ball and paddle
+    both move linearly, so |D + k*w|^2 = r^2 is a quadratic in k. """
+    a_ = b_ = c_ = 0.0
+    for a in axes:
+        d = pos[a] - getattr(paddle, AXES[a])
+        w = vel[a] - u[a]
+        a_ += w*w
+        b_ += d*w
+        c_ += d*d
+    c_ -= paddle.radius*paddle.radius
+    if c_ <= 0:
+        return 1 #inside or on edge already
+    if a_ == 0:
+        return math.inf
+    disc = b_*b_ - a_*c_
+    if disc < 0 or b_ >= 0:
+        return math.inf #misses, or moving away
+    t1 = (-b_ - math.sqrt(disc)) / a_
+    return max(1, math.ceil(t1))
+
+
+def frames_to_event(match, inputs=(0, 0)):
+    """Number of frames until the first frame, with constant inputs, where
+    anything else than free flight can happen. Frames before it can be
+    skipped. """
+    axes = active_axes(match)
+    ball1 = match.ball
+    pos = (ball1.x, ball1.y, ball1.z, ball1.w)
+    vel = (ball1.sx, ball1.sy, ball1.sz, ball1.sw)
+    k = wall_frames(pos, vel, axes)
+    for paddle, mask in zip((match.paddle1, match.paddle2), inputs):
+        u, limit = paddle_velocity(paddle, mask, axes)
+        k = min(k, limit + 1, paddle_frames(pos, vel, paddle, u, axes))
+    return k
+
+
+def advance(p, v, frames):
+    """p after adding v frames times, as floats. p + frames*v when no sum
+    rounds, which makes it the same float, otherwise by adding. """
+    pn, pd = p.as_integer_ratio()
+    vn, vd = v.as_integer_ratio()
+    d = max(pd, vd) #powers of 2, every sum is a multiple of 1/d
+    if abs(pn)*(d // pd) + frames*abs(vn)*(d // vd) < EXACT:
+        return p + frames*v
+    for _ in range(frames):
+        p += v
+    return p
+
+
+def skip(match, frames, inputs=(0, 0)):
+    """Move ball and paddles frames steps of free flight. Caller makes sure
+    nothing happens during them, see frames_to_event(). """
+    axes = active_axes(match)
+    ball1 = match.ball
+    for a in axes:
+        v = getattr(ball1, SPEEDS[a])
+        if v:
+            name = AXES[a]
+            setattr(ball1, name, advance(getattr(ball1, name), v, frames))
+    for paddle, mask in zip((match.paddle1, match.paddle2), inputs):
+        u, limit = paddle_velocity(paddle, mask, axes)
+        for a in axes:
+            if u[a]:
+                name = AXES[a]
+                setattr(paddle, name, advance(getattr(paddle, name), u[a], frames))
+    match.frame += frames
+
+
+def run_events(match, frames, inputs=(0, 0)):
+    """Same as Match.run(), but skips free flight frames. Returns list of
+    goals. """
+    goals = []
+    end = match.frame + frames
+    while match.frame < end:
+        jump = min(frames_to_event(match, inputs) - 1 - MARGIN, end - match.frame - 1)
+        if jump > 0:
+            skip(match, jump, inputs)
+        goal = match.step(inputs)
+        if goal:
+            goals.append(goal)
+    return goals
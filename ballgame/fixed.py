@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Integer fixed-point physics.
+
+The float engine gives the same results only where the float operations and
+math.sqrt round the same way, so a replay or a networked game can drift
+apart on another machine. Here positions, speeds, surface normals and
+reflections are integers in units of 1/ONE, distances use math.isqrt and
+products and quotients are rounded to nearest with integer operations, so
+the results are the same everywhere. Floor rounding would be simpler but
+slows the ball down a little at every bounce.
+
+FixedMatch is a drop-in for Match. Its ball and paddle coordinates are in
+fixed units, positions() gives field units for drawing, unit tells the
+scale. Paddle radius stays in field units, the fixed one is Paddle.r.
+
+"""
+
+import math
+
+from .engine import (Ball, Paddle, Match, CENTER, FIELD, PADDLE_RADIUS, BASE_RATE,
+                     GOAL_LOW, GOAL_HIGH, NO_GOAL, P1_GOAL, P2_GOAL)
+
+
+FRAC_BITS = 16
+ONE = 1 << FRAC_BITS
+HALF = ONE >> 1
+
+X_MAX, Y_MAX, Z_MAX, W_MAX = (v * ONE for v in FIELD)
+CENTER_X, CENTER_Y, CENTER_Z, CENTER_W = (v * ONE for v in CENTER)
+PADDLE_MIN = -50 * ONE
+PADDLE_MAX_X = 650 * ONE
+PADDLE_MAX = 350 * ONE #y, z and w
+GOAL_MIN = GOAL_LOW * ONE
+GOAL_MAX = GOAL_HIGH * ONE
+
+
+def to_fixed(value):
+    """Field units to fixed units, rounded to nearest. """
+    return round(value * ONE)
+
+
+def to_float(value):
+    return value / ONE
+
+
+class FixedBall(Ball):
+    """Ball with fixed-point coordinates, init_speed in fixed units. """
+
+    def reset(self):
+        self.x = CENTER_X
+        self.y = CENTER_Y
+        self.z = CENTER_Z
+        self.w = CENTER_W
+
+        self.sx = 0
+        self.sy = self.start_speed
+        self.sz = 0
+        self.sw = 0
+
+    def move(self):
+        self.x += self.sx
+        self.y += self.sy
+        self.z += self.sz
+        self.w += self.sw
+        self.wall_check()
+
+        if self.x >= X_MAX or self.x <= 0:
+            self.sx = -self.sx
+        if self.y >= Y_MAX or self.y <= 0:
+            self.sy = -self.sy
+        if self.z >= Z_MAX or self.z <= 0:
+            self.sz = -self.sz
+        if self.w >= W_MAX or self.w <= 0:
+            self.sw = -self.sw
+
+    def wall_check(self):
+        if self.x >= X_MAX: self.x = X_MAX
+        if self.x <= 0:     self.x = 0
+        if self.y >= Y_MAX: self.y = Y_MAX
+        if self.y <= 0:     self.y = 0
+        if self.z >= Z_MAX: self.z = Z_MAX
+        if self.z <= 0:     self.z = 0
+        if self.w >= W_MAX: self.w = W_MAX
+        if self.w <= 0:     self.w = 0
+
+    def bounce(self, padx, pady, padz, padw, dist, paddle_radius):
+        """Same reflection as Ball.bounce, w = v - 2(v.n)n, with n scaled to
+        length ONE. paddle_radius in fixed units. A ball exactly at the
+        paddle center is pushed along x, towards the middle of the field. """
+        dx = self.x - padx
+        dy = self.y - pady
+        dz = self.z - padz
+        dw = self.w - padw
+
+        d = paddle_radius - dist #distance from paddle center
+        if d > 0:
+            half = d >> 1
+            nx = (dx*ONE + half) // d
+            ny = (dy*ONE + half) // d
+            nz = (dz*ONE + half) // d
+            nw = (dw*ONE + half) // d
+        else:
+            nx, ny, nz, nw = (ONE if padx < CENTER_X else -ONE), 0, 0, 0
+
+        v_dot_n = (self.sx*nx + self.sy*ny + self.sz*nz + self.sw*nw + HALF) >> FRAC_BITS
+        self.sx -= (2*v_dot_n*nx + HALF) >> FRAC_BITS
+        self.sy -= (2*v_dot_n*ny + HALF) >> FRAC_BITS
+        self.sz -= (2*v_dot_n*nz + HALF) >> FRAC_BITS
+        self.sw -= (2*v_dot_n*nw + HALF) >> FRAC_BITS
+
+        #move ball to edge
+        self.x += (dist*nx + HALF) >> FRAC_BITS
+        self.y += (dist*ny + HALF) >> FRAC_BITS
+        self.z += (dist*nz + HALF) >> FRAC_BITS
+        self.w += (dist*nw + HALF) >> FRAC_BITS
+        self.wall_check()
+
+
+class FixedPaddle(Paddle):
+    """Paddle with fixed-point coordinates. Arguments in field units. """
+
+    def __init__(self, x_start, y_start, z_start, w_start, size, pColor):
+        super().__init__(to_fixed(x_start), to_fixed(y_start), to_fixed(z_start),
+                         to_fixed(w_start), size, pColor)
+        self.r = to_fixed(size)
+        self.speed = ONE
+
+    def move(self, direction):
+        if direction == 'xp':
+            self.x += self.speed
+        if direction == 'xn':
+            self.x -= self.speed
+        if direction == 'yp':
+            self.y += self.speed
+        if direction == 'yn':
+            self.y -= self.speed
+        if direction == 'zp':
+            self.z += self.speed
+        if direction == 'zn':
+            self.z -= self.speed
+        if direction == 'wp':
+            self.w += self.speed
+        if direction == 'wn':
+            self.w -= self.speed
+
+        if self.x <= PADDLE_MIN:   self.x = PADDLE_MIN
+        if self.x >= PADDLE_MAX_X: self.x = PADDLE_MAX_X
+        if self.y <= PADDLE_MIN:   self.y = PADDLE_MIN
+        if self.y >= PADDLE_MAX:   self.y = PADDLE_MAX
+        if self.z <= PADDLE_MIN:   self.z = PADDLE_MIN
+        if self.z >= PADDLE_MAX:   self.z = PADDLE_MAX
+        if self.w <= PADDLE_MIN:   self.w = PADDLE_MIN
+        if self.w >= PADDLE_MAX:   self.w = PADDLE_MAX
+
+    def collision(self, ballx, bally, ballz, ballw):
+        """Fixed radius minus distance to ball, positive if ball is inside. """
+        dx = self.x - ballx
+        dy = self.y - bally
+        dz = self.z - ballz
+        dw = self.w - ballw
+        return self.r - math.isqrt(dx*dx + dy*dy + dz*dz + dw*dw)
+
+
+class FixedMatch(Match):
+    """Match on fixed-point physics, bit-reproducible on any machine. State
+    from get_state() is integers, set_state() also takes them as floats,
+    which hold them exactly (replay checkpoints). """
+
+    unit = ONE
+
+    def __init__(self, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE):
+        super().__init__(speed, mode_3d, mode_4d, paddle_radius, tick_rate)
+        self.ball = FixedBall(to_fixed(speed * self.speed_scale))
+        self.paddle1 = FixedPaddle(100, 150, 150, 150, paddle_radius, 'red')
+        self.paddle2 = FixedPaddle(500, 150, 150, 150, paddle_radius, 'yellow')
+        self.paddle1.speed = self.paddle2.speed = to_fixed(self.speed_scale)
+
+    def lock_axes(self):
+        ball1, paddle1, paddle2 = self.ball, self.paddle1, self.paddle2
+        if not self.mode_4d:
+            ball1.w = paddle1.w = paddle2.w = CENTER_W
+        if not self.mode_3d:
+            ball1.z = paddle1.z = paddle2.z = CENTER_Z
+
+    def check_goal(self):
+        ball1 = self.ball
+        if not (GOAL_MIN < ball1.y < GOAL_MAX and GOAL_MIN < ball1.z < GOAL_MAX
+                and GOAL_MIN < ball1.w < GOAL_MAX):
+            return NO_GOAL
+        if ball1.x <= 0:
+            self.P2_points += 1
+            ball1.reset()
+            return P2_GOAL
+        if ball1.x >= X_MAX:
+            self.P1_points += 1
+            ball1.reset()
+            return P1_GOAL
+        return NO_GOAL
+
+    def collide(self):
+        ball1 = self.ball
+        for paddle in (self.paddle1, self.paddle2):
+            col_dist = paddle.collision(ball1.x, ball1.y, ball1.z, ball1.w)
+            if col_dist >= 0:
+                ball1.bounce(paddle.x, paddle.y, paddle.z, paddle.w, col_dist, paddle.r)
+
+    def positions(self):
+        """Coordinates in field units, see Match.positions(). """
+        return tuple(v / ONE for v in super().positions())
+
+    def set_state(self, state):
+        if type(state[1]) is not int: #floats from a replay checkpoint
+            state = [int(v) for v in state]
+        super().set_state(state)
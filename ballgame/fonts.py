@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Font registry. pygame.font.SysFont looks the font up and loads the file on
+every call, here the font file is resolved once and Font objects are kept
+per size, so menu and game can ask for their fonts every time they start.
+
+"""
+
+import pygame
+
+
+class FontRegistry():
+    def __init__(self, name='arial'):
+        self.name = name
+        self.path = None
+        self.resolved = False
+        self.fonts = {}
+
+    def resolve(self):
+        """Font file path, looked up on first use. None means pygame default
+        font, same fallback as SysFont. """
+        if not self.resolved:
+            self.path = pygame.font.match_font(self.name)
+            self.resolved = True
+        return self.path
+
+    def get(self, size, underline=False):
+        """Font of given size, created once. Underlined fonts are separate
+        objects, since underline is a setting of the Font. """
+        key = (size, underline)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(self.resolve(), size)
+            font.set_underline(underline)
+            self.fonts[key] = font
+        return font
+
+
+fonts = FontRegistry()
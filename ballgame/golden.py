@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Golden traces: the same seeded inputs through every physics backend (see
+backends.py), compared frame by frame.
+
+    python -m ballgame.golden [--backends python,numpy,numba] [--modes 4d,3d,2d]
+        [--seeds 3] [--seconds 60] [--tick-rate 240] [--tolerance 1e-6]
+
+The inputs of a case, a mode and a seed, are recorded once from a python
+backend match where two Chase policies seeded from the seed play, so the
+ball hits walls, paddles and goals. Every backend then plays exactly that
+input sequence. Its trace is a hash of its state every frame: frame and
+points, and the positions and speeds rounded to the tolerance.
+
+The first backend is the reference. A frame whose hash differs from the
+reference is compared value by value, a value just around a rounding step
+can hash differently, and the backend fails the case at the first frame
+where a value is off by more than the tolerance. Exits with status 1 if a
+backend failed. Backends that can not be used here are skipped.
+
+"""
+
+import argparse, hashlib, random, struct, sys
+
+from .backends import FLOAT_BACKENDS, available, make_match
+from .engine import mode_flags
+from .policies import Chase
+
+
+MODES = {'4d': 0, '3d': 1, '2d': 2}
+
+
+def record_inputs(game_mode, seed, steps, tick_rate):
+    """Inputs of steps steps of two Chase policies on a python match. """
+    match = make_match('python', 4, *mode_flags(game_mode), tick_rate=tick_rate)
+    rng = random.Random(f'golden/{game_mode}/{seed}')
+    act1 = Chase(match, 0, random.Random(rng.getrandbits(64))).act
+    act2 = Chase(match, 1, random.Random(rng.getrandbits(64))).act
+    inputs = []
+    for _ in range(steps):
+        pair = (act1(), act2())
+        match.step(pair)
+        inputs.append(pair)
+    return inputs
+
+
+def frame_hash(state, tolerance):
+    """Hash of a get_state() tuple, coordinates rounded to tolerance. """
+    data = struct.pack('<3q16q', state[0], state[17], state[18],
+                       *(round(v / tolerance) for v in state[1:17]))
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+def trace(name, game_mode, inputs, tick_rate, tolerance):
+    """States and frame hashes of backend name playing inputs. """
+    match = make_match(name, 4, *mode_flags(game_mode), tick_rate=tick_rate)
+    states, hashes = [], []
+    for pair in inputs:
+        match.step(pair)
+        state = match.get_state()
+        states.append(state)
+        hashes.append(frame_hash(state, tolerance))
+    return states, hashes
+
+
+def compare(reference, other, tolerance):
+    """Compare two traces. Returns (frames with a different hash, largest
+    difference, first frame off by more than tolerance or None). """
+    differing, largest = 0, 0.0
+    for frame, (ref_hash, hash_) in enumerate(zip(reference[1], other[1])):
+        if ref_hash == hash_:
+            continue
+        differing += 1
+        ref_state, state = reference[0][frame], other[0][frame]
+        diff = max(abs(a - b) for a, b in zip(ref_state, state))
+        largest = max(largest, diff)
+        if diff > tolerance:
+            return differing, largest, frame
+    return differing, largest, None
+
+
+def digest(hashes):
+    return hashlib.blake2b(b''.join(hashes), digest_size=8).hexdigest()
+
+
+def run(backends, modes, seeds, steps, tick_rate, tolerance, out=print):
+    """Check every case. Returns the names of backends that failed. """
+    failed = set()
+    for mode in modes:
+        for seed in range(seeds):
+            inputs = record_inputs(MODES[mode], seed, steps, tick_rate)
+            reference = trace(backends[0], MODES[mode], inputs, tick_rate, tolerance)
+            points = reference[0][-1][17:19]
+            out(f'{mode} seed {seed}: {steps} frames, score {points[0]}-{points[1]}, '
+                f'{backends[0]} {digest(reference[1])}')
+            for name in backends[1:]:
+                other = trace(name, MODES[mode], inputs, tick_rate, tolerance)
+                differing, largest, bad = compare(reference, other, tolerance)
+                verdict = 'ok' if bad is None else f'FAILED at frame {bad}'
+                out(f'    {name:8s} {digest(other[1])} {differing} frames differ, '
+                    f'max difference {largest:.3g}: {verdict}')
+                if bad is not None:
+                    failed.add(name)
+    return sorted(failed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ballgame.golden', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default=','.join(FLOAT_BACKENDS),
+                        help='comma separated, the first is the reference')
+    parser.add_argument('--modes', default='4d,3d,2d')
+    parser.add_argument('--seeds', type=int, default=3, help='cases per mode')
+    parser.add_argument('--seconds', type=float, default=60.0, help='game time of a case')
+    parser.add_argument('--tick-rate', type=int, default=240, help='physics steps per second')
+    parser.add_argument('--tolerance', type=float, default=1e-6, help='in field units')
+    args = parser.parse_args(argv)
+
+    for name in args.modes.split(','):
+        if name not in MODES:
+            parser.error(f'unknown mode {name}')
+    try:
+        backends = available(args.backends.split(','))
+    except ValueError as e:
+        parser.error(str(e))
+    skipped = sorted(set(args.backends.split(',')) - set(backends))
+    if skipped:
+        print(f'not available here: {", ".join(skipped)}')
+    if len(backends) < 2:
+        parser.error('need two available backends to compare')
+
+    steps = round(args.seconds * args.tick_rate)
+    failed = run(backends, args.modes.split(','), args.seeds, steps, args.tick_rate,
+                 args.tolerance)
+    if failed:
+        print(f'failed: {", ".join(failed)}')
+        return 1
+    print('all backends agree')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Numba backend: Match.step as one JIT-compiled function over the state array
+of arraymatch.ArrayMatch.
+
+step_match does what Paddle.apply_input, Ball.move, Match.lock_axes,
+Match.collide and Match.check_goal do, in the same order and with the same
+float operations, so it gives the same results as Match. It is compiled
+on the first step and cached on disk, later runs load it.
+
+Needs numba, importing this module raises ImportError without it.
+
+"""
+
+import math
+
+import numba
+import numpy as np
+
+from .engine import FIELD, GOAL_LOW, GOAL_HIGH, PADDLE_RADIUS, BASE_RATE, NO_GOAL, P1_GOAL, P2_GOAL
+from .arraymatch import ArrayMatch
+
+
+LIMITS = np.array(FIELD, dtype=np.float64)
+
+
+@numba.njit(cache=True)
+def move_paddle(s, i, mask, speed):
+    """Paddle.apply_input for the paddle at s[i:i+4]. """
+    for axis in range(4):
+        high = LIMITS[axis] + 50
+        if mask >> 2*axis & 1:
+            s[i + axis] = min(max(s[i + axis] + speed, -50.0), high)
+        if mask >> 2*axis + 1 & 1:
+            s[i + axis] = min(max(s[i + axis] - speed, -50.0), high)
+
+
+@numba.njit(cache=True)
+def wall_check(s):
+    for axis in range(4):
+        s[axis] = min(max(s[axis], 0.0), LIMITS[axis])
+
+
+@numba.njit(cache=True)
+def step_match(s, in1, in2, paddle_speed, start_speed, radius, mode_3d, mode_4d):
+    """One Match.step on s. Returns the goal. """
+    if in1:
+        move_paddle(s, 8, in1, paddle_speed)
+    if in2:
+        move_paddle(s, 12, in2, paddle_speed)
+
+    #Ball.move
+    for axis in range(4):
+        s[axis] += s[4 + axis]
+    wall_check(s)
+    for axis in range(4):
+        if s[axis] >= LIMITS[axis] or s[axis] <= 0:
+            s[4 + axis] = -s[4 + axis]
+
+    if not mode_4d:
+        s[3] = s[11] = s[15] = 150.0
+    if not mode_3d:
+        s[2] = s[10] = s[14] = 150.0
+
+    #Paddle.collision and Ball.bounce, paddle1 first
+    for i in (8, 12):
+        dx = s[i] - s[0]
+        dy = s[i + 1] - s[1]
+        dz = s[i + 2] - s[2]
+        dw = s[i + 3] - s[3]
+        dist = radius - math.sqrt(dx*dx + dy*dy + dz*dz + dw*dw)
+        if dist >= 0:
+            scale = radius - dist
+            nx = (s[0] - s[i]) / scale
+            ny = (s[1] - s[i + 1]) / scale
+            nz = (s[2] - s[i + 2]) / scale
+            nw = (s[3] - s[i + 3]) / scale
+            v_dot_n = s[4]*nx + s[5]*ny + s[6]*nz + s[7]*nw
+            s[4] = s[4] - 2*v_dot_n*nx
+            s[5] = s[5] - 2*v_dot_n*ny
+            s[6] = s[6] - 2*v_dot_n*nz
+            s[7] = s[7] - 2*v_dot_n*nw
+            s[0] += dist*nx
+            s[1] += dist*ny
+            s[2] += dist*nz
+            s[3] += dist*nw
+            wall_check(s)
+
+    #Match.check_goal
+    if not (GOAL_LOW < s[1] < GOAL_HIGH and GOAL_LOW < s[2] < GOAL_HIGH
+            and GOAL_LOW < s[3] < GOAL_HIGH):
+        return NO_GOAL
+    if s[0] <= 0:
+        goal = P2_GOAL
+    elif s[0] >= LIMITS[0]:
+        goal = P1_GOAL
+    else:
+        return NO_GOAL
+    s[0], s[1], s[2], s[3] = 300.0, 150.0, 150.0, 150.0
+    s[4], s[5], s[6], s[7] = 0.0, start_speed, 0.0, 0.0
+    return goal
+
+
+class NumbaMatch(ArrayMatch):
+    """Match stepped by step_match. """
+
+    def __init__(self, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE):
+        super().__init__(speed, mode_3d, mode_4d, paddle_radius, tick_rate)
+        self.args = (float(self.paddle1.speed), float(self.ball.start_speed), self.radius,
+                     bool(mode_3d), bool(mode_4d))
+
+    def advance(self, inputs):
+        return step_match(self.s, inputs[0], inputs[1], *self.args)
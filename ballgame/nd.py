@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Dimension-generic engine: the game in any number of dimensions, 2 and up.
+
+Match plays 2D and 3D as 4D with the extra coordinates put back to 150
+every step. NMatch has only the axes it plays: positions and speeds are
+lists of dims floats, and every step loops over those axes only, so a 2D
+step does half the axis work of a 4D one and a 5D or 6D match needs no
+extra code. Axis 0 is x, 600 long with the goals at its ends; every other
+axis is 300 long and the goal mouths span 100...200 on all of them.
+
+Input masks have two bits per axis, positive move first, so the first 8
+bits are engine.DIRECTIONS. The classes use __slots__.
+
+NMatch has the interface of Match, so the front-end can play it as the nd
+physics backend, see backends.py. Coordinates and speeds of the axes it
+does not have read as the center and 0; get_state(), set_state() and
+positions() use the 4D layout, or more coordinates above 4D. With the same
+float operations in the same order as Ball and Paddle it gives the same
+results as Match in 2D, 3D and 4D, which golden.py checks.
+
+It is an additional backend, not a replacement for Match: Match, with
+its lock_axes, stays the reference engine the backends are checked
+against, and the developmental/ versions keep their own physics.
+
+"""
+
+import math, operator
+
+from .engine import FIELD, CENTER, GOAL_LOW, GOAL_HIGH, PADDLE_RADIUS, BASE_RATE
+from .engine import NO_GOAL, P1_GOAL, P2_GOAL
+
+
+def field(dims):
+    """Field size per axis. """
+    return FIELD[:1] + (FIELD[1],) * (dims - 1)
+
+
+def center(dims):
+    return CENTER[:1] + (CENTER[1],) * (dims - 1)
+
+
+def axis_property(slot, axis, default=None):
+    """Coordinate axis of the list in slot. default is read for an axis
+    the object does not have, the center if None. """
+    values_of = operator.attrgetter(slot)
+    missing = CENTER[axis] if default is None else default
+    def get(self):
+        values = values_of(self)
+        return values[axis] if axis < len(values) else missing
+    def set(self, value):
+        values = values_of(self)
+        if axis < len(values):
+            values[axis] = value
+    return property(get, set)
+
+
+class NBall():
+    """Ball with pos and vel lists of dims coordinates. """
+
+    __slots__ = ('pos', 'vel', 'start_speed', 'field')
+
+    x, y, z, w = (axis_property('pos', axis) for axis in range(4))
+    sx, sy, sz, sw = (axis_property('vel', axis, 0) for axis in range(4))
+
+    def __init__(self, dims, init_speed=4):
+        self.start_speed = init_speed
+        self.field = field(dims)
+        self.pos = list(center(dims))
+        self.vel = [0] * dims
+        self.reset()
+
+    def reset(self):
+        """Reset ball position and speed. """
+        dims = len(self.pos)
+        self.pos[:] = center(dims)
+        self.vel[:] = [0] * dims
+        self.vel[1] = self.start_speed
+
+    def move(self):
+        """Ball.move: move, put back on a wall that was passed and reverse
+        speed on the axes at a wall. """
+        pos, vel = self.pos, self.vel
+        for axis, size in enumerate(self.field):
+            p = pos[axis] + vel[axis]
+            if p >= size:
+                pos[axis] = size
+                vel[axis] = -vel[axis]
+            elif p <= 0:
+                pos[axis] = 0
+                vel[axis] = -vel[axis]
+            else:
+                pos[axis] = p
+
+    def bounce(self, pad, dist, paddle_radius):
+        """Ball.bounce from the paddle with center pad, dist inside it. """
+        pos, vel = self.pos, self.vel
+        scale = paddle_radius - dist
+        normal = [(p - c) / scale for p, c in zip(pos, pad)]
+        v_dot_n = vel[0]*normal[0] #summed in axis order, as Ball.bounce
+        for axis in range(1, len(vel)):
+            v_dot_n += vel[axis]*normal[axis]
+        for axis, n in enumerate(normal):
+            vel[axis] = vel[axis] - 2*v_dot_n*n
+            p = pos[axis] + dist*n
+            size = self.field[axis]
+            pos[axis] = size if p >= size else 0 if p <= 0 else p
+
+
+class NPaddle():
+    """Paddle with pos list of dims coordinates. """
+
+    __slots__ = ('pos', 'radius', 'color', 'speed', 'high')
+
+    x, y, z, w = (axis_property('pos', axis) for axis in range(4))
+
+    def __init__(self, start, size, pColor):
+        self.pos = list(start)
+        self.radius = size
+        self.color = pColor
+        self.speed = 1 #movement per step
+        self.high = [s + 50 for s in field(len(start))] #borders, low is -50 on all axes
+
+    def apply_input(self, mask):
+        """Move in every direction whose bit is set in mask: bit 2*axis is
+        the positive one, 2*axis + 1 the negative. """
+        if not mask:
+            return
+        pos, speed = self.pos, self.speed
+        for axis, high in enumerate(self.high):
+            bits = mask >> 2*axis & 3
+            if not bits:
+                continue
+            p = pos[axis]
+            if bits & 1:
+                p += speed
+                p = high if p >= high else -50 if p <= -50 else p
+            if bits & 2:
+                p -= speed
+                p = high if p >= high else -50 if p <= -50 else p
+            pos[axis] = p
+
+    def collision(self, ball_pos):
+        """Paddle.collision: distance from the paddle edge to the ball,
+        positive inside. """
+        pos = self.pos
+        d = pos[0] - ball_pos[0]
+        d2 = d*d #summed in axis order, as Paddle.collision
+        for axis in range(1, len(pos)):
+            d = pos[axis] - ball_pos[axis]
+            d2 += d*d
+        return self.radius - math.sqrt(d2)
+
+
+class NMatch():
+    """One game in dims dimensions, by default the ones of mode_3d and
+    mode_4d; given dims set the mode flags. """
+
+    __slots__ = ('dims', 'speed', 'mode_3d', 'mode_4d', 'tick_rate', 'speed_scale', 'ball',
+                 'paddle1', 'paddle2', 'P1_points', 'P2_points', 'frame')
+
+    unit = 1
+
+    def __init__(self, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE, dims=None):
+        if dims is None:
+            dims = 4 if mode_3d and mode_4d else 3 if mode_3d else 2
+        if dims < 2:
+            raise ValueError('dims must be 2 or more')
+        self.dims = dims
+        self.speed = speed
+        self.mode_3d = dims >= 3
+        self.mode_4d = dims >= 4
+        self.tick_rate = tick_rate
+        self.speed_scale = BASE_RATE / tick_rate
+        self.ball = NBall(dims, speed * self.speed_scale)
+        rest = center(dims)[1:]
+        self.paddle1 = NPaddle((100,) + rest, paddle_radius, 'red')
+        self.paddle2 = NPaddle((500,) + rest, paddle_radius, 'yellow')
+        if tick_rate != BASE_RATE:
+            self.paddle1.speed = self.paddle2.speed = self.speed_scale
+        self.P1_points = 0
+        self.P2_points = 0
+        self.frame = 0
+
+    def check_goal(self):
+        """Match.check_goal. """
+        ball = self.ball
+        pos = ball.pos
+        for axis in range(1, self.dims):
+            if not GOAL_LOW < pos[axis] < GOAL_HIGH:
+                return NO_GOAL
+        if pos[0] <= 0:
+            self.P2_points += 1
+            ball.reset()
+            return P2_GOAL
+        if pos[0] >= FIELD[0]:
+            self.P1_points += 1
+            ball.reset()
+            return P1_GOAL
+        return NO_GOAL
+
+    def collide(self):
+        """Bounce the ball from the paddles it is inside of, paddle1
+        first. """
+        ball = self.ball
+        for paddle in (self.paddle1, self.paddle2):
+            col_dist = paddle.collision(ball.pos)
+            if col_dist >= 0:
+                ball.bounce(paddle.pos, col_dist, paddle.radius)
+
+    def step(self, inputs=(0, 0)):
+        """Match.step, without locking axes: there are none to lock. """
+        self.paddle1.apply_input(inputs[0])
+        self.paddle2.apply_input(inputs[1])
+        self.ball.move()
+        self.collide()
+        self.frame += 1
+        return self.check_goal()
+
+    def padded(self, values, fill):
+        """values of each axis up to 4D, fill for the missing ones. """
+        return tuple(values) + fill[len(values):]
+
+    def positions(self):
+        """Ball, paddle1 and paddle2 coordinates as one flat tuple, see
+        Match.positions. """
+        c = CENTER
+        return (self.padded(self.ball.pos, c) + self.padded(self.paddle1.pos, c)
+                + self.padded(self.paddle2.pos, c))
+
+    def get_state(self):
+        """Match.get_state, coordinates of all axes above 4D. """
+        c = CENTER
+        return ((self.frame,) + self.padded(self.ball.pos, c)
+                + self.padded(self.ball.vel, (0, 0, 0, 0)) + self.padded(self.paddle1.pos, c)
+                + self.padded(self.paddle2.pos, c) + (self.P1_points, self.P2_points))
+
+    def set_state(self, state):
+        """Restore state from get_state(). """
+        n = max(self.dims, 4)
+        self.frame = state[0]
+        for i, values in enumerate((self.ball.pos, self.ball.vel, self.paddle1.pos,
+                                    self.paddle2.pos)):
+            values[:] = state[1 + i*n:1 + i*n + self.dims]
+        self.P1_points, self.P2_points = state[1 + 4*n:3 + 4*n]
+
+    def run(self, frames, inputs=(0, 0)):
+        """Step frames times with constant inputs. Returns list of goals. """
+        goals = []
+        for _ in range(frames):
+            goal = self.step(inputs)
+            if goal:
+                goals.append(goal)
+        return goals
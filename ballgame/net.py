@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+Lockstep multiplayer over UDP.
+
+Both machines run the same FixedMatch and send each other only the input
+bitmask of their own player, one byte per net tick. Fixed-point physics
+gives the same results bit for bit on both sides, so no state is sent.
+
+An input is scheduled delay ticks ahead, so it normally reaches the other
+side before it is needed. If it has not, the simulation waits (lockstep).
+An INPUT packet carries the last remote tick received in order (ack) and
+all own inputs the peer has not acked yet, so a lost packet is covered by
+the next one. Ticks go out as 16 bits and are unwrapped near the expected
+value. Packets are sent send_rate times a second, with the defaults about
+10 bytes each: ~200 B/s of payload, ~750 B/s with IP and UDP headers.
+
+Every HASH_INTERVAL ticks both sides send a CRC of their match state, a
+mismatch is reported in desync.
+
+The joining side sends HELLO until the host answers WELCOME with the game
+settings. Both start from tick 0 right after.
+
+Headless test with bot players, in two terminals:
+    python -m ballgame.net host [--port 47474] [--ticks 1800] [--loss 0.1]
+    python -m ballgame.net join 127.0.0.1 [--port 47474] [--ticks 1800] [--loss 0.1]
+
+"""
+
+import argparse, random, socket, struct, sys, time, zlib
+
+from .fixed import FixedMatch
+from .replay import FLAG_3D, FLAG_4D
+from .timestep import FixedTimestep
+
+
+PORT = 47474
+VERSION = 1
+NET_RATE = 60     #input ticks per second
+SEND_RATE = 20    #packets per second
+INPUT_DELAY = 4   #ticks, has to cover one send interval and the network latency
+MAX_INPUTS = 64   #most inputs resent in one packet
+HASH_INTERVAL = 60
+UDP_OVERHEAD = 28 #IPv4 and UDP headers
+
+#packet types
+HELLO = 1
+WELCOME = 2
+INPUT = 3
+HASH = 4
+BYE = 5
+
+HELLO_PACKET = struct.Struct('<BB')         #type, version
+WELCOME_PACKET = struct.Struct('<BBdBHHB')  #type, version, speed, mode flags, tick rate, net rate, delay
+INPUT_HEADER = struct.Struct('<BHH')        #type, ack, first tick, then one input byte per tick
+HASH_PACKET = struct.Struct('<BII')         #type, tick, crc32 of match state
+
+
+def unwrap(value, near):
+    """Full tick number of a 16-bit tick, the one closest to near. """
+    return near + ((value - near + 0x8000) & 0xFFFF) - 0x8000
+
+
+def pack_welcome(settings):
+    flags = (FLAG_3D if settings['mode_3d'] else 0) | (FLAG_4D if settings['mode_4d'] else 0)
+    return WELCOME_PACKET.pack(WELCOME, VERSION, settings['speed'], flags, settings['tick_rate'],
+                               settings['net_rate'], settings['delay'])
+
+
+def unpack_welcome(data):
+    _, version, speed, flags, tick_rate, net_rate, delay = WELCOME_PACKET.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f'protocol version {version}, expected {VERSION}')
+    return {'speed': speed, 'mode_3d': bool(flags & FLAG_3D), 'mode_4d': bool(flags & FLAG_4D),
+            'tick_rate': tick_rate, 'net_rate': net_rate, 'delay': delay}
+
+
+def game_settings(speed=4, mode_3d=True, mode_4d=True, tick_rate=240, net_rate=NET_RATE,
+                  delay=INPUT_DELAY):
+    return {'speed': speed, 'mode_3d': mode_3d, 'mode_4d': mode_4d, 'tick_rate': tick_rate,
+            'net_rate': net_rate, 'delay': delay}
+
+
+def match_from_settings(settings):
+    return FixedMatch(settings['speed'], settings['mode_3d'], settings['mode_4d'],
+                      tick_rate=settings['tick_rate'])
+
+
+def state_hash(state):
+    """CRC of a Match.get_state() tuple. """
+    return zlib.crc32(repr(tuple(state)).encode())
+
+
+class LockstepSession():
+    """Lockstep game with one peer. player is 0 on the host (P1), 1 on the
+    joining side. For each tick: if ready(), advance(local_input) runs the
+    tick on self.match. Call receive() and send() every frame. Set recorder
+    to record the match. """
+
+    def __init__(self, sock, peer, player, settings, welcome=None, send_rate=SEND_RATE, loss=0.0):
+        sock.setblocking(False)
+        self.sock = sock
+        self.peer = peer
+        self.player = player
+        self.settings = settings
+        self.welcome = welcome #host answers repeated HELLOs with it
+        self.delay = max(1, settings['delay'])
+        self.steps_per_tick = max(1, settings['tick_rate'] // settings['net_rate'])
+        self.send_interval = 1 / send_rate
+        self.loss = loss #share of packets dropped on purpose, for testing
+        self.rng = random.Random()
+        self.match = match_from_settings(settings)
+        self.recorder = None
+
+        #the first delay ticks have no input on either side
+        self.local = dict.fromkeys(range(self.delay), 0)
+        self.remote = dict.fromkeys(range(self.delay), 0)
+        self.tick = 0                    #next tick to simulate
+        self.next_local = self.delay     #next tick to get a local input
+        self.received = self.delay - 1   #all remote inputs up to this tick are known
+        self.acked = self.delay - 1      #peer has all local inputs up to this tick
+
+        self.hashes = {}
+        self.peer_hashes = {}
+        self.desync = None #first tick where the states differed
+        self.closed = False #peer left
+
+        self.last_send = 0.0
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.start = time.perf_counter()
+
+    def ready(self):
+        """True if both inputs of the next tick are known. """
+        return self.tick in self.remote
+
+    def advance(self, local_input):
+        """Schedule local_input delay ticks ahead and run the current tick.
+        Call only when ready(). Returns goal like Match.step. """
+        self.local[self.next_local] = local_input
+        self.next_local += 1
+        tick = self.tick
+        local, remote = self.local[tick], self.remote.pop(tick)
+        if tick <= self.acked:
+            del self.local[tick]
+        goal = self.run_tick(self.pair(local, remote), self.recorder)
+        self.tick += 1
+        if self.tick % HASH_INTERVAL == 0:
+            self.send_hash(self.tick, state_hash(self.match.get_state()))
+        return goal
+
+    def pair(self, local, remote):
+        """(p1, p2) inputs. """
+        return (local, remote) if self.player == 0 else (remote, local)
+
+    def run_tick(self, inputs, recorder=None):
+        match = self.match
+        goal = 0
+        for _ in range(self.steps_per_tick):
+            if recorder:
+                recorder.record(inputs)
+            goal = match.step(inputs) or goal
+        return goal
+
+    def send_hash(self, tick, crc):
+        """Exchange hash of the state at start of tick. """
+        self._send(HASH_PACKET.pack(HASH, tick, crc))
+        self._compare(tick, crc, self.peer_hashes, self.hashes)
+
+    def _compare(self, tick, crc, other, own):
+        """Check crc against the other side's hash of tick, or keep it
+        until that arrives. """
+        if tick in other:
+            if other.pop(tick) != crc and self.desync is None:
+                self.desync = tick
+        else:
+            own[tick] = crc
+            if len(own) > 16: #the other one was lost
+                del own[next(iter(own))]
+
+    def _send(self, data):
+        self.packets_sent += 1
+        self.bytes_sent += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            return
+        try:
+            self.sock.sendto(data, self.peer)
+        except OSError:
+            pass #peer not there (yet), inputs go again with the next packet
+
+    def send(self, now=None):
+        """Send unacked inputs and ack, at most send_rate times a second. """
+        if now is None:
+            now = time.perf_counter()
+        if now - self.last_send < self.send_interval:
+            return
+        self.last_send = now
+        first = self.acked + 1
+        last = min(self.next_local, first + MAX_INPUTS)
+        local = self.local
+        self._send(INPUT_HEADER.pack(INPUT, self.received & 0xFFFF, first & 0xFFFF)
+                   + bytes(local[t] for t in range(first, last)))
+
+    def receive(self):
+        """Handle all packets waiting in the socket. """
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue #ICMP error of an earlier send
+            if addr != self.peer or not data:
+                continue
+            self.bytes_received += len(data)
+            kind = data[0]
+            if kind == INPUT and len(data) >= INPUT_HEADER.size:
+                _, ack, first = INPUT_HEADER.unpack_from(data)
+                self._ack(unwrap(ack, self.acked))
+                first = unwrap(first, self.received)
+                remote = self.remote
+                for t, mask in enumerate(data[INPUT_HEADER.size:], first):
+                    if t > self.received:
+                        remote.setdefault(t, mask)
+                while self.received + 1 in remote:
+                    self.received += 1
+            elif kind == HASH and len(data) == HASH_PACKET.size:
+                _, tick, crc = HASH_PACKET.unpack(data)
+                self._compare(tick, crc, self.hashes, self.peer_hashes)
+            elif kind == HELLO and self.welcome:
+                self._send(self.welcome) #our WELCOME was lost
+            elif kind == BYE:
+                self.closed = True
+
+    def _ack(self, ack):
+        ack = min(ack, self.next_local - 1)
+        if ack <= self.acked:
+            return
+        for t in range(self.acked + 1, min(ack + 1, self.tick)):
+            self.local.pop(t, None)
+        self.acked = ack
+
+    def finish(self, timeout=1.0):
+        """Keep sending until the peer has all local inputs, then say bye. """
+        deadline = time.perf_counter() + timeout
+        while self.acked < self.next_local - 1 and not self.closed and time.perf_counter() < deadline:
+            self.receive()
+            self.send()
+            time.sleep(0.005)
+        self.close()
+
+    def close(self):
+        for _ in range(3):
+            self._send(bytes([BYE]))
+        self.sock.close()
+
+    def bandwidth(self):
+        """Bytes sent per second: (UDP payload, with IP and UDP headers). """
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (self.bytes_sent / elapsed,
+                (self.bytes_sent + UDP_OVERHEAD * self.packets_sent) / elapsed)
+
+
+def open_socket(port=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('', port))
+    return sock
+
+
+def accept(sock, settings, timeout=0.1, session_class=LockstepSession, **kwargs):
+    """Host side: wait up to timeout for a HELLO and answer with the game
+    settings. Returns a session, or None if nobody came. """
+    sock.settimeout(timeout)
+    try:
+        data, addr = sock.recvfrom(2048)
+    except OSError:
+        return None
+    if len(data) != HELLO_PACKET.size or HELLO_PACKET.unpack(data) != (HELLO, VERSION):
+        return None
+    welcome = pack_welcome(settings)
+    sock.sendto(welcome, addr)
+    return session_class(sock, addr, 0, settings, welcome, **kwargs)
+
+
+def connect(sock, address, timeout=0.25, session_class=LockstepSession, **kwargs):
+    """Joining side: send HELLO to (host, port) and wait up to timeout for
+    the settings. Returns a session, or None if there was no answer. """
+    peer = (socket.gethostbyname(address[0]), address[1])
+    sock.sendto(HELLO_PACKET.pack(HELLO, VERSION), peer)
+    deadline = time.perf_counter() + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None
+        sock.settimeout(remaining)
+        try:
+            data, addr = sock.recvfrom(2048)
+        except OSError:
+            continue
+        if addr == peer and len(data) == WELCOME_PACKET.size and data[0] == WELCOME:
+            return session_class(sock, peer, 1, unpack_welcome(data), **kwargs)
+
+
+#**********************************************
+
+def run_bot(session, ticks):
+    """Play ticks ticks with random inputs, in real time. Returns the
+    number of stalls. """
+    timestep = FixedTimestep(session.settings['net_rate'])
+    rng = random.Random(session.player)
+    mask = 0
+    stalls = 0
+    while session.tick < ticks:
+        session.receive()
+        if session.closed and not session.ready():
+            break
+        for _ in range(timestep.advance()):
+            if session.tick >= ticks:
+                break
+            if not session.ready():
+                stalls += 1
+                timestep.reset() #wait, do not catch up afterwards
+                break
+            if session.tick % 30 == 0:
+                mask = rng.randrange(256)
+            session.advance(mask)
+        session.send()
+        time.sleep(0.001)
+    return stalls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ballgame.net', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('role', choices=('host', 'join'))
+    parser.add_argument('address', nargs='?', default='127.0.0.1', help='host to join')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--ticks', type=int, default=30 * NET_RATE)
+    parser.add_argument('--loss', type=float, default=0.0, help='drop this share of sent packets')
+    parser.add_argument('--delay', type=int, default=INPUT_DELAY, help='input delay in ticks (host)')
+    parser.add_argument('--rollback', action='store_true', help='predict remote inputs, see rollback.py')
+    args = parser.parse_args(argv)
+    session_class = LockstepSession
+    if args.rollback:
+        from .rollback import RollbackSession #rollback.py imports this module
+        session_class = RollbackSession
+
+    session = None
+    if args.role == 'host':
+        sock = open_socket(args.port)
+        print(f'waiting on port {args.port}', flush=True)
+        settings = game_settings(6.0, delay=args.delay)
+        while session is None:
+            session = accept(sock, settings, 1.0, session_class, loss=args.loss)
+    else:
+        sock = open_socket()
+        deadline = time.perf_counter() + 30
+        while session is None and time.perf_counter() < deadline:
+            session = connect(sock, (args.address, args.port), session_class=session_class,
+                              loss=args.loss)
+        if session is None:
+            print('no answer from host')
+            return 1
+
+    stalls = run_bot(session, args.ticks)
+    match = session.match
+    session.finish()
+    payload, wire = session.bandwidth()
+    print(f'player {session.player + 1}: tick {session.tick} score {match.P1_points}-{match.P2_points} '
+          f'state {state_hash(match.get_state()):08x} desync {session.desync} stalls {stalls}')
+    if args.rollback:
+        print(f'{session.rollbacks} rollbacks, {session.resimulated} ticks simulated again')
+    print(f'sent {session.packets_sent} packets, {payload:.0f} B/s payload, {wire:.0f} B/s with headers')
+    return 0 if session.desync is None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
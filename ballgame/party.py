@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Party mode: hundreds of balls in one match.
+
+Balls are points and do not hit each other, so the only pairs to test are
+ball and paddle. Instead of testing every ball against every paddle, the
+balls are kept in a uniform 4D grid, BallGrid, and a paddle is tested only
+against the balls in the cells its bounding box overlaps. A cell is as wide
+as a paddle, so that is at most 2 cells per axis. The grid is updated
+incrementally: after a ball moves, its cell is computed and it is moved to
+another cell set only if it changed, which a ball does only every 20 steps
+or so.
+
+Collisions are resolved paddle by paddle, and a ball that bounced is put in
+its new cell before the next paddle looks, so every ball is tested against
+paddle 1 and then paddle 2 just as in Match. With broadphase=False every
+ball is a candidate of every paddle, for checking and comparison. pairs is
+the number of ball-paddle pairs tested in the last step.
+
+A ball that goes in a goal is served again from the center in a random
+direction, from the match's own seeded random.Random.
+
+"""
+
+import math, random
+
+from .engine import Ball, Match, FIELD, CENTER, GOAL_LOW, GOAL_HIGH, PADDLE_RADIUS, BASE_RATE
+from .engine import NO_GOAL, P1_GOAL, P2_GOAL
+
+
+class BallGrid():
+    """Uniform grid over the field holding ball indices. cell_size should
+    be at least a paddle diameter. """
+
+    def __init__(self, cell_size, field=FIELD):
+        self.inv = 1 / cell_size
+        #coordinates go up to and including the field size
+        self.dims = tuple(int(f * self.inv) + 1 for f in field)
+        nx, ny, nz, nw = self.dims
+        self.cells = [set() for _ in range(nx * ny * nz * nw)]
+        self.keys = []
+
+    def key(self, x, y, z, w):
+        inv = self.inv
+        _, ny, nz, nw = self.dims
+        return ((int(x*inv)*ny + int(y*inv))*nz + int(z*inv))*nw + int(w*inv)
+
+    def add(self, ball):
+        """Insert ball as the next index. """
+        key = self.key(ball.x, ball.y, ball.z, ball.w)
+        self.cells[key].add(len(self.keys))
+        self.keys.append(key)
+
+    def update(self, i, ball):
+        """Move ball i to the cell of its position, if it changed. """
+        key = self.key(ball.x, ball.y, ball.z, ball.w)
+        if key != self.keys[i]:
+            self.cells[self.keys[i]].discard(i)
+            self.cells[key].add(i)
+            self.keys[i] = key
+
+    def query(self, x, y, z, w, r):
+        """Indices of balls in the cells overlapping the box around (x, y,
+        z, w) with half width r. """
+        inv, cells = self.inv, self.cells
+        nx, ny, nz, nw = self.dims
+        found = set()
+        xs = range(max(0, int((x - r) * inv)), min(nx - 1, int((x + r) * inv)) + 1)
+        ys = range(max(0, int((y - r) * inv)), min(ny - 1, int((y + r) * inv)) + 1)
+        zs = range(max(0, int((z - r) * inv)), min(nz - 1, int((z + r) * inv)) + 1)
+        ws = range(max(0, int((w - r) * inv)), min(nw - 1, int((w + r) * inv)) + 1)
+        for cx in xs:
+            for cy in ys:
+                kxy = (cx*ny + cy)*nz
+                for cz in zs:
+                    kxyz = (kxy + cz)*nw
+                    for cw in ws:
+                        cell = cells[kxyz + cw]
+                        if cell:
+                            found |= cell
+        return found
+
+
+class PartyMatch(Match):
+    """Match with n balls. ball is the first one, for the read-outs. """
+
+    def __init__(self, n=1000, speed=4, mode_3d=True, mode_4d=True, paddle_radius=PADDLE_RADIUS,
+                 tick_rate=BASE_RATE, seed=None, broadphase=True):
+        super().__init__(speed, mode_3d, mode_4d, paddle_radius, tick_rate)
+        self.rng = random.Random(seed)
+        self.dims = 4 if mode_4d and mode_3d else 3 if mode_3d else 2
+        self.broadphase = broadphase
+        self.grid = BallGrid(2 * paddle_radius)
+        self.balls = []
+        for _ in range(n):
+            ball = Ball(self.ball.start_speed)
+            for axis in range(self.dims):
+                setattr(ball, 'xyzw'[axis], self.rng.uniform(0, FIELD[axis]))
+            self.serve(ball, False)
+            self.balls.append(ball)
+            self.grid.add(ball)
+        self.ball = self.balls[0]
+        self.pairs = 0
+
+    def serve(self, ball, center=True):
+        """Random direction in the dimensions played, from the center if
+        center. """
+        if center:
+            ball.x, ball.y, ball.z, ball.w = CENTER
+        v = [self.rng.gauss(0, 1) for _ in range(self.dims)] + [0.0] * (4 - self.dims)
+        scale = ball.start_speed / (math.sqrt(sum(c*c for c in v)) or 1)
+        ball.sx, ball.sy, ball.sz, ball.sw = (c * scale for c in v)
+
+    def lock_axes(self):
+        """Paddles only, the balls never leave the axes played. """
+        paddle1, paddle2 = self.paddle1, self.paddle2
+        if not self.mode_4d:
+            paddle1.w, paddle2.w = 150, 150
+        if not self.mode_3d:
+            paddle1.z, paddle2.z = 150, 150
+
+    def step(self, inputs=(0, 0)):
+        """Advance all balls one frame, see Match.step. Returns the last
+        goal scored. """
+        self.paddle1.apply_input(inputs[0])
+        self.paddle2.apply_input(inputs[1])
+        grid = self.grid
+        keys, cells, key = grid.keys, grid.cells, grid.key
+        ends = [] #balls on an end wall, may be in a goal
+        for i, ball in enumerate(self.balls):
+            ball.move()
+            k = key(ball.x, ball.y, ball.z, ball.w)
+            if k != keys[i]:
+                cells[keys[i]].discard(i)
+                cells[k].add(i)
+                keys[i] = k
+            if ball.x <= 0 or ball.x >= 600:
+                ends.append(i)
+        self.lock_axes()
+        ends += self.collide()
+        self.frame += 1
+        return self.check_goals(ends)
+
+    def collide(self):
+        """Bounce balls from paddles, paddle 1 first. Returns indices of
+        balls that bounced. """
+        balls, grid = self.balls, self.grid
+        bounced = []
+        pairs = 0
+        for paddle in (self.paddle1, self.paddle2):
+            px, py, pz, pw, r = paddle.x, paddle.y, paddle.z, paddle.w, paddle.radius
+            if self.broadphase:
+                candidates = grid.query(px, py, pz, pw, r)
+            else:
+                candidates = range(len(balls))
+            pairs += len(candidates)
+            collision = paddle.collision
+            for i in candidates:
+                ball = balls[i]
+                col_dist = collision(ball.x, ball.y, ball.z, ball.w)
+                if col_dist >= 0:
+                    ball.bounce(px, py, pz, pw, col_dist, r)
+                    grid.update(i, ball)
+                    bounced.append(i)
+        self.pairs = pairs
+        return bounced
+
+    def check_goals(self, indices):
+        """Score and serve again the balls of indices that are in a goal. """
+        goal = NO_GOAL
+        balls, grid = self.balls, self.grid
+        for i in sorted(set(indices)):
+            ball = balls[i]
+            if not (GOAL_LOW < ball.y < GOAL_HIGH and GOAL_LOW < ball.z < GOAL_HIGH
+                    and GOAL_LOW < ball.w < GOAL_HIGH):
+                continue
+            if ball.x <= 0:
+                self.P2_points += 1
+                goal = P2_GOAL
+            elif ball.x >= 600:
+                self.P1_points += 1
+                goal = P1_GOAL
+            else:
+                continue
+            self.serve(ball)
+            grid.update(i, ball)
+        return goal
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Computer paddle policies.
+
+A policy controls one paddle of a Match. It is made with the match, the
+player (0 is paddle1, which defends the x=0 goal, 1 is paddle2) and a
+random.Random for its noise, and act() returns the player's input mask for
+the next step, see engine.DIRECTIONS. Policies look at the match only
+between steps, like a player looking at the screen, and work in match
+units, so they play FixedMatch too. paddle, by default the player's,
+gives another paddle to control, of a team.TeamMatch; the player is then
+its team. home is where the paddle started.
+
+POLICIES maps the names used on the command line to the classes.
+
+"""
+
+from .engine import DIRECTIONS, DIR_BITS, CENTER, FIELD
+from .predict import intercept
+
+
+XP, XN, YP, YN, ZP, ZN, WP, WN = (DIR_BITS[d] for d in DIRECTIONS)
+
+
+def steer(paddle, x, y, z, w, dead_zone):
+    """Input mask that moves paddle towards (x, y, z, w). Axes closer than
+    dead_zone are left alone, so the paddle does not shake. """
+    mask = 0
+    if x - paddle.x > dead_zone:   mask |= XP
+    elif paddle.x - x > dead_zone: mask |= XN
+    if y - paddle.y > dead_zone:   mask |= YP
+    elif paddle.y - y > dead_zone: mask |= YN
+    if z - paddle.z > dead_zone:   mask |= ZP
+    elif paddle.z - z > dead_zone: mask |= ZN
+    if w - paddle.w > dead_zone:   mask |= WP
+    elif paddle.w - w > dead_zone: mask |= WN
+    return mask
+
+
+class Policy():
+    """Does nothing. Base class of the others. """
+
+    def __init__(self, match, player, rng, paddle=None):
+        self.match = match
+        self.player = player
+        self.rng = rng
+        self.paddle = paddle or (match.paddle2 if player else match.paddle1)
+        self.home = (self.paddle.x, self.paddle.y, self.paddle.z, self.paddle.w)
+        self.home_x = self.paddle.x
+        self.defend = -1 if player == 0 else 1 #sign of ball x speed towards own goal
+        self.center = tuple(v * match.unit for v in CENTER)
+
+    def seconds(self, low, high):
+        """Random time between low and high seconds, in steps. """
+        return max(1, round(self.rng.uniform(low, high) * self.match.tick_rate))
+
+    def act(self):
+        return 0
+
+
+class RandomPolicy(Policy):
+    """Presses random keys, holds them 0.1 to 0.5 s. """
+
+    def __init__(self, match, player, rng, paddle=None):
+        super().__init__(match, player, rng, paddle)
+        self.mask = 0
+        self.left = 0
+
+    def act(self):
+        self.left -= 1
+        if self.left <= 0:
+            self.mask = self.rng.randrange(256)
+            self.left = self.seconds(0.1, 0.5)
+        return self.mask
+
+
+class Chase(Policy):
+    """Goes for the ball from behind, to push it towards the other goal.
+    Looks at the ball only every reaction time, 0.1 to 0.25 s, and aims a
+    little off. """
+
+    def __init__(self, match, player, rng, paddle=None):
+        super().__init__(match, player, rng, paddle)
+        self.aim = 5 * match.unit
+        self.behind = self.paddle.radius * match.unit / 2
+        self.reaction = self.seconds(0.1, 0.25)
+        self.target = self.center
+        self.left = 0
+
+    def look(self):
+        """New target, where to be until the next look. """
+        ball, rng, aim = self.match.ball, self.rng, self.aim
+        return (ball.x + self.defend * self.behind, ball.y + rng.uniform(-aim, aim),
+                ball.z + rng.uniform(-aim, aim), ball.w + rng.uniform(-aim, aim))
+
+    def act(self):
+        self.left -= 1
+        if self.left <= 0:
+            self.target = self.look()
+            self.left = self.reaction
+        return steer(self.paddle, *self.target, self.paddle.speed)
+
+
+class Guard(Chase):
+    """Chases the ball in its own half, otherwise waits at home, in front
+    of the middle of its goal for a lone paddle. """
+
+    def look(self):
+        if (self.match.ball.x - self.center[0]) * self.defend >= 0:
+            return super().look()
+        return self.home
+
+
+class Predict(Guard):
+    """The computer opponent of the front-end. When the ball comes towards
+    its goal, waits where the ball will cross its x plane, see predict.py.
+    Otherwise like Guard. """
+
+    def __init__(self, match, player, rng, paddle=None):
+        super().__init__(match, player, rng, paddle)
+        self.field = tuple(v * match.unit for v in FIELD)
+
+    def look(self):
+        ball = self.match.ball
+        if ball.sx * self.defend <= 0:
+            return super().look()
+        _, (_, y, z, w) = intercept(ball, self.home_x, self.field)
+        rng, aim = self.rng, self.aim
+        return (self.home_x, y + rng.uniform(-aim, aim), z + rng.uniform(-aim, aim),
+                w + rng.uniform(-aim, aim))
+
+
+POLICIES = {'idle': Policy, 'random': RandomPolicy, 'chase': Chase, 'guard': Guard,
+            'predict': Predict}
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Closed-form ball trajectory, for computer players.
+
+Between paddle hits the ball only moves and bounces from the walls, every
+axis on its own. Ball.move puts a ball that went past a wall back on the
+wall and reverses that speed component, so after the first wall hit an
+axis crosses the field in the same number of steps every time, there and
+back. The position after any number of steps is the first leg plus whole
+crossings and a remainder: reflection folding, with the wall clamping of
+Ball.move. One division per axis for any horizon, exact for FixedBall and
+within float rounding for Ball.
+
+Paddles and goals are not looked at, a prediction holds until the next hit
+or goal. field is the field size in the ball's units, FIELD for Ball and
+FIELD times unit for FixedBall.
+
+"""
+
+from .engine import FIELD
+
+
+def fold(p, v, length, steps):
+    """Position and speed on an axis of length after steps steps of
+    Ball.move, starting at p with speed v. """
+    if v == 0 or steps <= 0:
+        return p, v
+    wall = length if v > 0 else 0
+    first = max(1, int(-((p - wall) // v))) #steps to reach the wall
+    if steps < first:
+        return p + v*steps, v
+    crossing = int(-(-length // abs(v))) #steps from one wall to the other
+    n, r = divmod(steps - first, crossing)
+    v = -v
+    if n & 1:
+        wall = length - wall
+        v = -v
+    return wall + v*r, v
+
+
+def predict(ball, steps, field=FIELD):
+    """Ball (x, y, z, w) after steps steps. """
+    return (fold(ball.x, ball.sx, field[0], steps)[0], fold(ball.y, ball.sy, field[1], steps)[0],
+            fold(ball.z, ball.sz, field[2], steps)[0], fold(ball.w, ball.sw, field[3], steps)[0])
+
+
+def steps_to_x(ball, x, length=FIELD[0]):
+    """Steps until the ball reaches or passes the plane at x, 0 <= x <=
+    length, bouncing from the end wall behind it if it moves away. None if
+    it does not move in x. """
+    p, v = ball.x, ball.sx
+    if v == 0:
+        return None
+    if (x - p) * v >= 0: #ahead
+        return int(-((p - x) // v))
+    wall = length if v > 0 else 0
+    first = max(1, int(-((p - wall) // v)))
+    return first + int(-(-abs(wall - x) // abs(v)))
+
+
+def intercept(ball, x, field=FIELD):
+    """(steps, (x, y, z, w)) of the ball when it next reaches the plane at
+    x, None if it does not move in x. """
+    steps = steps_to_x(ball, x, field[0])
+    if steps is None:
+        return None
+    return steps, predict(ball, steps, field)
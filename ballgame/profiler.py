@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Per-frame phase timing for run_game.
+
+The frame is split into phases (input, physics, transform, draw, text,
+present). mark(phase) stores the time since the previous mark. Rolling
+averages and p99 over the last frames can be drawn as an overlay, and every
+frame can be written to a log for offline analysis:
+    .csv   one line per frame, phase times in microseconds
+    other  binary, header line then one struct FRAME_RECORD per frame
+When not enabled, mark() returns at once, so the cost is a method call.
+
+"""
+
+import struct, time
+from collections import deque
+
+
+PHASES = ('input', 'physics', 'transform', 'draw', 'text', 'present')
+#frame number, then phase times in microseconds
+FRAME_RECORD = struct.Struct('<I' + 'f' * len(PHASES))
+
+
+class FrameProfiler():
+    def __init__(self, overlay=False, window=120, log_path=None):
+        self.overlay = overlay
+        self.enabled = overlay or log_path is not None
+        self.window = window
+        self.history = {p: deque(maxlen=window) for p in PHASES}
+        self.history['frame'] = deque(maxlen=window)
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame = 0
+        self.frame_start = self.last = 0.0
+        self.log = None
+        self.csv = False
+        if log_path is not None:
+            self.csv = str(log_path).endswith('.csv')
+            if self.csv:
+                self.log = open(log_path, 'w')
+                self.log.write('frame,' + ','.join(PHASES) + '\n')
+            else:
+                self.log = open(log_path, 'wb')
+                self.log.write(('FRAMEPROF1 ' + ' '.join(PHASES) + '\n').encode())
+
+    def toggle_overlay(self):
+        """Show or hide overlay. Timing runs while overlay is shown or a log
+        is written. """
+        self.overlay = not self.overlay
+        enabled = self.overlay or self.log is not None
+        if enabled and not self.enabled:
+            #frame started untimed, time the rest of it from here
+            self.enabled = True
+            self.start_frame()
+        self.enabled = enabled
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+        for p in PHASES:
+            self.current[p] = 0.0
+
+    def mark(self, phase):
+        """Time since previous mark is added to phase. """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.frame += 1
+        current, history = self.current, self.history
+        for p in PHASES:
+            history[p].append(current[p])
+        history['frame'].append(self.last - self.frame_start)
+        if self.log is not None:
+            us = [current[p] * 1e6 for p in PHASES]
+            if self.csv:
+                self.log.write(f'{self.frame},' + ','.join(f'{t:.1f}' for t in us) + '\n')
+            else:
+                self.log.write(FRAME_RECORD.pack(self.frame, *us))
+
+    def stats(self):
+        """(name, average ms, p99 ms) for each phase and the whole frame,
+        over the rolling window. """
+        rows = []
+        for name in PHASES + ('frame',):
+            values = self.history[name]
+            if not values:
+                continue
+            ordered = sorted(values)
+            p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+            rows.append((name, sum(values) / len(values) * 1000, p99 * 1000))
+        return rows
+
+    def draw_overlay(self, screen, font, pos=(1060, 365)):
+        """Draw rolling stats as a table. Returns rects drawn. """
+        from .render import text_cache #needs pygame, the rest of this module does not
+        x, y = pos
+        rects = []
+        rows = [('phase', 'avg ms', 'p99 ms')]
+        rows += [(name, f'{avg:.2f}', f'{p99:.2f}') for name, avg, p99 in self.stats()]
+        for row in rows:
+            for col, text in zip((0, 80, 150), row):
+                rects.append(screen.blit(text_cache.render(font, text, 'black'), (x + col, y)))
+            y += font.get_linesize()
+        return rects
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+def read_log(path):
+    """Frames of a binary log as list of (frame, {phase: microseconds}). """
+    with open(path, 'rb') as f:
+        header = f.readline().split()
+        phases = [p.decode() for p in header[1:]]
+        record = struct.Struct('<I' + 'f' * len(phases))
+        data = f.read()
+        data = data[:len(data) - len(data) % record.size] #cut partial last record
+        frames = []
+        for values in record.iter_unpack(data):
+            frames.append((values[0], dict(zip(phases, values[1:]))))
+    return frames
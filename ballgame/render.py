@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Pygame drawing helpers for the projection panels.
+
+The panel borders, goals and axis labels never move, so they are drawn once
+per game mode into a layer surface and blitted in one call per frame. The
+layer is drawn on top of the paddles and ball, like the borders always were,
+and is transparent elsewhere (colorkey, RLE accelerated).
+
+TextCache keeps rendered text surfaces, so scores and coordinate read-outs
+are rasterized only when the text changes.
+
+DirtyRenderer only clears and pushes to the display the areas that changed:
+last and current bounding boxes of every paddle, ball marker and text.
+
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+
+SCREEN_SIZE = (1800, 800)
+COLORKEY = (1, 2, 3) #not used in drawing, transparent in the layer
+
+#Projection panels: dimensions needed (2/3/4), border, goal1, goal2, goal square
+PANELS = (
+    (2, (50,50,600,300), (25,150,25,100), (650,150,25,100), None),       # XY
+    (3, (750,50,600,300), (725,150,25,100), (1350,150,25,100), None),    # XZ
+    (3, (1450,50,300,300), None, None, (1550,150,100,100)),              # YZ
+    (4, (50,450,600,300), (25,550,25,100), (650,550,25,100), None),      # XW
+    (4, (750,450,300,300), None, None, (850,550,100,100)),               # YW
+    (4, (1450,450,300,300), None, None, (1550,550,100,100)),             # ZW
+)
+
+#dimension labels, shown in all modes
+LABELS = (
+    ('x', (60,350)), ('y', (40,330)), ('x', (760,350)), ('z', (740,330)),
+    ('y', (1460,350)), ('z', (1440,330)),
+    ('x', (60,750)), ('w', (40,730)), ('y', (760,750)), ('w', (740,730)),
+    ('z', (1460,750)), ('w', (1440,730)),
+)
+
+_layers = {}
+
+
+def panel_dims(mode_3d, mode_4d):
+    """Number of dimensions shown in a game mode. """
+    return 4 if mode_4d and mode_3d else 3 if mode_3d else 2
+
+
+def draw_layout(surf, mode_3d, mode_4d):
+    """Draw borders and goals of the panels used in this mode. """
+    dims = panel_dims(mode_3d, mode_4d)
+    for need, border, goal1, goal2, square in PANELS:
+        if need > dims:
+            continue
+        pygame.draw.rect(surf, 'black', border, width=1) #borders (topcorner x,y, length, width)
+        if goal1:
+            pygame.draw.rect(surf, 'pink', goal1)
+            pygame.draw.rect(surf, 'orange', goal2)
+        if square:
+            pygame.draw.rect(surf, 'brown', square, width=1)
+
+
+def static_layer(mode_3d, mode_4d, label_font):
+    """Static layout of a game mode as a display format surface, built on
+    first use and cached. Needs the display to be set up. """
+    key = (mode_3d, mode_4d)
+    layer = _layers.get(key)
+    if layer is None:
+        layer = pygame.Surface(SCREEN_SIZE)
+        layer.fill(COLORKEY)
+        draw_layout(layer, mode_3d, mode_4d)
+        for text, pos in LABELS:
+            layer.blit(label_font.render(text, False, 'black'), pos)
+        layer = layer.convert()
+        layer.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        _layers[key] = layer
+    return layer
+
+
+def clear_cache():
+    """Forget built layers, needed if the display is recreated. """
+    _layers.clear()
+
+
+class DirtyRenderer():
+    """Frame drawing with dirty rectangles. Call begin() before drawing the
+    moving things and end() with their bounding rects after. The whole
+    screen is drawn on the first frame, when the fill color changes (goal
+    blink) or when enabled is False. """
+
+    def __init__(self, screen, layer, enabled=True):
+        self.screen = screen
+        self.layer = layer
+        self.enabled = enabled
+        self.prev_sprites = []
+        self.prev_texts = []
+        self.color = None
+        self.full = True
+
+    def invalidate(self):
+        """Redraw whole screen on next frame. """
+        self.full = True
+
+    def begin(self, color):
+        """Wipe away what was drawn last frame. """
+        if color != self.color or not self.enabled:
+            self.full = True
+        self.color = color
+        if self.full:
+            self.screen.fill(color)
+        else:
+            for rect in self.prev_sprites + self.prev_texts:
+                self.screen.fill(color, rect)
+
+    def end(self, sprites, texts=()):
+        """Put static layout over the moving things and update the display.
+        sprites are bounding rects of paddles and balls, in the same order
+        every frame, a sprite whose rect did not change is not pushed again.
+        texts are always pushed. Returns number of pixels pushed. """
+        screen, layer = self.screen, self.layer
+        texts = list(texts)
+        if self.full:
+            screen.blit(layer, (0, 0))
+            pygame.display.flip()
+            pixels = SCREEN_SIZE[0] * SCREEN_SIZE[1]
+        else:
+            #all sprites were redrawn, so the layout goes over all of them
+            screen.blits([(layer, rect, rect) for rect in self.prev_sprites + sprites], False)
+            dirty = self.prev_texts + texts
+            for prev, rect in zip(self.prev_sprites, sprites):
+                if prev != rect:
+                    dirty.append(prev)
+                    dirty.append(rect)
+            pygame.display.update(dirty)
+            pixels = sum(rect.w * rect.h for rect in dirty)
+        self.prev_sprites = sprites
+        self.prev_texts = texts
+        self.full = False
+        return pixels
+
+
+class TextCache():
+    """Bounded LRU cache of rendered text surfaces keyed by (font, text,
+    color). Counts hits and misses. """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=False):
+        """Same as font.render(text, antialias, color), but cached. """
+        key = (font, text, color, antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+text_cache = TextCache()
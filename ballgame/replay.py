@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary match recordings.
+
+A match is deterministic given its settings and the inputs of every physics
+step, so only the inputs are recorded, one byte per player with one bit per
+direction (see engine.DIRECTIONS). Every interval steps a checkpoint of the
+full Match state is written too, for checking and for seeking.
+
+File layout, little-endian:
+    HEADER                            settings, physics backend and total step count
+    block 0: CHECKPOINT + 2*interval input bytes (p1, p2, p1, p2, ...)
+    block 1: ...
+All blocks have the same size, the last one is padded with zeros. At 240
+steps/s and a checkpoint every second a match takes 2.2 MB per hour.
+
+The recorder packs blocks in memory and hands full blocks to a background
+thread that writes them, so the game loop does not wait for the disk.
+
+The player memory-maps the file, so only the blocks that are played are
+read. The checkpoints are its keyframes: blocks have a fixed size, so the
+keyframe before any step is found by arithmetic and a seek re-simulates at
+most interval steps.
+
+"""
+
+import itertools, mmap, os, queue, struct, threading, time
+
+from . import backends
+
+
+MAGIC = b'BGRP'
+VERSION = 1
+#magic, version, tick rate, checkpoint interval, mode flags, backend, speed, paddle radius, steps
+HEADER = struct.Struct('<4sHHHBBddQ')
+#frame, ball x,y,z,w,sx,sy,sz,sw, paddle1 x,y,z,w, paddle2 x,y,z,w, P1 and P2 points
+CHECKPOINT = struct.Struct('<Q16dII')
+FLAG_3D = 1
+FLAG_4D = 2
+FLAG_FIXED = 4 #fixed.FixedMatch, checkpoints hold its integers
+#backend byte: index here, see backends.py. Files from before it have 0.
+REPLAY_BACKENDS = ('python', 'numpy', 'numba', 'nd', 'fixed', 'swept')
+
+
+def block_size(interval):
+    return CHECKPOINT.size + 2 * interval
+
+
+def pack_header(match, interval, steps=0):
+    flags = (FLAG_3D if match.mode_3d else 0) | (FLAG_4D if match.mode_4d else 0)
+    if match.unit != 1:
+        flags |= FLAG_FIXED
+    backend = backends.name_of(match)
+    code = REPLAY_BACKENDS.index(backend) if backend in REPLAY_BACKENDS else 0
+    return HEADER.pack(MAGIC, VERSION, match.tick_rate, interval, flags, code,
+                       match.speed, match.paddle1.radius, steps)
+
+
+def unpack_header(data):
+    """Header as dict, raises ValueError if it is not a replay. """
+    magic, version, tick_rate, interval, flags, code, speed, radius, steps = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a ballgame replay file')
+    if code >= len(REPLAY_BACKENDS):
+        raise ValueError(f'unknown physics backend {code} in replay file')
+    fixed = bool(flags & FLAG_FIXED)
+    return {'tick_rate': tick_rate, 'interval': interval, 'mode_3d': bool(flags & FLAG_3D),
+            'mode_4d': bool(flags & FLAG_4D), 'fixed': fixed,
+            'backend': 'fixed' if fixed else REPLAY_BACKENDS[code],
+            'speed': speed, 'paddle_radius': radius, 'steps': steps}
+
+
+def match_from_header(header):
+    """New match of the recorded backend with the recorded settings. A
+    float backend that can not be used here, numba without numba, is
+    replaced by python, which gives the same results. """
+    name = header['backend']
+    if not backends.available((name,)):
+        name = 'python'
+    return backends.make_match(name, header['speed'], header['mode_3d'], header['mode_4d'],
+                               header['paddle_radius'], header['tick_rate'])
+
+
+def new_replay_path(directory):
+    """Creates a new empty file match_<date>_<time>.bgr in directory, made
+    if missing, and returns its path. _2, _3... is added to the name when
+    a match of the same second has it already. """
+    os.makedirs(directory, exist_ok=True)
+    name = time.strftime('match_%Y%m%d_%H%M%S')
+    for n in itertools.count(1):
+        path = os.path.join(directory, name + (f'_{n}' if n > 1 else '') + '.bgr')
+        try:
+            open(path, 'xb').close()
+        except FileExistsError:
+            continue
+        return path
+
+
+class BackgroundWriter():
+    """File writer thread. write() only queues the data. """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            self.file.write(data)
+        self.file.flush()
+
+    def write(self, data):
+        self.queue.put(data)
+
+    def close(self, header=None):
+        """Write what is queued, then rewrite header if given. """
+        self.queue.put(None)
+        self.thread.join()
+        if header is not None:
+            self.file.seek(0)
+            self.file.write(header)
+        self.file.close()
+
+
+class ReplayRecorder():
+    """Records a match. Call record(inputs) right before every
+    match.step(inputs) and close() at the end. """
+
+    def __init__(self, path, match, interval=240):
+        self.match = match
+        self.interval = interval
+        self.steps = 0
+        self.block = bytearray()
+        self.writer = BackgroundWriter(path)
+        self.writer.write(pack_header(match, interval))
+
+    def record(self, inputs, state=None):
+        """state is the match state before this step, for when the match
+        has moved on since (rollback). Only used at checkpoints. """
+        if self.steps % self.interval == 0:
+            if state is None:
+                state = self.match.get_state()
+            self.block += CHECKPOINT.pack(*state)
+        self.block.append(inputs[0])
+        self.block.append(inputs[1])
+        self.steps += 1
+        if self.steps % self.interval == 0:
+            self.writer.write(bytes(self.block))
+            self.block.clear()
+
+    def close(self):
+        if self.block:
+            self.block += bytes(block_size(self.interval) - len(self.block))
+            self.writer.write(bytes(self.block))
+            self.block.clear()
+        self.writer.close(pack_header(self.match, self.interval, self.steps))
+
+
+class ReplayPlayer():
+    """Plays a recording back through self.match. position is the number of
+    steps played. """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = unpack_header(self.data)
+        self.interval = self.header['interval']
+        self.block_size = block_size(self.interval)
+        self.blocks = (len(self.data) - HEADER.size) // self.block_size
+        #step count is 0 if the recorder was not closed, then play all full blocks
+        self.steps = min(self.header['steps'] or self.blocks * self.interval,
+                         self.blocks * self.interval)
+        self.match = match_from_header(self.header)
+        self.position = 0
+
+    def offset(self, block):
+        return HEADER.size + block * self.block_size
+
+    def checkpoint(self, block):
+        """Match state at the start of block, see Match.get_state(). """
+        return CHECKPOINT.unpack_from(self.data, self.offset(block))
+
+    def inputs(self, step):
+        """(p1, p2) input masks of step. """
+        block, i = divmod(step, self.interval)
+        p = self.offset(block) + CHECKPOINT.size + 2 * i
+        return self.data[p], self.data[p + 1]
+
+    @property
+    def done(self):
+        return self.position >= self.steps
+
+    def seek(self, step):
+        """Go to state after step steps: restore the keyframe before it and
+        re-simulate the rest. """
+        step = max(0, min(step, self.steps))
+        if self.steps:
+            block = min(step, self.steps - 1) // self.interval
+            self.match.set_state(self.checkpoint(block))
+            self.position = block * self.interval
+        self.advance(step - self.position)
+
+    def advance(self, n=1):
+        """Play up to n steps, fewer at the end. Returns the last goal, like
+        Match.step. """
+        n = min(n, self.steps - self.position)
+        if n <= 0:
+            return 0
+        step, data, interval = self.match.step, self.data, self.interval
+        goal = 0
+        block, i = divmod(self.position, interval)
+        p = self.offset(block) + CHECKPOINT.size + 2 * i
+        for _ in range(n):
+            goal = step((data[p], data[p + 1])) or goal
+            i += 1
+            p += 2
+            if i == interval:
+                i = 0
+                p += CHECKPOINT.size #over the next checkpoint
+        self.position += n
+        return goal
+
+    def close(self):
+        self.data.close()
+        self.file.close()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Rollback netcode on top of the lockstep protocol in net.py.
+
+Lockstep waits for the remote input of every tick, so the input delay has
+to cover the network latency. Here a missing remote input is predicted
+instead, as the last one received, since players mostly hold keys. The game
+runs on without waiting. When the real input arrives and differs from the
+prediction, the state at the start of that tick is restored and the ticks
+since are simulated again. At most max_rollback ticks are run ahead of the
+last confirmed tick, past that it waits like lockstep.
+
+The packets are the same as in lockstep, so a rollback player can play a
+lockstep one. Only confirmed ticks are recorded and hashed.
+
+SnapshotRing keeps the states at the start of the last ticks in one flat
+preallocated list, a snapshot or a restore is one slice copy.
+
+"""
+
+from .net import LockstepSession, HASH_INTERVAL, state_hash
+
+
+STATE_SIZE = 19 #len(Match.get_state())
+MAX_ROLLBACK = 8
+
+
+class SnapshotRing():
+    """States at the start of the last size ticks, size is rounded up to a
+    power of two. """
+
+    def __init__(self, size=16, width=STATE_SIZE):
+        self.size = 1 << (size - 1).bit_length()
+        self.mask = self.size - 1
+        self.width = width
+        self.data = [0] * (self.size * width)
+
+    def save(self, tick, match):
+        o = (tick & self.mask) * self.width
+        self.data[o:o + self.width] = match.get_state()
+
+    def restore(self, tick, match):
+        o = (tick & self.mask) * self.width
+        match.set_state(self.data[o:o + self.width])
+
+    def state(self, tick):
+        o = (tick & self.mask) * self.width
+        return self.data[o:o + self.width]
+
+
+class RollbackSession(LockstepSession):
+    """Same use as LockstepSession, but ready() is only False when the game
+    is max_rollback ticks ahead of the remote inputs. Rollbacks happen in
+    receive(). """
+
+    def __init__(self, *args, max_rollback=MAX_ROLLBACK, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_rollback = max_rollback
+        self.ring = SnapshotRing(max_rollback + 2)
+        #inputs each tick in the ring was run with
+        self.used_local = [0] * self.ring.size
+        self.used_remote = [0] * self.ring.size
+        self.confirmed = -1  #ticks up to this ran with the real remote input
+        self.prediction = 0  #last remote input received
+        self.rollbacks = 0
+        self.resimulated = 0 #ticks
+
+    def ready(self):
+        return self.tick - self.received <= self.max_rollback
+
+    def advance(self, local_input):
+        self.local[self.next_local] = local_input
+        self.next_local += 1
+        tick = self.tick
+        self.used_local[tick & self.ring.mask] = self.local[tick]
+        if tick <= self.acked:
+            del self.local[tick]
+        self.ring.save(tick, self.match)
+        goal = self._run(tick)
+        self.tick += 1
+        self._confirm()
+        return goal
+
+    def _run(self, tick):
+        i = tick & self.ring.mask
+        remote = self.remote.get(tick, self.prediction)
+        self.used_remote[i] = remote
+        return self.run_tick(self.pair(self.used_local[i], remote))
+
+    def receive(self):
+        super().receive()
+        self._confirm()
+
+    def _confirm(self):
+        """Check ticks whose remote input is now known against what they
+        ran with, roll back from the first wrong one. Then record and hash
+        the confirmed ticks. """
+        last = min(self.received, self.tick - 1)
+        if last <= self.confirmed:
+            return
+        remote, used, mask = self.remote, self.used_remote, self.ring.mask
+        self.prediction = remote[last]
+        for t in range(self.confirmed + 1, last + 1):
+            if remote[t] != used[t & mask]:
+                self.resimulate(t)
+                break
+        for t in range(self.confirmed + 1, last + 1):
+            self._final(t)
+            del remote[t]
+        self.confirmed = last
+
+    def resimulate(self, first):
+        """Restore state at start of tick first and run the ticks up to the
+        current one again. """
+        ring, match = self.ring, self.match
+        ring.restore(first, match)
+        for t in range(first, self.tick):
+            if t > first:
+                ring.save(t, match)
+            self._run(t)
+        self.rollbacks += 1
+        self.resimulated += self.tick - first
+
+    def _final(self, tick):
+        """Tick has run with its real inputs. Replay checkpoints have to be
+        at tick starts, recorder interval a multiple of steps_per_tick. """
+        if tick % HASH_INTERVAL == 0 and tick:
+            self.send_hash(tick, state_hash(self.ring.state(tick)))
+        recorder = self.recorder
+        if recorder:
+            i = tick & self.ring.mask
+            inputs = self.pair(self.used_local[i], self.used_remote[i])
+            state = self.ring.state(tick)
+            for _ in range(self.steps_per_tick):
+                recorder.record(inputs, state)
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio game server, many headless matches in one process.
+
+    python -m ballgame.server serve [--port 47475] [--rate 60] [--stats 5]
+    python -m ballgame.server load [--matches 500] [--seconds 30]
+
+load is a load generator: it opens one connection per match, plays both
+paddles with random inputs, decodes the state updates and reports the
+update rate, gaps and bandwidth it saw.
+
+Protocol over TCP, each message is a length byte and the payload:
+    client -> server
+        JOIN   match id, players (bit 0 = P1, bit 1 = P2). The match is
+               created on first join and removed when its last client leaves.
+        INPUT  p1 mask, p2 mask. Only the masks of the joined players count.
+    A client that sends a message of another type or size is disconnected.
+    server -> client
+        STATE  tick, bitmask of fields sent, the fields as int16
+
+State fields are ball x,y,z,w, paddle1 x,y,z,w and paddle2 x,y,z,w in
+1/SUBUNITS field units, then the two scores. A client gets all fields when it
+joins or after it was skipped, otherwise only the fields that changed since
+the previous tick, 8 bytes plus 2 per field, ~18 bytes in a typical game.
+
+All matches tick together on one absolute schedule, tick n is due at start +
+n/rate, so timing errors do not add up. How late each tick starts is kept as
+lag. If the server falls more than MAX_CATCHUP ticks behind, the missed ticks
+are dropped instead of run in a burst; the lag is still measured from when
+the tick was due before that.
+
+Backpressure: when a client's send buffer is over HIGH_WATER its updates are
+skipped until the buffer drains, then it gets a full state. A client that
+has not taken an update for MAX_STALE seconds is disconnected.
+
+"""
+
+import argparse, asyncio, random, struct, sys, time
+from collections import deque
+
+from .engine import Match
+
+
+PORT = 47475
+TICK_RATE = 60
+SUBUNITS = 16 #state coordinates are sent in 1/SUBUNITS field units
+MAX_CATCHUP = 5
+HIGH_WATER = 16 * 1024
+MAX_STALE = 10.0
+
+#message types
+JOIN = 1
+INPUT = 2
+STATE = 3
+
+JOIN_MESSAGE = struct.Struct('<BIB')   #type, match id, players
+INPUT_MESSAGE = struct.Struct('<BBB')  #type, p1 mask, p2 mask
+STATE_HEADER = struct.Struct('<BIH')   #type, tick, field bitmask
+CLIENT_MESSAGES = {JOIN: JOIN_MESSAGE.size, INPUT: INPUT_MESSAGE.size} #type: size
+FIELDS = 14
+ALL_FIELDS = (1 << FIELDS) - 1
+VALUES = [struct.Struct(f'<{n}h') for n in range(FIELDS + 1)]
+
+
+def frame(payload):
+    """Message with length byte. """
+    return bytes((len(payload),)) + payload
+
+
+def state_fields(match):
+    """Quantized state of a match, see module doc. """
+    return tuple([int(v * SUBUNITS) for v in match.positions()]) + (match.P1_points, match.P2_points)
+
+
+def encode_state(tick, fields, prev=None):
+    """STATE message with the fields that differ from prev, all without
+    prev. """
+    if prev is None:
+        mask, values = ALL_FIELDS, fields
+    else:
+        mask = 0
+        values = []
+        for i, (v, p) in enumerate(zip(fields, prev)):
+            if v != p:
+                mask |= 1 << i
+                values.append(v)
+    return frame(STATE_HEADER.pack(STATE, tick, mask) + VALUES[len(values)].pack(*values))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+class ServerMatch():
+    def __init__(self, match_id, speed, mode_3d, mode_4d, rate):
+        self.id = match_id
+        self.match = Match(speed, mode_3d, mode_4d, tick_rate=rate)
+        self.inputs = [0, 0]
+        self.clients = set()
+        self.fields = state_fields(self.match)
+
+
+class Client():
+    def __init__(self, writer):
+        self.writer = writer
+        self.transport = writer.transport
+        self.match = None
+        self.players = 0
+        self.stale = True #next update has to be a full state
+        self.skipped = 0 #updates skipped in a row
+
+
+class GameServer():
+    def __init__(self, rate=TICK_RATE, speed=4, mode_3d=True, mode_4d=True):
+        self.rate = rate
+        self.dt = 1 / rate
+        self.settings = (speed, mode_3d, mode_4d)
+        self.matches = {}
+        self.clients = set()
+        #seconds, over the last 10 s
+        self.max_skipped = int(MAX_STALE * rate)
+        self.lag = deque(maxlen=10 * rate)
+        self.tick_time = deque(maxlen=10 * rate)
+        self.ticks = 0
+        self.dropped_ticks = 0
+        self.updates_sent = 0
+        self.updates_skipped = 0
+        self.bytes_sent = 0
+        self.disconnected = 0
+        self.rejected = 0 #clients disconnected for a bad message
+
+    async def handle(self, reader, writer):
+        """One client connection. """
+        client = Client(writer)
+        self.clients.add(client)
+        try:
+            while True:
+                length = (await reader.readexactly(1))[0]
+                data = await reader.readexactly(length)
+                if not data or CLIENT_MESSAGES.get(data[0]) != length:
+                    self.rejected += 1
+                    break
+                if data[0] == INPUT and client.match is not None:
+                    _, p1, p2 = INPUT_MESSAGE.unpack(data)
+                    inputs = client.match.inputs
+                    if client.players & 1:
+                        inputs[0] = p1
+                    if client.players & 2:
+                        inputs[1] = p2
+                elif data[0] == JOIN and client.match is None:
+                    _, match_id, players = JOIN_MESSAGE.unpack(data)
+                    sm = self.matches.get(match_id)
+                    if sm is None:
+                        sm = self.matches[match_id] = ServerMatch(match_id, *self.settings, self.rate)
+                    sm.clients.add(client)
+                    client.match = sm
+                    client.players = players
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+            sm = client.match
+            if sm is not None:
+                sm.clients.discard(client)
+                if not sm.clients and self.matches.get(sm.id) is sm:
+                    del self.matches[sm.id]
+            writer.close()
+
+    def tick_all(self):
+        """Step every match once and send the updates. """
+        for sm in list(self.matches.values()):
+            match = sm.match
+            match.step(sm.inputs)
+            fields = state_fields(match)
+            delta = full = None
+            dropped = []
+            for client in sm.clients:
+                buffered = client.transport.get_write_buffer_size()
+                if buffered > HIGH_WATER:
+                    client.stale = True
+                    client.skipped += 1
+                    self.updates_skipped += 1
+                    if client.skipped > self.max_skipped:
+                        self.disconnected += 1
+                        client.transport.abort()
+                        dropped.append(client)
+                    continue
+                client.skipped = 0
+                if client.stale:
+                    if full is None:
+                        full = encode_state(match.frame, fields)
+                    msg = full
+                    client.stale = False
+                else:
+                    if delta is None:
+                        delta = encode_state(match.frame, fields, sm.fields)
+                    msg = delta
+                client.writer.write(msg)
+                self.updates_sent += 1
+                self.bytes_sent += len(msg)
+            sm.clients.difference_update(dropped)
+            sm.fields = fields
+
+    async def tick_loop(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        n = 0
+        while True:
+            n += 1
+            due = start + n * self.dt
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = loop.time()
+            self.lag.append(now - due)
+            behind = int((now - due) / self.dt)
+            if behind > MAX_CATCHUP:
+                n += behind
+                self.dropped_ticks += behind
+            self.tick_all()
+            self.ticks += 1
+            self.tick_time.append(loop.time() - now)
+            if delay <= 0:
+                await asyncio.sleep(0) #let clients be served when catching up
+
+    def metrics(self):
+        lag = [t * 1000 for t in self.lag]
+        tick_time = [t * 1000 for t in self.tick_time]
+        return {'matches': len(self.matches), 'clients': len(self.clients), 'ticks': self.ticks,
+                'lag_p50_ms': percentile(lag, 50), 'lag_p99_ms': percentile(lag, 99),
+                'lag_max_ms': max(lag, default=0.0),
+                'tick_p50_ms': percentile(tick_time, 50), 'tick_p99_ms': percentile(tick_time, 99),
+                'dropped_ticks': self.dropped_ticks, 'updates_sent': self.updates_sent,
+                'updates_skipped': self.updates_skipped, 'bytes_sent': self.bytes_sent,
+                'disconnected': self.disconnected, 'rejected': self.rejected}
+
+
+async def serve(port=PORT, rate=TICK_RATE, stats=5.0, duration=None):
+    server = GameServer(rate)
+    tcp = await asyncio.start_server(server.handle, port=port)
+    ticker = asyncio.create_task(server.tick_loop())
+    print(f'serving on port {port}, {rate} ticks/s', flush=True)
+    started = time.perf_counter()
+    cpu = time.process_time()
+    sent = 0
+    try:
+        while duration is None or time.perf_counter() - started < duration:
+            await asyncio.sleep(stats)
+            m = server.metrics()
+            now_cpu = time.process_time()
+            print(f"{m['matches']} matches {m['clients']} clients | tick lag p50 {m['lag_p50_ms']:.2f} "
+                  f"p99 {m['lag_p99_ms']:.2f} max {m['lag_max_ms']:.2f} ms | tick time p50 "
+                  f"{m['tick_p50_ms']:.2f} p99 {m['tick_p99_ms']:.2f} ms | dropped {m['dropped_ticks']} "
+                  f"skipped {m['updates_skipped']} | {(m['bytes_sent'] - sent) / stats / 1024:.0f} KiB/s "
+                  f"| cpu {(now_cpu - cpu) / stats:.0%}", flush=True)
+            cpu, sent = now_cpu, m['bytes_sent']
+    finally:
+        ticker.cancel()
+        tcp.close()
+    return server.metrics()
+
+
+#**********************************************
+
+async def load_client(host, port, match_id, seconds, input_rate, stats):
+    """One connection playing both paddles of a match. Decodes all updates
+    and counts tick gaps. """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(frame(JOIN_MESSAGE.pack(JOIN, match_id, 3)))
+    rng = random.Random(match_id)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    next_input = loop.time()
+    fields = [0] * FIELDS
+    last_tick = None
+    buf = b''
+    try:
+        while loop.time() < end:
+            try:
+                data = await asyncio.wait_for(reader.read(65536), end - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            stats['bytes'] += len(data)
+            buf += data
+            pos = 0
+            while pos < len(buf) and pos + 1 + buf[pos] <= len(buf):
+                length = buf[pos]
+                _, tick, mask = STATE_HEADER.unpack_from(buf, pos + 1)
+                values = VALUES[bin(mask).count('1')].unpack_from(buf, pos + 1 + STATE_HEADER.size)
+                it = iter(values)
+                for i in range(FIELDS):
+                    if mask >> i & 1:
+                        fields[i] = next(it)
+                if last_tick is not None and tick != last_tick + 1:
+                    stats['gaps'] += 1
+                last_tick = tick
+                stats['updates'] += 1
+                pos += 1 + length
+            buf = buf[pos:]
+            if loop.time() >= next_input:
+                next_input += 1 / input_rate
+                writer.write(frame(INPUT_MESSAGE.pack(INPUT, rng.randrange(256), rng.randrange(256))))
+    finally:
+        stats['last_ticks'].append(last_tick or 0)
+        writer.close()
+
+
+async def load(host='127.0.0.1', port=PORT, matches=500, seconds=30.0, input_rate=10.0):
+    stats = {'bytes': 0, 'updates': 0, 'gaps': 0, 'last_ticks': []}
+    started = time.perf_counter()
+    await asyncio.gather(*(load_client(host, port, i, seconds, input_rate, stats)
+                           for i in range(matches)))
+    elapsed = time.perf_counter() - started
+    print(f"{matches} matches for {elapsed:.1f} s: {stats['updates'] / elapsed / matches:.1f} updates/s "
+          f"per match, {stats['gaps']} gaps, {stats['bytes'] / elapsed / 1024:.0f} KiB/s received, "
+          f"{stats['bytes'] / max(stats['updates'], 1):.1f} bytes/update", flush=True)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ballgame.server', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve_p = sub.add_parser('serve', help='run the server')
+    load_p = sub.add_parser('load', help='run the load generator')
+    for p in (serve_p, load_p):
+        p.add_argument('--port', type=int, default=PORT)
+    serve_p.add_argument('--rate', type=int, default=TICK_RATE, help='ticks per second')
+    serve_p.add_argument('--stats', type=float, default=5.0, help='seconds between metrics lines')
+    serve_p.add_argument('--duration', type=float, help='stop after this many seconds')
+    load_p.add_argument('--host', default='127.0.0.1')
+    load_p.add_argument('--matches', type=int, default=500)
+    load_p.add_argument('--seconds', type=float, default=30.0)
+    load_p.add_argument('--input-rate', type=float, default=10.0, help='input changes per second per match')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'serve':
+            asyncio.run(serve(args.port, args.rate, args.stats, args.duration))
+        else:
+            asyncio.run(load(args.host, args.port, args.matches, args.seconds, args.input_rate))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
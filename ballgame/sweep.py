@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Continuous (swept) collision detection for the point ball.
+
+Ball.move only tests where the ball ends up each frame, so at high speeds the
+ball can jump through a paddle or overshoot a wall and get clamped back. Here
+the ball path during one frame, p + t*v for 0 <= t <= 1, is tested against the
+field walls (one slab per axis) and the paddle spheres. The ball is moved to
+the earliest time of impact, reflected there and the rest of the frame is
+swept again from that point.
+
+"""
+
+import math
+
+from .engine import FIELD, Match, in_goal_mouth
+
+
+#max impacts handled within one frame, corners and paddle-wall pinches
+MAX_HITS = 16
+
+WALL = 'wall'
+PADDLE = 'paddle'
+
+
+def slab_toi(p, v, hi):
+    """Time when point p moving with speed v reaches a side of slab 0..hi.
+    Returns inf if it does not move on this axis. """
+    if v > 0:
+        return (hi - p) / v
+    if v < 0:
+        return p / -v
+    return math.inf
+
+
+def sphere_toi(pos, vel, center, radius):
+    """Time when point pos moving with speed vel enters sphere. Solves
+    |d + t*v| = r, d = pos - center. Returns inf if it misses or moves away,
+    0 if it is already touching and moving in. """
+    a = b = c = 0.0
+    for p, v, q in zip(pos, vel, center):
+        d = p - q
+        a += v*v
+        b += d*v
+        c += d*d
+    if a == 0 or b >= 0:
+        return math.inf
+    c -= radius*radius
+    if c <= 0:
+        return 0.0
+    disc = b*b - a*c
+    if disc < 0:
+        return math.inf
+    return (-b - math.sqrt(disc)) / a
+
+
+def reflect(vel, normal):
+    """Reflection w=v-2(v*n)n of vel from surface with unit normal. """
+    v_dot_n = sum(v*n for v, n in zip(vel, normal))
+    return [v - 2*v_dot_n*n for v, n in zip(vel, normal)]
+
+
+def sweep_ball(ball, paddles, t=1.0):
+    """Move ball for time t (1 = one frame), bouncing from walls and paddles
+    at the exact time of impact. Stops at the end wall if the ball reaches a
+    goal, so the goal check sees it. Returns True in that case. """
+    pos = [ball.x, ball.y, ball.z, ball.w]
+    vel = [ball.sx, ball.sy, ball.sz, ball.sw]
+    centers = [(p.x, p.y, p.z, p.w) for p in paddles]
+    in_goal = False
+
+    for _ in range(MAX_HITS):
+        hit_t, hit, which = t, None, None
+        for a in range(4):
+            ta = slab_toi(pos[a], vel[a], FIELD[a])
+            if ta <= hit_t:
+                hit_t, hit, which = ta, WALL, a
+        for i, paddle in enumerate(paddles):
+            tp = sphere_toi(pos, vel, centers[i], paddle.radius)
+            if tp <= hit_t:
+                hit_t, hit, which = tp, PADDLE, i
+
+        pos = [p + hit_t*v for p, v in zip(pos, vel)]
+        t -= hit_t
+        if hit is None:
+            break
+        if hit == WALL:
+            pos[which] = 0 if vel[which] < 0 else FIELD[which]
+            vel[which] = -vel[which]
+            if which == 0 and in_goal_mouth(pos[1], pos[2], pos[3]):
+                in_goal = True
+                break
+        else:
+            d = [p - q for p, q in zip(pos, centers[which])]
+            length = math.sqrt(sum(x*x for x in d))
+            if length == 0:
+                #at the paddle center there is no normal, send the ball back
+                d = [-v for v in vel]
+                length = math.sqrt(sum(x*x for x in d))
+            vel = reflect(vel, [x / length for x in d])
+
+    ball.x, ball.y, ball.z, ball.w = pos
+    ball.sx, ball.sy, ball.sz, ball.sw = vel
+    ball.wall_check()
+    return in_goal
+
+
+class SweptMatch(Match):
+    """Match that moves the ball with sweep_ball() instead of Ball.move, so
+    the ball cannot tunnel through paddles at any speed. """
+
+    def step(self, inputs=(0, 0)):
+        self.paddle1.apply_input(inputs[0])
+        self.paddle2.apply_input(inputs[1])
+        self.lock_axes()
+        #a paddle can still move onto the ball, push it out as before
+        self.collide()
+        sweep_ball(self.ball, (self.paddle1, self.paddle2))
+        self.frame += 1
+        return self.check_goal()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Team mode: one ball and up to MAX_TEAM paddles per side.
+
+Paddle i is on team 1 for i < team_size, on team 2 after. step() takes one
+input mask per paddle, in the same order.
+
+Small teams are engine.Paddle objects stepped in a Python loop, as Match
+does. From VECTORIZED paddles up the centers of all paddles are rows of one
+NumPy array, pos, team 1 first: all paddles move at once like
+batch.BatchMatch.move_paddles, and ball-paddle collision is one vectorized
+pass, the depth of the ball in each paddle, negative outside. That costs
+about the same with 2 paddles or 16, but numpy's per-call overhead makes it
+slower than the loop below VECTORIZED, see team.* in bench.py. Both give the
+same results.
+
+Contacts are resolved in paddle order, like Match bounces from paddle1
+before paddle2: the first paddle the ball is inside bounces it, then the
+depths in the paddles after that one are computed again from where the
+ball went, and so on. Simultaneous contacts always resolve the same way,
+and with team_size=1 a TeamMatch plays exactly like Match.
+
+paddles holds the Paddle objects, or a TeamPaddle view of every row of
+pos, for drawing and for policies; centers() has all their positions. paddle1 and paddle2 are the first paddles of the teams.
+TeamPredict is the computer player of a team paddle.
+
+Needs numpy, like batch.py.
+
+"""
+
+import numpy as np
+
+from .engine import Match, Paddle, CENTER, PADDLE_RADIUS, BASE_RATE
+from .batch import PADDLE_MIN, PADDLE_MAX, BIT_SHIFTS
+from .policies import Predict
+
+
+MAX_TEAM = 8
+TEAM_ROW = 4         #most paddles side by side in a row of the formation
+ROW_STEP = 100       #x distance of the rows, more if the paddles need it
+GAP = 10             #between paddles of a row
+VECTORIZED = 10      #paddles in a match from which the array pass is faster, see bench team.*
+COLORS = (('red', 'firebrick'), ('yellow', 'goldenrod')) #first paddle, others, per team
+
+
+def formation(k, n, radius=PADDLE_RADIUS):
+    """Start (x, y, z, w) of paddle k of a team of n on the x=0 side: rows
+    centered in y with GAP between the paddles, further rows closer to the
+    center, but not past it. A row has fewer than TEAM_ROW paddles if they
+    would not fit between the paddle borders. """
+    step = 2*radius + GAP
+    per_row = max(1, min(TEAM_ROW, int((PADDLE_MAX[1] - PADDLE_MIN) // step) + 1))
+    row, col = divmod(k, per_row)
+    in_row = min(per_row, n - row * per_row)
+    x = min(100 + max(ROW_STEP, step) * row, CENTER[0])
+    return (x, 150 + (col - (in_row - 1) / 2) * step, 150, 150)
+
+
+class TeamPaddle():
+    """Paddle i of a TeamMatch, read only. """
+
+    def __init__(self, match, i, color):
+        self.row = match.pos[i]
+        self.i = i
+        self.radius = match.radius
+        self.speed = match.paddle_speed
+        self.color = color
+
+    x = property(lambda self: self.row[0])
+    y = property(lambda self: self.row[1])
+    z = property(lambda self: self.row[2])
+    w = property(lambda self: self.row[3])
+
+
+class TeamMatch(Match):
+    """Match with team_size paddles per side. vectorized chooses the array
+    pass, by default it is used from VECTORIZED paddles up. """
+
+    def __init__(self, team_size=2, speed=4, mode_3d=True, mode_4d=True,
+                 paddle_radius=PADDLE_RADIUS, tick_rate=BASE_RATE, vectorized=None):
+        if not 1 <= team_size <= MAX_TEAM:
+            raise ValueError(f'team size must be 1 to {MAX_TEAM}')
+        super().__init__(speed, mode_3d, mode_4d, paddle_radius, tick_rate)
+        self.team_size = team_size
+        self.radius = paddle_radius
+        self.paddle_speed = self.paddle1.speed
+        if vectorized is None:
+            vectorized = 2 * team_size >= VECTORIZED
+        self.vectorized = vectorized
+        starts = [formation(k, team_size, paddle_radius) for k in range(team_size)]
+        starts += [(600 - x, y, z, w) for x, y, z, w in starts]
+        colors = [COLORS[i >= team_size][i % team_size > 0] for i in range(2 * team_size)]
+        if vectorized:
+            self.pos = np.array(starts, dtype=np.float64)
+            self.paddles = [TeamPaddle(self, i, color) for i, color in enumerate(colors)]
+        else:
+            self.paddles = []
+            for i, (start, color) in enumerate(zip(starts, colors)):
+                paddle = Paddle(*start, paddle_radius, color)
+                paddle.speed = self.paddle_speed
+                paddle.i = i
+                self.paddles.append(paddle)
+        self.paddle1 = self.paddles[0]
+        self.paddle2 = self.paddles[team_size]
+        self.lock_axes()
+
+    def team(self, i):
+        """0 if paddle i is on team 1, 1 if on team 2. """
+        return int(i >= self.team_size)
+
+    def centers(self):
+        """(x, y, z, w) of every paddle, in paddle order. """
+        if self.vectorized:
+            return self.pos.tolist()
+        return [(p.x, p.y, p.z, p.w) for p in self.paddles]
+
+    def move_paddles(self, inputs):
+        """inputs is one direction bitmask per paddle. Positive move is
+        applied before negative move, as in Paddle.apply_input. """
+        if not self.vectorized:
+            for paddle, mask in zip(self.paddles, inputs):
+                paddle.apply_input(mask)
+            return
+        inputs = tuple(inputs) + (0,) * (len(self.pos) - len(inputs))
+        bits = (np.asarray(inputs, dtype=np.uint8)[:, None] >> BIT_SHIFTS) & 1
+        if self.paddle_speed != 1:
+            bits = bits * self.paddle_speed
+        pos = self.pos
+        pos += bits[:, 0::2]
+        np.clip(pos, PADDLE_MIN, PADDLE_MAX, out=pos)
+        pos -= bits[:, 1::2]
+        np.clip(pos, PADDLE_MIN, PADDLE_MAX, out=pos)
+
+    def lock_axes(self):
+        """In 3D or 2D mode, lock extra coordinates to center. """
+        if not self.mode_4d:
+            self.ball.w = 150
+            if self.vectorized:
+                self.pos[:, 3] = 150
+            else:
+                for paddle in self.paddles:
+                    paddle.w = 150
+        if not self.mode_3d:
+            self.ball.z = 150
+            if self.vectorized:
+                self.pos[:, 2] = 150
+            else:
+                for paddle in self.paddles:
+                    paddle.z = 150
+
+    def depths(self, start=0):
+        """Depth of the ball in paddles start and after, negative outside.
+        Vectorized only. """
+        b = self.ball
+        d = self.pos[start:] - (b.x, b.y, b.z, b.w)
+        d *= d
+        #summed in same order as Paddle.collision
+        return self.radius - np.sqrt(d[:, 0] + d[:, 1] + d[:, 2] + d[:, 3])
+
+    def collide(self):
+        """Bounce the ball from the paddles it is inside of, in paddle
+        order. """
+        ball = self.ball
+        if not self.vectorized:
+            for paddle in self.paddles:
+                col_dist = paddle.collision(ball.x, ball.y, ball.z, ball.w)
+                if col_dist >= 0:
+                    ball.bounce(paddle.x, paddle.y, paddle.z, paddle.w, col_dist, paddle.radius)
+            return
+        pos = self.pos
+        start = 0
+        while start < len(pos):
+            depth = self.depths(start)
+            hits = np.flatnonzero(depth >= 0)
+            if not hits.size:
+                return
+            k = hits[0]
+            x, y, z, w = pos[start + k].tolist()
+            ball.bounce(x, y, z, w, float(depth[k]), self.radius)
+            start += k + 1
+
+    def step(self, inputs=()):
+        """Advance the game one frame. inputs is a direction bitmask per
+        paddle, missing ones are 0. Returns which team scored, if any. """
+        if any(inputs):
+            self.move_paddles(inputs)
+        self.ball.move()
+        self.lock_axes()
+        self.collide()
+        self.frame += 1
+        return self.check_goal()
+
+    def get_state(self):
+        """Full game state as flat tuple: frame, ball position and speed,
+        the paddle positions in paddle order and points. """
+        b = self.ball
+        if self.vectorized:
+            paddles = tuple(self.pos.ravel().tolist())
+        else:
+            paddles = tuple(v for p in self.paddles for v in (p.x, p.y, p.z, p.w))
+        return ((self.frame, b.x, b.y, b.z, b.w, b.sx, b.sy, b.sz, b.sw)
+                + paddles + (self.P1_points, self.P2_points))
+
+    def set_state(self, state):
+        """Restore state from get_state(). """
+        b = self.ball
+        self.frame, b.x, b.y, b.z, b.w, b.sx, b.sy, b.sz, b.sw = state[:9]
+        if self.vectorized:
+            self.pos.ravel()[:] = state[9:-2]
+        else:
+            for i, p in enumerate(self.paddles):
+                p.x, p.y, p.z, p.w = state[9 + 4*i:13 + 4*i]
+        self.P1_points, self.P2_points = state[-2:]
+
+
+class TeamPredict(Predict):
+    """Predict for a paddle of a TeamMatch, player is its team. Only the
+    paddle of the team closest to the ball goes for it, the others keep
+    their places in the formation. """
+
+    def look(self):
+        match, ball = self.match, self.match.ball
+        n = match.team_size
+        first = self.player * n
+        b = (ball.x, ball.y, ball.z, ball.w)
+        d = [sum((c - v)**2 for c, v in zip(center, b))
+             for center in match.centers()[first:first + n]]
+        if first + d.index(min(d)) != self.paddle.i:
+            return self.home
+        return super().look()
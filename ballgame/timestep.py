@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Fixed timestep loop, physics rate decoupled from render rate.
+
+Real elapsed time is collected into an accumulator and physics is stepped in
+fixed dt slices, as many as fit. The leftover fraction alpha is used to
+interpolate the drawn positions between the last two physics states, so
+the game looks smooth at any refresh rate and plays at the same speed when
+frames are slow or dropped.
+
+"""
+
+import time
+
+
+class FixedTimestep():
+    def __init__(self, rate=240, max_frame_time=0.25):
+        self.rate = rate
+        self.dt = 1 / rate
+        #longer frames are cut, so a stall does not need a huge catch-up
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.last = time.perf_counter()
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.last = time.perf_counter()
+
+    def advance(self, now=None):
+        """Add time passed since last call. Returns how many physics steps
+        to run now. """
+        if now is None:
+            now = time.perf_counter()
+        frame_time = min(now - self.last, self.max_frame_time)
+        self.last = now
+        self.accumulator += frame_time
+        steps = int(self.accumulator / self.dt)
+        self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        """How far between previous and current physics state, 0..1. """
+        return self.accumulator / self.dt
+
+
+def lerp(prev, cur, alpha):
+    """Interpolate flat coordinate tuples, see Match.positions(). """
+    return tuple(p + (c - p)*alpha for p, c in zip(prev, cur))
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+AI-vs-AI tournaments: rank paddle policies (see policies.py) by playing many
+headless matches over a process pool.
+
+    python -m ballgame.tournament [--policies chase,guard,random] [--matches 20]
+        [--modes 4d,3d,2d] [--speed 4] [--radius 40] [--seconds 60] [--seed 1]
+        [--workers N] [--chunk 8] [--fixed] [--json FILE]
+
+Every ordered pair of policies plays --matches matches in every mode, so
+each policy plays both sides. The noise of the policies in match i of the
+schedule is seeded from the seed and i only, so the results do not depend
+on the number of workers or the chunk size, and the same seed gives the
+same results again. With --fixed the matches run on fixed-point physics
+and the results are the same on every machine too.
+
+The schedule is cut into chunks of consecutive matches. A worker gets only
+the first match and count of a chunk and sends back the Stats of the whole
+chunk, which the parent merges as chunks finish. Stats holds only integer
+counts, so the totals do not depend on the merge order.
+
+A rally is the time from a serve to the goal that ends it.
+
+"""
+
+import argparse, json, multiprocessing, os, random, sys, time
+
+from .engine import Match, mode_flags
+from .fixed import FixedMatch
+from .policies import POLICIES
+
+
+MODES = {'4d': 0, '3d': 1, '2d': 2}
+HIST_PER_SECOND = 2 #rally histogram bins per second
+HIST_BINS = 240     #longer rallies go in the last bin
+
+
+class Stats():
+    """Counts of a set of matches. policies holds per policy played, won,
+    drawn, lost, goals for and goals against, modes per mode goals, rally
+    steps, longest rally and the rally length histogram. """
+
+    def __init__(self):
+        self.matches = 0
+        self.steps = 0
+        self.policies = {}
+        self.modes = {}
+
+    def add_result(self, name, points, other_points):
+        row = self.policies.setdefault(name, [0] * 6)
+        row[0] += 1
+        if points > other_points:
+            row[1] += 1
+        elif points == other_points:
+            row[2] += 1
+        else:
+            row[3] += 1
+        row[4] += points
+        row[5] += other_points
+
+    def mode(self, name):
+        if name not in self.modes:
+            self.modes[name] = {'goals': 0, 'rally_steps': 0, 'longest': 0,
+                                'hist': [0] * HIST_BINS}
+        return self.modes[name]
+
+    def merge(self, other):
+        self.matches += other.matches
+        self.steps += other.steps
+        for name, row in other.policies.items():
+            own = self.policies.setdefault(name, [0] * 6)
+            for i, v in enumerate(row):
+                own[i] += v
+        for name, m in other.modes.items():
+            own = self.mode(name)
+            own['goals'] += m['goals']
+            own['rally_steps'] += m['rally_steps']
+            own['longest'] = max(own['longest'], m['longest'])
+            own['hist'] = [a + b for a, b in zip(own['hist'], m['hist'])]
+
+    def ranking(self):
+        """Policy names, best first: by wins, then goal difference. """
+        return sorted(self.policies, key=lambda n: (-self.policies[n][1],
+                      self.policies[n][5] - self.policies[n][4], n))
+
+
+def pairings(names):
+    """Ordered pairs of different policies, self-play if there is one. """
+    return [(a, b) for a in names for b in names if a != b] or [(names[0], names[0])]
+
+
+def schedule(config, index):
+    """(mode name, policy 1, policy 2) of match index. """
+    pairs = pairings(config['policies'])
+    per_mode = len(pairs) * config['matches']
+    mode = config['modes'][index // per_mode]
+    return (mode,) + pairs[index % per_mode // config['matches']]
+
+
+def play(config, index, stats):
+    """Play match index of the schedule and count it into stats. """
+    mode, name1, name2 = schedule(config, index)
+    tick_rate = config['tick_rate']
+    cls = FixedMatch if config['fixed'] else Match
+    match = cls(config['speed'], *mode_flags(MODES[mode]), config['radius'], tick_rate)
+    rng = random.Random(f"{config['seed']}/{index}")
+    act1 = POLICIES[name1](match, 0, random.Random(rng.getrandbits(64))).act
+    act2 = POLICIES[name2](match, 1, random.Random(rng.getrandbits(64))).act
+
+    m = stats.mode(mode)
+    hist = m['hist']
+    step = match.step
+    steps = round(config['seconds'] * tick_rate)
+    serve = 0
+    for t in range(1, steps + 1):
+        if step((act1(), act2())):
+            rally = t - serve
+            serve = t
+            m['goals'] += 1
+            m['rally_steps'] += rally
+            if rally > m['longest']:
+                m['longest'] = rally
+            hist[min(HIST_BINS - 1, rally * HIST_PER_SECOND // tick_rate)] += 1
+
+    stats.matches += 1
+    stats.steps += steps
+    stats.add_result(name1, match.P1_points, match.P2_points)
+    stats.add_result(name2, match.P2_points, match.P1_points)
+
+
+_config = None #of a worker process
+
+
+def _init_worker(config):
+    global _config
+    _config = config
+
+
+def run_chunk(chunk, config=None):
+    """Stats of matches first ... first + count - 1. """
+    first, count = chunk
+    config = config or _config
+    stats = Stats()
+    for index in range(first, first + count):
+        play(config, index, stats)
+    return stats
+
+
+def run(config, workers=None, chunk=8):
+    """Play the whole schedule on workers processes, all cores by default.
+    Returns the merged Stats. """
+    total = len(config['modes']) * len(pairings(config['policies'])) * config['matches']
+    chunks = [(first, min(chunk, total - first)) for first in range(0, total, chunk)]
+    stats = Stats()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for c in chunks:
+            stats.merge(run_chunk(c, config))
+        return stats
+    with multiprocessing.Pool(workers, _init_worker, (config,)) as pool:
+        for part in pool.imap_unordered(run_chunk, chunks):
+            stats.merge(part)
+    return stats
+
+
+def percentile_seconds(hist, p):
+    """Upper edge of the histogram bin where p percent of rallies end. """
+    total = sum(hist)
+    if not total:
+        return 0.0
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen * 100 >= p * total:
+            return (i + 1) / HIST_PER_SECOND
+    return 0.0
+
+
+def summary(stats, config):
+    """Results as a dict, for printing and JSON. """
+    table = []
+    for name in stats.ranking():
+        played, won, drawn, lost, goals_for, goals_against = stats.policies[name]
+        table.append({'policy': name, 'played': played, 'won': won, 'drawn': drawn,
+                      'lost': lost, 'goals_for': goals_for, 'goals_against': goals_against,
+                      'win_rate': won / played})
+    modes = {}
+    per_mode = stats.matches // len(config['modes'])
+    for name in config['modes']:
+        m = stats.mode(name)
+        goals = m['goals']
+        modes[name] = {'goals_per_match': goals / per_mode,
+                       'rally_mean_s': m['rally_steps'] / goals / config['tick_rate'] if goals else 0.0,
+                       'rally_p50_s': percentile_seconds(m['hist'], 50),
+                       'rally_p90_s': percentile_seconds(m['hist'], 90),
+                       'rally_longest_s': m['longest'] / config['tick_rate']}
+    return {'matches': stats.matches, 'steps': stats.steps, 'ranking': table, 'modes': modes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ballgame.tournament', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--policies', default='chase,guard,random',
+                        help=f'comma separated, of {",".join(POLICIES)}')
+    parser.add_argument('--matches', type=int, default=20, help='per pair of policies and mode')
+    parser.add_argument('--modes', default='4d,3d,2d')
+    parser.add_argument('--speed', type=float, default=4.0, help='ball speed')
+    parser.add_argument('--radius', type=float, default=40.0, help='paddle radius')
+    parser.add_argument('--seconds', type=float, default=60.0, help='game time of a match')
+    parser.add_argument('--tick-rate', type=int, default=60, help='physics steps per second')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes')
+    parser.add_argument('--chunk', type=int, default=8, help='matches per work item')
+    parser.add_argument('--fixed', action='store_true', help='fixed-point physics')
+    parser.add_argument('--json', metavar='FILE', help='write results as JSON')
+    args = parser.parse_args(argv)
+
+    config = {'policies': args.policies.split(','), 'modes': args.modes.split(','),
+              'matches': args.matches, 'speed': args.speed, 'radius': args.radius,
+              'seconds': args.seconds, 'tick_rate': args.tick_rate, 'seed': args.seed,
+              'fixed': args.fixed}
+    for name in config['policies']:
+        if name not in POLICIES:
+            parser.error(f'unknown policy {name}')
+    for name in config['modes']:
+        if name not in MODES:
+            parser.error(f'unknown mode {name}')
+
+    t = time.perf_counter()
+    stats = run(config, args.workers, args.chunk)
+    elapsed = time.perf_counter() - t
+    result = summary(stats, config)
+
+    print(f"{'policy':10s} {'played':>7s} {'won':>6s} {'drawn':>6s} {'lost':>6s} "
+          f"{'goals':>13s} {'win %':>6s}")
+    for row in result['ranking']:
+        print(f"{row['policy']:10s} {row['played']:7d} {row['won']:6d} {row['drawn']:6d} "
+              f"{row['lost']:6d} {row['goals_for']:6d}-{row['goals_against']:<6d} "
+              f"{row['win_rate'] * 100:6.1f}")
+    print()
+    for name, m in result['modes'].items():
+        print(f"{name}: {m['goals_per_match']:.2f} goals/match, rally mean {m['rally_mean_s']:.1f} s "
+              f"p50 {m['rally_p50_s']:.1f} s p90 {m['rally_p90_s']:.1f} s "
+              f"longest {m['rally_longest_s']:.1f} s")
+    print(f"\n{stats.matches} matches in {elapsed:.1f} s on {args.workers} workers: "
+          f"{stats.matches / elapsed:.1f} matches/s, {stats.steps / elapsed:,.0f} steps/s")
+
+    if args.json:
+        result.update(config=config, workers=args.workers, elapsed_s=elapsed)
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
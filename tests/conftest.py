@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the bit-exact guarantees of the physics: backends, batched engine,
+event-driven stepping and replays all against engine.Match.
+
+    python -m pytest tests
+
+"""
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
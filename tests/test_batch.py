@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""batch.BatchMatch steps every match like its own engine.Match. """
+
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from ballgame.batch import BatchMatch
+from ballgame.engine import Match, mode_flags
+
+
+@pytest.mark.parametrize('game_mode', [0, 1, 2])
+@pytest.mark.parametrize('tick_rate', [60, 240])
+def test_batch_matches_scalar(game_mode, tick_rate):
+    n = 8
+    rng = random.Random(game_mode * 1000 + tick_rate)
+    batch = BatchMatch(n, 6, *mode_flags(game_mode), tick_rate=tick_rate)
+    matches = [Match(6, *mode_flags(game_mode), tick_rate=tick_rate) for _ in range(n)]
+    inputs = np.zeros((n, 2), dtype=np.uint8)
+    for step in range(3000):
+        if step % 50 == 0:
+            inputs[:] = [[rng.randrange(256), rng.randrange(256)] for _ in range(n)]
+        goals = batch.step(inputs)
+        for i, match in enumerate(matches):
+            assert match.step(tuple(inputs[i].tolist())) == goals[i]
+    for i, match in enumerate(matches):
+        state = match.get_state()
+        assert tuple(batch.pos[i].tolist()) + tuple(batch.vel[i].tolist()) == state[1:9]
+        assert tuple(batch.paddles[i].ravel().tolist()) == state[9:17]
+        assert tuple(batch.points[i].tolist()) == state[17:19]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""events.run_events gives the same goals and states as Match.run. """
+
+import random
+
+import pytest
+
+from ballgame import events
+from ballgame.engine import Match, mode_flags
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_run_events_is_bit_identical(seed):
+    rng = random.Random(seed)
+    game_mode = seed % 3
+    tick_rate = (60, 120, 240)[seed // 3 % 3]
+    plain = Match(4, *mode_flags(game_mode), tick_rate=tick_rate)
+    skipping = Match(4, *mode_flags(game_mode), tick_rate=tick_rate)
+    for _ in range(20):
+        inputs = (rng.choice((0, 1, 2, 4, 8, 16, 5)), rng.choice((0, 1, 2, 4, 8, 32, 10)))
+        frames = rng.randrange(50, 2000)
+        assert events.run_events(skipping, frames, inputs) == plain.run(frames, inputs)
+        assert skipping.get_state() == plain.get_state()
+
+
+@pytest.mark.parametrize('p, v', [(100, 1), (300.0, 0.25), (0.1, 0.3), (150.0, -1e-3),
+                                  (1e15, 1.0), (299.99999999999994, 4.000000000000001)])
+def test_advance_equals_repeated_additions(p, v):
+    for frames in (1, 7, 1000):
+        expected = p
+        for _ in range(frames):
+            expected += v
+        assert events.advance(p, v, frames) == expected
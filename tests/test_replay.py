@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Replays play back and seek to the recorded states on every backend. """
+
+import random
+
+import pytest
+
+from ballgame import backends
+from ballgame.engine import mode_flags
+from ballgame.replay import ReplayRecorder, ReplayPlayer
+
+
+STEPS = 1000
+INTERVAL = 240
+
+
+def record(path, name, game_mode):
+    """Records STEPS random steps. Returns the states after each step. """
+    match = backends.make_match(name, 4, *mode_flags(game_mode), tick_rate=240)
+    recorder = ReplayRecorder(str(path), match, INTERVAL)
+    rng = random.Random(game_mode)
+    states = [match.get_state()]
+    for step in range(STEPS):
+        if step % 40 == 0:
+            inputs = (rng.randrange(256), rng.randrange(256))
+        recorder.record(inputs)
+        match.step(inputs)
+        states.append(match.get_state())
+    recorder.close()
+    return states
+
+
+@pytest.mark.parametrize('name', backends.BACKENDS)
+@pytest.mark.parametrize('game_mode', [0, 1, 2])
+def test_round_trip_and_seek(tmp_path, name, game_mode):
+    if not backends.available((name,)):
+        pytest.skip(f'{name} can not be used here')
+    path = tmp_path / 'match.bgr'
+    states = record(path, name, game_mode)
+    player = ReplayPlayer(str(path))
+    try:
+        assert player.header['backend'] == name
+        assert player.header['steps'] == STEPS
+        player.advance(STEPS)
+        assert player.done
+        assert player.match.get_state() == states[-1]
+        for step in (STEPS, 0, 1, INTERVAL - 1, INTERVAL, INTERVAL + 1, 777, 3, STEPS - 1):
+            player.seek(step)
+            assert player.match.get_state() == states[step], step
+    finally:
+        player.close()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""team.TeamMatch: the Paddle loop and the array pass give the same states,
+and 1v1 plays like engine.Match. """
+
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from ballgame.engine import Match, mode_flags
+from ballgame.team import TeamMatch, MAX_TEAM
+
+
+def chase_inputs(match, rng):
+    """Every paddle moves towards the ball on each axis, sometimes at
+    random, so the ball hits paddles often. """
+    ball = match.ball
+    b = (ball.x, ball.y, ball.z, ball.w)
+    inputs = []
+    for center in match.centers():
+        if rng.random() < 0.2:
+            inputs.append(rng.randrange(256))
+            continue
+        mask = 0
+        for axis, (c, v) in enumerate(zip(center, b)):
+            if v > c + 1:
+                mask |= 1 << 2*axis
+            elif v < c - 1:
+                mask |= 2 << 2*axis
+        inputs.append(mask)
+    return inputs
+
+
+@pytest.mark.parametrize('size', range(1, MAX_TEAM + 1))
+@pytest.mark.parametrize('game_mode', [0, 2])
+def test_loop_matches_array(size, game_mode):
+    rng = random.Random(size)
+    loop = TeamMatch(size, 8, *mode_flags(game_mode), tick_rate=60, vectorized=False)
+    array = TeamMatch(size, 8, *mode_flags(game_mode), tick_rate=60, vectorized=True)
+    assert loop.get_state() == array.get_state()
+    for _ in range(5000):
+        inputs = chase_inputs(loop, rng)
+        assert loop.step(inputs) == array.step(inputs)
+        assert loop.get_state() == array.get_state()
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+@pytest.mark.parametrize('game_mode', [0, 1, 2])
+def test_one_a_side_is_match(vectorized, game_mode):
+    rng = random.Random(game_mode)
+    match = Match(5, *mode_flags(game_mode), tick_rate=240)
+    team = TeamMatch(1, 5, *mode_flags(game_mode), tick_rate=240, vectorized=vectorized)
+    for _ in range(10000):
+        inputs = chase_inputs(team, rng)
+        assert team.step(inputs) == match.step(tuple(inputs))
+        assert team.get_state() == match.get_state()